@@ -0,0 +1,14 @@
+-- Keep one tag per detected face: verified or rejected tags first, then the oldest
+DELETE FROM "photo_tags" t
+USING (
+    SELECT "id", ROW_NUMBER() OVER (
+        PARTITION BY "photo_id", "face_encoding_id"
+        ORDER BY ("verified" OR "rejected") DESC, "created_at", "id"
+    ) AS rn
+    FROM "photo_tags"
+    WHERE "face_encoding_id" IS NOT NULL
+) d
+WHERE t."id" = d."id" AND d.rn > 1;
+
+-- CreateIndex
+CREATE UNIQUE INDEX "uq_tag_photo_face" ON "photo_tags"("photo_id", "face_encoding_id");
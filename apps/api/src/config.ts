@@ -58,7 +58,10 @@ export const redisConfig = {
     redisTls: process.env.REDIS_TLS === 'true' || false,
 };
 
-/** Redis stream for AI processing jobs (photo_process, face_sample, reprocess_wedding) */
+/**
+ * Redis stream for AI processing jobs
+ * (photo_process, face_sample, rematch_wedding, reprocess_wedding)
+ */
 export const aiQueueStreamKey =
     process.env.REDIS_AI_QUEUE_STREAM || 'ai:processing:stream';
 // SES (email)
@@ -1,3 +1,4 @@
+import { Prisma } from '@prisma/client';
 import { prisma } from '..';
 
 export async function findManyByUserId(
@@ -33,25 +34,146 @@ export async function findManyByUserId(
     return tags;
 }
 
-export async function create(data: {
+type PhotoTagInput = {
     photoId: string;
     guestId?: string | null;
     userId?: number | null;
     confidenceScore?: number | null;
     boundingBox?: object;
     faceEncodingId?: string | null;
-}) {
-    return prisma.photoTag.create({
-        data: {
-            ...data,
-            verified: false,
-            rejected: false,
-            isPrimaryPerson: false,
-        },
-    });
+    /** Overwrite an existing tag's person even with a lower score */
+    replace?: boolean;
+};
+
+type TagMatch = {
+    guestId?: string | null;
+    userId?: number | null;
+    confidenceScore?: { toNumber(): number } | number | null;
+};
+
+function samePerson(a: TagMatch, b: TagMatch) {
+    return (
+        (a.guestId ?? null) === (b.guestId ?? null) &&
+        (a.userId ?? null) === (b.userId ?? null)
+    );
+}
+
+/** confidence_score is Decimal(5, 4): compare scores as they are stored. */
+function roundScore(score: TagMatch['confidenceScore']) {
+    return score != null ? Math.round(Number(score) * 1e4) / 1e4 : null;
+}
+
+/** Overwrite when current has no person, the same person or a lower score. */
+function replaces(current: TagMatch, tag: PhotoTagInput) {
+    if (current.guestId == null && current.userId == null) return true;
+    const score = roundScore(current.confidenceScore);
+    const newScore = roundScore(tag.confidenceScore);
+    if (samePerson(current, tag)) return score !== newScore;
+    if (tag.replace) return true;
+    return newScore != null && (score == null || newScore > score);
+}
+
+type UpsertedRow = { inserted: boolean };
+
+/**
+ * One INSERT ... ON CONFLICT for tags that share the same `replace` flag.
+ * The WHERE clause is `replaces` in SQL; verified and rejected tags are never
+ * updated. Rows that conflict but fail it are left as they are.
+ */
+function upsertStatement(tags: PhotoTagInput[], replace: boolean) {
+    const values = Prisma.join(
+        tags.map((tag) => {
+            const box =
+                tag.boundingBox != null
+                    ? JSON.stringify(tag.boundingBox)
+                    : null;
+            return Prisma.sql`(
+                ${tag.photoId}::uuid,
+                ${tag.guestId ?? null}::uuid,
+                ${tag.userId ?? null}::int,
+                ${tag.confidenceScore ?? null}::numeric,
+                ${box}::jsonb,
+                ${tag.faceEncodingId ?? null}
+            )`;
+        }),
+    );
+    const changes = replace
+        ? Prisma.sql`(t.guest_id, t.user_id, t.confidence_score)
+              IS DISTINCT FROM
+              (EXCLUDED.guest_id, EXCLUDED.user_id, EXCLUDED.confidence_score)`
+        : Prisma.sql`(
+              (t.guest_id IS NULL AND t.user_id IS NULL)
+              OR (
+                  t.guest_id IS NOT DISTINCT FROM EXCLUDED.guest_id
+                  AND t.user_id IS NOT DISTINCT FROM EXCLUDED.user_id
+                  AND t.confidence_score
+                      IS DISTINCT FROM EXCLUDED.confidence_score
+              )
+              OR (
+                  EXCLUDED.confidence_score IS NOT NULL
+                  AND (
+                      t.confidence_score IS NULL
+                      OR EXCLUDED.confidence_score > t.confidence_score
+                  )
+              )
+          )`;
+    return prisma.$queryRaw<UpsertedRow[]>`
+        INSERT INTO photo_tags AS t (
+            photo_id, guest_id, user_id, confidence_score, bounding_box,
+            face_encoding_id
+        )
+        VALUES ${values}
+        ON CONFLICT (photo_id, face_encoding_id) DO UPDATE SET
+            guest_id = EXCLUDED.guest_id,
+            user_id = EXCLUDED.user_id,
+            confidence_score = EXCLUDED.confidence_score,
+            bounding_box = COALESCE(EXCLUDED.bounding_box, t.bounding_box)
+        WHERE NOT t.verified AND NOT t.rejected AND ${changes}
+        RETURNING (xmax = 0) AS inserted`;
+}
+
+/**
+ * Create or update AI tags keyed by (photoId, faceEncodingId), so a photo that
+ * is processed again keeps one tag per detected face. Verified and rejected
+ * tags are never touched; other tags change only per `replaces`. A `replace`
+ * tag without a person clears the existing tag's person.
+ * Tags without a faceEncodingId are always created. The unique index on
+ * (photo_id, face_encoding_id) makes concurrent calls for a photo safe.
+ */
+export async function upsertMany(data: PhotoTagInput[]) {
+    // ON CONFLICT can't touch a row twice: keep one tag per face
+    const byFace = new Map<string, PhotoTagInput>();
+    const unkeyed: PhotoTagInput[] = [];
+    for (const input of data) {
+        const tag = {
+            ...input,
+            confidenceScore: roundScore(input.confidenceScore),
+        };
+        if (!tag.faceEncodingId) {
+            unkeyed.push(tag);
+            continue;
+        }
+        const key = `${tag.photoId}:${tag.faceEncodingId}`;
+        const pending = byFace.get(key);
+        if (!pending || replaces(pending, tag)) byFace.set(key, tag);
+    }
+    const tags = [...unkeyed, ...byFace.values()];
+
+    let created = 0;
+    let updated = 0;
+    for (const replace of [false, true]) {
+        const group = tags.filter((tag) => Boolean(tag.replace) === replace);
+        if (group.length === 0) continue;
+        const rows = await upsertStatement(group, replace);
+        for (const row of rows) {
+            if (row.inserted) created += 1;
+            else updated += 1;
+        }
+    }
+    return { created, updated };
 }
 
 export default {
     findManyByUserId,
-    create,
+    upsertMany,
 };
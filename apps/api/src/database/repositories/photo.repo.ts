@@ -96,6 +96,27 @@ export async function updateAiQueue(photoId: string, data: Record<string, unknow
   });
 }
 
+export async function applyStatusUpdates(
+  updates: {
+    photoId: string;
+    photo?: Record<string, unknown>;
+    queue?: Record<string, unknown>;
+  }[]
+) {
+  const ops = [];
+  for (const { photoId, photo, queue } of updates) {
+    if (photo && Object.keys(photo).length > 0) {
+      ops.push(prisma.photo.updateMany({ where: { id: photoId }, data: photo }));
+    }
+    if (queue && Object.keys(queue).length > 0) {
+      ops.push(prisma.aiProcessingQueue.updateMany({ where: { photoId }, data: queue }));
+    }
+  }
+  if (ops.length === 0) return 0;
+  await prisma.$transaction(ops);
+  return ops.length;
+}
+
 export async function incrementWeddingPhotoCount(
   weddingId: string,
   options: { total?: number; pending?: number }
@@ -117,6 +138,7 @@ export default {
   update,
   createAiQueueEntry,
   updateAiQueue,
+  applyStatusUpdates,
   incrementWeddingPhotoCount,
   findManyPhotoIdsByWedding,
 };
@@ -5,7 +5,7 @@ import {
     SuccessResponse,
     SuccessCreatedResponse,
 } from '../../core/api-response';
-import { NotFoundError } from '../../core/api-error';
+import { BadRequestError, NotFoundError } from '../../core/api-error';
 import photoRepo from '../../database/repositories/photo.repo';
 import guestRepo from '../../database/repositories/guest.repo';
 import photoTagRepo from '../../database/repositories/photo-tag.repo';
@@ -16,6 +16,39 @@ const router = Router();
 
 router.use(verifyInternalRequest);
 
+function parsePhotoStatusInput(body: Record<string, unknown>) {
+    const { processingStatus, facesDetected, processedAt, aiErrorMessage } =
+        body;
+    const data: Record<string, unknown> = {};
+    if (processingStatus != null) data.processingStatus = processingStatus;
+    if (facesDetected != null) data.facesDetected = Number(facesDetected);
+    if (processedAt != null) data.processedAt = new Date(processedAt as string);
+    if (aiErrorMessage != null) data.aiErrorMessage = aiErrorMessage;
+    return data;
+}
+
+function parseQueueStatusInput(body: Record<string, unknown>) {
+    const {
+        status,
+        startedAt,
+        facesFound,
+        matchesCreated,
+        completedAt,
+        errorMessage,
+        processingTimeMs,
+    } = body;
+    const data: Record<string, unknown> = {};
+    if (status != null) data.status = status;
+    if (startedAt != null) data.startedAt = new Date(startedAt as string);
+    if (facesFound != null) data.facesFound = Number(facesFound);
+    if (matchesCreated != null) data.matchesCreated = Number(matchesCreated);
+    if (completedAt != null) data.completedAt = new Date(completedAt as string);
+    if (errorMessage != null) data.errorMessage = errorMessage;
+    if (processingTimeMs != null)
+        data.processingTimeMs = Number(processingTimeMs);
+    return data;
+}
+
 router.get(
     '/photos/:photoId',
     asyncHandler(async (req, res) => {
@@ -30,14 +63,10 @@ router.patch(
     '/photos/:photoId',
     asyncHandler(async (req, res) => {
         const { photoId } = req.params;
-        const { processingStatus, facesDetected, processedAt, aiErrorMessage } =
-            req.body;
-        const data: Record<string, unknown> = {};
-        if (processingStatus != null) data.processingStatus = processingStatus;
-        if (facesDetected != null) data.facesDetected = Number(facesDetected);
-        if (processedAt != null) data.processedAt = new Date(processedAt);
-        if (aiErrorMessage != null) data.aiErrorMessage = aiErrorMessage;
-        const updated = await photoRepo.update(photoId, data);
+        const updated = await photoRepo.update(
+            photoId,
+            parsePhotoStatusInput(req.body),
+        );
         new SuccessResponse('Updated.', updated).send(res);
     }),
 );
@@ -51,31 +80,64 @@ router.get(
     }),
 );
 
+function parsePhotoTagInput(body: Record<string, unknown>) {
+    const {
+        photoId,
+        guestId,
+        userId,
+        confidenceScore,
+        boundingBox,
+        faceEncodingId,
+    } = body;
+    const parsedUserId =
+        userId != null && userId !== '' && !Number.isNaN(Number(userId))
+            ? Number(userId)
+            : null;
+    return {
+        photoId: photoId as string,
+        guestId: guestId != null && guestId !== '' ? (guestId as string) : null,
+        userId: parsedUserId,
+        confidenceScore:
+            confidenceScore != null ? Number(confidenceScore) : null,
+        boundingBox: (boundingBox as object | null) ?? undefined,
+        faceEncodingId: (faceEncodingId as string | null) ?? null,
+    };
+}
+
 router.post(
     '/photo-tags',
     asyncHandler(async (req, res) => {
-        const {
-            photoId,
-            guestId,
-            userId,
-            confidenceScore,
-            boundingBox,
-            faceEncodingId,
-        } = req.body;
-        const parsedUserId =
-            userId != null && userId !== '' && !Number.isNaN(Number(userId))
-                ? Number(userId)
-                : null;
-        const tag = await photoTagRepo.create({
-            photoId,
-            guestId: guestId != null && guestId !== '' ? guestId : null,
-            userId: parsedUserId,
-            confidenceScore:
-                confidenceScore != null ? Number(confidenceScore) : null,
-            boundingBox: boundingBox ?? undefined,
-            faceEncodingId: faceEncodingId ?? null,
-        });
-        new SuccessCreatedResponse('Tag created.', tag).send(res);
+        // Same upsert as the bulk route: the face may already have a tag
+        const result = await photoTagRepo.upsertMany([
+            {
+                ...parsePhotoTagInput(req.body),
+                replace: req.body?.replace === true,
+            },
+        ]);
+        new SuccessCreatedResponse('Tag saved.', result).send(res);
+    }),
+);
+
+router.post(
+    '/photo-tags/bulk',
+    asyncHandler(async (req, res) => {
+        const tags: Record<string, unknown>[] = Array.isArray(req.body?.tags)
+            ? req.body.tags
+            : [];
+        if (tags.length > 500)
+            throw new BadRequestError('At most 500 tags per request.');
+        // Upsert by (photoId, faceEncodingId) so reprocessing doesn't duplicate
+        const result = await photoTagRepo.upsertMany(
+            tags.map((tag) => ({
+                ...parsePhotoTagInput(tag),
+                replace: tag.replace === true,
+            })),
+        );
+        new SuccessCreatedResponse('Tags saved.', {
+            count: result.created + result.updated,
+            created: result.created,
+            updated: result.updated,
+        }).send(res);
     }),
 );
 
@@ -83,30 +145,36 @@ router.patch(
     '/processing-queue/:photoId',
     asyncHandler(async (req, res) => {
         const { photoId } = req.params;
-        const {
-            status,
-            startedAt,
-            facesFound,
-            matchesCreated,
-            completedAt,
-            errorMessage,
-            processingTimeMs,
-        } = req.body;
-        const data: Record<string, unknown> = {};
-        if (status != null) data.status = status;
-        if (startedAt != null) data.startedAt = new Date(startedAt);
-        if (facesFound != null) data.facesFound = Number(facesFound);
-        if (matchesCreated != null)
-            data.matchesCreated = Number(matchesCreated);
-        if (completedAt != null) data.completedAt = new Date(completedAt);
-        if (errorMessage != null) data.errorMessage = errorMessage;
-        if (processingTimeMs != null)
-            data.processingTimeMs = Number(processingTimeMs);
-        await photoRepo.updateAiQueue(photoId, data);
+        await photoRepo.updateAiQueue(photoId, parseQueueStatusInput(req.body));
         new SuccessResponse('Queue updated.', {}).send(res);
     }),
 );
 
+router.post(
+    '/photo-status/bulk',
+    asyncHandler(async (req, res) => {
+        const updates: Record<string, unknown>[] = Array.isArray(
+            req.body?.updates,
+        )
+            ? req.body.updates
+            : [];
+        if (updates.length > 500)
+            throw new BadRequestError('At most 500 updates per request.');
+        const applied = await photoRepo.applyStatusUpdates(
+            updates.map((u) => ({
+                photoId: u.photoId as string,
+                photo: u.photo
+                    ? parsePhotoStatusInput(u.photo as Record<string, unknown>)
+                    : undefined,
+                queue: u.queue
+                    ? parseQueueStatusInput(u.queue as Record<string, unknown>)
+                    : undefined,
+            })),
+        );
+        new SuccessResponse('Statuses updated.', { applied }).send(res);
+    }),
+);
+
 router.post(
     '/face-samples',
     asyncHandler(async (req, res) => {
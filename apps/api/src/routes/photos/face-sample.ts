@@ -153,7 +153,6 @@ router.post(
                         }),
                         ts: String(Date.now()),
                     },
-                    10000,
                 )
                 .catch((e: unknown) =>
                     console.error('Face sample queue push failed', e),
@@ -206,7 +206,6 @@ router.post(
                             payload: JSON.stringify({ photoId: photo.id }),
                             ts: String(Date.now()),
                         },
-                        10000,
                     )
                     .catch((e: unknown) => console.error('AI queue push failed', e));
             } else {
@@ -333,7 +332,6 @@ router.post(
                             payload: JSON.stringify({ photoId: photo.id }),
                             ts: String(Date.now()),
                         },
-                        10000,
                     )
                     .catch((e: unknown) => console.error('AI queue push failed', e));
             } else {
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Supervisor for the AI pipeline worker. Run from apps/ml-server: python run_supervisor.py
+
+Starts WORKER_PROCESSES worker processes, each with its own consumer name in
+REDIS_AI_CONSUMER_GROUP and a fixed ONNX thread budget so processes don't
+oversubscribe cores. Crashed workers are restarted with backoff; SIGTERM/SIGINT
+is forwarded so workers finish and ack their in-flight jobs before exiting.
+"""
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import time
+
+# Unbuffer stdout/stderr so logs show immediately (e.g. under uv run)
+if hasattr(sys.stdout, "reconfigure"):
+    sys.stdout.reconfigure(line_buffering=True)
+if hasattr(sys.stderr, "reconfigure"):
+    sys.stderr.reconfigure(line_buffering=True)
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except Exception:
+    pass
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "src")
+
+CPU_COUNT = os.cpu_count() or 1
+WORKER_PROCESSES = max(1, int(os.getenv("WORKER_PROCESSES", str(CPU_COUNT))))
+# ONNX intra-op threads per process; default splits the cores evenly
+THREADS_PER_PROCESS = int(os.getenv("ONNX_INTRA_OP_THREADS", "0")) or max(
+    1, CPU_COUNT // WORKER_PROCESSES
+)
+CONSUMER_PREFIX = os.getenv(
+    "REDIS_AI_CONSUMER_NAME", f"worker-{socket.gethostname()}"
+)
+# Seconds to wait for workers to drain after SIGTERM before killing them
+DRAIN_TIMEOUT_S = float(os.getenv("WORKER_DRAIN_TIMEOUT_S", "120"))
+RESTART_BACKOFF_MAX_S = 60.0
+# A worker that stayed up this long resets its restart backoff
+STABLE_UPTIME_S = 60.0
+
+
+def _worker_main(slot: int) -> None:
+    """Entry point of one worker process (spawned, so env is applied before imports)."""
+    os.environ["REDIS_AI_CONSUMER_NAME"] = f"{CONSUMER_PREFIX}-{slot}"
+    os.environ["ONNX_INTRA_OP_THREADS"] = str(THREADS_PER_PROCESS)
+    # Keep numpy / OpenCV pools in the same budget
+    os.environ["OMP_NUM_THREADS"] = str(THREADS_PER_PROCESS)
+    os.environ["OPENBLAS_NUM_THREADS"] = str(THREADS_PER_PROCESS)
+    sys.path.insert(0, SRC_DIR)
+
+    import cv2
+
+    cv2.setNumThreads(THREADS_PER_PROCESS)
+
+    if os.getenv("WORKER_MODE", "").lower() == "async":
+        from async_worker import run_async_worker as run_worker
+    else:
+        from worker import run_worker
+
+    run_worker()
+
+
+class Supervisor:
+    def __init__(self, num_processes: int):
+        self.num_processes = num_processes
+        self.ctx = multiprocessing.get_context("spawn")
+        self.children: dict[int, multiprocessing.Process] = {}
+        self.started_at: dict[int, float] = {}
+        self.backoff: dict[int, float] = {}
+        self.restart_at: dict[int, float] = {}
+        self.stopping = False
+
+    def _start(self, slot: int) -> None:
+        proc = self.ctx.Process(
+            target=_worker_main, args=(slot,), name=f"worker-{slot}", daemon=False
+        )
+        proc.start()
+        self.children[slot] = proc
+        self.started_at[slot] = time.monotonic()
+        print(
+            f"[supervisor] started {CONSUMER_PREFIX}-{slot} (pid {proc.pid}, "
+            f"{THREADS_PER_PROCESS} threads)",
+            flush=True,
+        )
+
+    def _on_signal(self, signum, _frame) -> None:
+        if self.stopping:
+            return
+        self.stopping = True
+        print(f"[supervisor] signal {signum}: draining workers", flush=True)
+        for proc in self.children.values():
+            if proc.is_alive():
+                os.kill(proc.pid, signal.SIGTERM)
+
+    def _reap(self) -> None:
+        """Schedule restarts for children that exited while we are not stopping."""
+        now = time.monotonic()
+        for slot, proc in list(self.children.items()):
+            if proc.is_alive() or slot in self.restart_at:
+                continue
+            uptime = now - self.started_at[slot]
+            if uptime >= STABLE_UPTIME_S:
+                self.backoff[slot] = 1.0
+            else:
+                self.backoff[slot] = min(
+                    self.backoff.get(slot, 0.5) * 2, RESTART_BACKOFF_MAX_S
+                )
+            self.restart_at[slot] = now + self.backoff[slot]
+            print(
+                f"[supervisor] {CONSUMER_PREFIX}-{slot} exited with code "
+                f"{proc.exitcode} after {uptime:.0f}s; restarting in "
+                f"{self.backoff[slot]:.0f}s",
+                flush=True,
+            )
+        for slot, when in list(self.restart_at.items()):
+            if now >= when:
+                del self.restart_at[slot]
+                self._start(slot)
+
+    def _drain(self) -> None:
+        deadline = time.monotonic() + DRAIN_TIMEOUT_S
+        for proc in self.children.values():
+            proc.join(max(0.0, deadline - time.monotonic()))
+        for slot, proc in self.children.items():
+            if proc.is_alive():
+                print(
+                    f"[supervisor] {CONSUMER_PREFIX}-{slot} did not drain in "
+                    f"{DRAIN_TIMEOUT_S:.0f}s; killing",
+                    flush=True,
+                )
+                proc.kill()
+                proc.join()
+
+    def run(self) -> None:
+        signal.signal(signal.SIGTERM, self._on_signal)
+        signal.signal(signal.SIGINT, self._on_signal)
+        for slot in range(self.num_processes):
+            self._start(slot)
+        while not self.stopping:
+            self._reap()
+            time.sleep(1.0)
+        self._drain()
+        print("[supervisor] all workers stopped", flush=True)
+
+
+if __name__ == "__main__":
+    print(
+        f"Starting AI pipeline supervisor with {WORKER_PROCESSES} workers...",
+        flush=True,
+    )
+    Supervisor(WORKER_PROCESSES).run()
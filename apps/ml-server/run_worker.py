@@ -20,7 +20,11 @@ except Exception:
 sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
 print("Loading worker module...", flush=True)
 
-from worker import run_worker
+# WORKER_MODE=async runs the asyncio worker (async_worker.py) instead
+if os.getenv("WORKER_MODE", "").lower() == "async":
+    from async_worker import run_async_worker as run_worker
+else:
+    from worker import run_worker
 
 if __name__ == "__main__":
     run_worker()
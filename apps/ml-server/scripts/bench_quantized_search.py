@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Benchmark photo-face search over one large wedding: flat float32 scan vs exact
+scan of the float16 EmbeddingStore vs int8 first pass + exact re-rank.
+
+Run from apps/ml-server: python scripts/bench_quantized_search.py --faces 200000
+
+Faces are synthetic: clusters around random identities with ArcFace-like
+same-person similarity (~0.5-0.8) and near-zero similarity between people.
+Reports latency per query, the first-pass candidate count, and whether the set
+of faces above the threshold matches the float32 scan.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC_DIR)
+
+from services.embedding_store import EmbeddingStore  # noqa: E402
+from services.quantized_index import QuantizedFaceIndex  # noqa: E402
+
+
+def _normalise(x: np.ndarray) -> np.ndarray:
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def _synthetic_faces(rng, faces: int, identities: int, dim: int):
+    centers = _normalise(rng.standard_normal((identities, dim)).astype(np.float32))
+    owner = rng.integers(0, identities, size=faces)
+    # Per-face noise level sets its cosine to the identity center
+    noise = rng.uniform(0.6, 1.4, size=(faces, 1)).astype(np.float32) / np.sqrt(dim)
+    vectors = centers[owner] + noise * rng.standard_normal((faces, dim)).astype(
+        np.float32
+    )
+    return centers, _normalise(vectors)
+
+
+def _timed(fn, queries):
+    times, results = [], []
+    for q in queries:
+        start = time.perf_counter()
+        results.append(fn(q))
+        times.append((time.perf_counter() - start) * 1000)
+    return np.array(times), results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--faces", type=int, default=200_000)
+    parser.add_argument("--identities", type=int, default=2_000)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--dim", type=int, default=512)
+    parser.add_argument("--threshold", type=float, default=0.6)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    centers, vectors = _synthetic_faces(rng, args.faces, args.identities, args.dim)
+    sample_noise = rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+    queries = _normalise(
+        centers[: args.queries] + 0.8 / np.sqrt(args.dim) * sample_noise
+    )
+
+    with tempfile.TemporaryDirectory() as root:
+        store = EmbeddingStore(root=root, dimension=args.dim)
+        partition = store.partition("bench")
+        ids = [f"photo:p{i // 5}:{i % 5}" for i in range(args.faces)]
+        for b in range(0, args.faces, 10_000):
+            partition.put(ids[b : b + 10_000], vectors[b : b + 10_000])
+
+        exact_store = QuantizedFaceIndex(store, min_rows=args.faces + 1)
+        quantized = QuantizedFaceIndex(store, min_rows=0)
+        start = time.perf_counter()
+        quantized.search(queries[0], ["bench"], min_score=args.threshold)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        def flat_f32(q):
+            scores = vectors @ q
+            return set(np.flatnonzero(scores >= args.threshold).tolist())
+
+        def as_rows(matches):
+            return {ids.index(m["face_id"]) for m in matches}
+
+        def store_f16(q):
+            return exact_store.search(
+                q, ["bench"], top_k=args.faces, min_score=args.threshold
+            )
+
+        def int8_rerank(q):
+            return quantized.search(
+                q, ["bench"], top_k=args.faces, min_score=args.threshold
+            )
+
+        f32_ms, f32_hits = _timed(flat_f32, queries)
+        f16_ms, f16_hits = _timed(store_f16, queries)
+        q8_ms, q8_hits = _timed(int8_rerank, queries)
+        _, emb, _, generation = partition.view()
+        candidates = [
+            len(
+                quantized._candidate_rows(
+                    "bench", emb, generation, q, args.threshold
+                )
+            )
+            for q in queries
+        ]
+
+        f16_rows = [as_rows(m) for m in f16_hits]
+        q8_rows = [as_rows(m) for m in q8_hits]
+        q8_vs_f16 = sum(a == b for a, b in zip(q8_rows, f16_rows))
+        q8_vs_f32 = sum(a == b for a, b in zip(q8_rows, f32_hits))
+        hits = np.mean([len(h) for h in f32_hits])
+
+        mb = args.faces * args.dim / 1e6
+        print(
+            f"{args.faces} faces x {args.dim} dims, {args.queries} queries, "
+            f"threshold {args.threshold}, avg {hits:.0f} hits/query"
+        )
+        print(f"{'method':<22}{'memory MB':>10}{'p50 ms':>9}{'p95 ms':>9}")
+        for name, memory, times in (
+            ("flat float32", 4 * mb, f32_ms),
+            ("store float16 exact", 2 * mb, f16_ms),
+            ("int8 + re-rank", 1 * mb, q8_ms),
+        ):
+            print(
+                f"{name:<22}{memory:>10.0f}{np.percentile(times, 50):>9.1f}"
+                f"{np.percentile(times, 95):>9.1f}"
+            )
+        print(f"int8 codes built in {build_ms:.0f} ms (first query)")
+        print(
+            f"int8 first pass kept {np.mean(candidates):.0f} candidates/query "
+            f"({100 * np.mean(candidates) / args.faces:.2f}% of faces)"
+        )
+        print(
+            f"threshold decisions identical to float16 store: "
+            f"{q8_vs_f16}/{args.queries}, to float32: {q8_vs_f32}/{args.queries}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import numpy as np
+
+from services.embedding_store import WeddingPartition
+
+DIM = 8
+
+
+def _partition(tmp_path, dtype="float32", **kwargs):
+    return WeddingPartition(str(tmp_path / "w1"), DIM, dtype, **kwargs)
+
+
+def _faces(photo_id, n, rng):
+    ids = [f"photo:{photo_id}:{i}" for i in range(n)]
+    vectors = rng.standard_normal((n, DIM)).astype(np.float32)
+    return ids, vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_put_get_and_side_table(tmp_path):
+    rng = np.random.default_rng(0)
+    part = _partition(tmp_path)
+    ids, vectors = _faces("p1", 3, rng)
+    part.put(ids, vectors * 5, bboxes=[[1, 2, 3, 4]] * 3, confidences=[0.9] * 3)
+
+    found, emb, side = part.get(["photo:p1:2", "photo:missing:0", "photo:p1:0"])
+    assert found == ["photo:p1:2", "photo:p1:0"]
+    np.testing.assert_allclose(emb, vectors[[2, 0]], atol=1e-6)  # normalised
+    assert side["bbox"].tolist() == [[1, 2, 3, 4]] * 2
+    np.testing.assert_allclose(side["confidence"], [0.9, 0.9])
+
+
+def test_delete_photo_and_snapshot(tmp_path):
+    rng = np.random.default_rng(1)
+    part = _partition(tmp_path)
+    for photo_id in ("p1", "p2", "p3"):
+        part.put(*_faces(photo_id, 2, rng))
+    part.delete_photo("p2")
+    part.put(["photo:p1:0"], rng.standard_normal((1, DIM)))  # supersedes
+
+    ids, emb, _ = part.snapshot()
+    assert sorted(ids) == ["photo:p1:0", "photo:p1:1", "photo:p3:0", "photo:p3:1"]
+    assert len(part) == 4 and emb.shape == (4, DIM)
+    ids, _, _ = part.photo_faces(["p1", "p2"])
+    assert ids == ["photo:p1:1", "photo:p1:0"]  # row order
+    assert part.photo_face_ids("p2") == []
+
+
+def test_second_process_sees_writes(tmp_path):
+    rng = np.random.default_rng(2)
+    writer, reader = _partition(tmp_path), _partition(tmp_path)
+    ids, vectors = _faces("p1", 2000, rng)  # grows the files past their initial size
+    writer.put(ids, vectors)
+    writer.delete(["photo:p1:5"])
+
+    reader.refresh()
+    assert len(reader) == 1999
+    found, emb, _ = reader.get(["photo:p1:1999"])
+    np.testing.assert_allclose(emb[0], vectors[1999], atol=1e-6)
+
+
+def test_compact_drops_dead_rows(tmp_path):
+    rng = np.random.default_rng(3)
+    part, other = _partition(tmp_path), _partition(tmp_path)
+    for photo_id in ("p1", "p2", "p3"):
+        part.put(*_faces(photo_id, 4, rng))
+    part.delete_photo("p2")
+    before = dict(zip(*part.snapshot()[:2]))
+    other.refresh()
+    generation = other.view()[3]
+
+    part.compact()
+    row_ids, emb, _, _ = part.view()
+    assert sorted(row_ids) == sorted(before)
+    for vid, vector in zip(row_ids, emb):
+        np.testing.assert_array_equal(vector, before[vid])
+
+    # The other process reloads the compacted partition and keeps writing to it
+    other.refresh()
+    assert other.view()[3] != generation
+    assert sorted(other.view()[0]) == sorted(before)
+    other.put(*_faces("p4", 1, rng))
+    part.refresh()
+    assert len(part) == 9 and None not in part.view()[0]
+
+
+def test_compacts_at_dead_row_ratio(tmp_path):
+    rng = np.random.default_rng(4)
+    part = _partition(tmp_path, "float16", compact_ratio=0.5)
+    ids, vectors = _faces("p1", 2000, rng)
+    part.put(ids, vectors)
+    part.delete(ids[:400])  # 800 dead rows of 2400: below the ratio
+    assert len(part.view()[0]) == 2400
+
+    part.delete(ids[400:1200])  # 2400 dead of 4000
+    row_ids, emb, _, _ = part.view()
+    assert row_ids == ids[1200:]
+    np.testing.assert_allclose(
+        np.asarray(emb, dtype=np.float32), vectors[1200:], atol=1e-3
+    )
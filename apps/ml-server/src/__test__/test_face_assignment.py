@@ -0,0 +1,143 @@
+import numpy as np
+import pytest
+
+from services.face_assignment import (
+    AssignmentRecord,
+    assign_faces,
+    assign_from_matches,
+    diff_assignments,
+    person_of,
+)
+
+GUEST_A = {"guest_id": "A", "user_id": None}
+GUEST_B = {"guest_id": "B", "user_id": None}
+USER_7 = {"guest_id": None, "user_id": 7}
+
+
+class FakeHashes:
+    """The RedisClient hash calls AssignmentRecord makes."""
+
+    def __init__(self):
+        self.hashes = {}
+
+    def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    def hmget(self, key, fields):
+        return [self.hashes.get(key, {}).get(f) for f in fields]
+
+    def hset_many(self, key, mapping):
+        self.hashes.setdefault(key, {}).update(mapping)
+
+    def hdel_many(self, key, fields):
+        for f in fields:
+            self.hashes.get(key, {}).pop(f, None)
+
+
+def _unit(*rows):
+    m = np.asarray(rows, dtype=np.float32)
+    return m / np.linalg.norm(m, axis=1, keepdims=True)
+
+
+def test_person_of():
+    assert person_of({"guest_id": "A", "user_id": 7}) == ("A", "7")
+    assert person_of({"guest_id": "", "user_id": ""}) is None
+    assert person_of(USER_7) == (None, "7")
+
+
+def test_one_person_per_face_and_per_photo():
+    samples = _unit([1, 0, 0], [0, 1, 0], [0.9, 0.1, 0])  # A, B, A again
+    metadata = [GUEST_A, GUEST_B, GUEST_A]
+    faces = _unit(
+        [1, 0, 0],  # p1: A 1.0
+        [0.95, 0.3, 0],  # p1: A 0.95 but A is taken in p1, B 0.3 below threshold
+        [0.6, 0.8, 0],  # p2: B 0.8, A 0.68 (best sample of A)
+        [0.7, 0.7, 0.1],  # p2: A 0.78, B 0.7; B is taken in p2 -> A
+    )
+    face_ids = ["f0", "f1", "f2", "f3"]
+    photo_ids = ["p1", "p1", "p2", "p2"]
+    assignment = assign_faces(face_ids, photo_ids, faces, samples, metadata, 0.5)
+    assert {f: a["guest_id"] for f, a in assignment.items()} == {
+        "f0": "A",
+        "f2": "B",
+        "f3": "A",
+    }
+    # A's best sample for f3 is the second one
+    assert assignment["f3"]["score"] == pytest.approx(float(faces[3] @ samples[2]))
+
+
+def test_assign_faces_blocks_give_the_same_answer():
+    rng = np.random.default_rng(0)
+    samples = _unit(*rng.standard_normal((6, 16)))
+    metadata = [{"guest_id": f"g{i % 4}"} for i in range(6)]
+    faces = rng.standard_normal((200, 16)).astype(np.float16)
+    face_ids = [f"f{i}" for i in range(200)]
+    photo_ids = [f"p{i // 5}" for i in range(200)]
+    whole = assign_faces(face_ids, photo_ids, faces, samples, metadata, 0.2)
+    blocked = assign_faces(
+        face_ids, photo_ids, faces, samples, metadata, 0.2, block_rows=7
+    )
+    assert whole == blocked and whole
+
+
+def test_assign_from_matches_uses_best_sample_per_person():
+    matches = [
+        [
+            {"guest_id": "A", "user_id": None, "score": 0.7},
+            {"guest_id": "A", "user_id": None, "score": 0.9},
+            {"guest_id": "B", "user_id": None, "score": 0.8},
+        ],
+        [{"guest_id": "A", "user_id": None, "score": 0.95}],
+        [{"guest_id": None, "user_id": None, "score": 0.99}],
+    ]
+    assignment = assign_from_matches(["f0", "f1", "f2"], ["p1", "p1", "p1"], matches)
+    assert assignment == {
+        "f1": {"guest_id": "A", "user_id": None, "score": 0.95},
+        "f0": {"guest_id": "B", "user_id": None, "score": 0.8},
+    }
+
+
+def test_diff_assignments():
+    previous = {
+        "same": {"guest_id": "A", "user_id": None, "score": 0.8},
+        "moved": {"guest_id": "A", "user_id": None, "score": 0.8},
+        "rescored": {"guest_id": "B", "user_id": None, "score": 0.8},
+        "gone": {"guest_id": "B", "user_id": None, "score": 0.7},
+        "elsewhere": {"guest_id": "C", "user_id": None, "score": 0.7},
+    }
+    current = {
+        "same": {"guest_id": "A", "user_id": None, "score": 0.80001},
+        "moved": {"guest_id": "B", "user_id": None, "score": 0.8},
+        "rescored": {"guest_id": "B", "user_id": None, "score": 0.9},
+        "new": {"guest_id": None, "user_id": "7", "score": 0.6},
+    }
+    face_ids = ["same", "moved", "rescored", "gone", "new", "never"]
+    changed, cleared = diff_assignments(previous, current, face_ids)
+    assert sorted(changed) == ["moved", "new", "rescored"]
+    assert cleared == ["gone"]  # "elsewhere" isn't among face_ids
+
+
+def test_assignment_record_round_trip():
+    record = AssignmentRecord(FakeHashes())
+    a = {"guest_id": "A", "user_id": None, "score": 0.8}
+    b = {"guest_id": None, "user_id": "7", "score": 0.9}
+    record.apply("w1", {"f1": a, "f2": b}, [])
+    record.apply("w1", {}, ["f2"])
+    record.apply("w2", {"f1": b}, [])
+    assert record.load("w1") == {"f1": a}
+    assert record.get("w1", ["f1", "f2"]) == {"f1": a}
+    assert record.get("w2", []) == {}
+
+
+def test_assignment_record_errors_are_best_effort():
+    class Broken:
+        def __getattr__(self, name):
+            def fail(*args, **kwargs):
+                raise ConnectionError("redis down")
+
+            return fail
+
+    record = AssignmentRecord(Broken())
+    assert record.load("w1") == {}
+    assert record.get("w1", ["f1"]) == {}
+    record.apply("w1", {"f1": {"guest_id": "A"}}, ["f2"])  # logged, not raised
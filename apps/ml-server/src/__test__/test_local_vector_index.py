@@ -0,0 +1,133 @@
+import multiprocessing
+
+import numpy as np
+import pytest
+
+from services.local_vector_index import LocalVectorIndex, matches_filter
+
+DIM = 8
+
+
+def _vector(seed):
+    return np.random.default_rng(seed).standard_normal(DIM).tolist()
+
+
+def _upsert(index, vid, seed, **metadata):
+    index.upsert([{"id": vid, "values": _vector(seed), "metadata": metadata}])
+
+
+def test_query_filters_and_scores(tmp_path):
+    index = LocalVectorIndex(str(tmp_path), dimension=DIM)
+    _upsert(index, "s1", 1, type="sample", wedding_id="w1")
+    _upsert(index, "s2", 2, type="sample", wedding_id="w2")
+    _upsert(index, "p1", 1, type="photo", wedding_id="w1", photo_id="ph1")
+
+    result = index.query(
+        _vector(1),
+        top_k=5,
+        include_metadata=True,
+        filter={"wedding_id": {"$eq": "w1"}, "type": "sample"},
+    )
+    assert [m["id"] for m in result["matches"]] == ["s1"]
+    assert result["matches"][0]["score"] == pytest.approx(1.0)
+    assert result["matches"][0]["metadata"]["wedding_id"] == "w1"
+
+    result = index.query(_vector(1), top_k=5, filter={"photo_id": {"$nin": ["ph1"]}})
+    assert sorted(m["id"] for m in result["matches"]) == ["s1", "s2"]
+
+
+def test_matches_filter_operators():
+    metadata = {"type": "photo", "wedding_id": ["w1", "w2"], "score": 3}
+    assert matches_filter(metadata, {"wedding_id": "w2"})
+    assert matches_filter(metadata, {"wedding_id": {"$in": ["w3", "w1"]}})
+    assert not matches_filter(metadata, {"wedding_id": {"$nin": ["w1"]}})
+    either = {"$or": [{"type": "sample"}, {"score": {"$gte": 3}}]}
+    assert matches_filter(metadata, either)
+    assert matches_filter(metadata, {"guest_id": {"$exists": False}})
+    with pytest.raises(ValueError):
+        matches_filter(metadata, {"score": {"$regex": "x"}})
+
+
+def test_upsert_replaces_and_delete(tmp_path):
+    index = LocalVectorIndex(str(tmp_path), dimension=DIM)
+    _upsert(index, "a", 1, type="photo", wedding_id="w1")
+    _upsert(index, "b", 2, type="photo", wedding_id="w1")
+    _upsert(index, "a", 3, type="photo", wedding_id="w2")
+
+    fetched = index.fetch(["a", "missing"])["vectors"]
+    assert list(fetched) == ["a"]
+    np.testing.assert_allclose(fetched["a"]["values"], _vector(3), rtol=1e-6)
+    assert fetched["a"]["metadata"]["wedding_id"] == "w2"
+    matches = index.query(_vector(1), filter={"wedding_id": "w1"})["matches"]
+    assert [m["id"] for m in matches] == ["b"]
+
+    index.delete(filter={"wedding_id": "w1"})
+    assert index.describe_index_stats()["total_vector_count"] == 1
+    index.delete(delete_all=True)
+    assert index.describe_index_stats()["total_vector_count"] == 0
+
+
+def test_reopen_replays_log(tmp_path):
+    index = LocalVectorIndex(str(tmp_path), dimension=DIM)
+    for i in range(1500):  # grows the vector file
+        _upsert(index, f"v{i}", i, type="photo")
+    index.delete(["v7"])
+    index.close()
+
+    reopened = LocalVectorIndex(str(tmp_path), dimension=DIM)
+    assert reopened.describe_index_stats()["total_vector_count"] == 1499
+    top = reopened.query(_vector(1234), top_k=1)["matches"][0]
+    assert top["id"] == "v1234" and top["score"] == pytest.approx(1.0)
+
+
+def test_compact_is_seen_by_other_instances(tmp_path):
+    writer = LocalVectorIndex(str(tmp_path), dimension=DIM)
+    reader = LocalVectorIndex(str(tmp_path), dimension=DIM)
+    for i in range(20):
+        _upsert(writer, f"v{i}", i, type="photo")
+    for i in range(10):
+        _upsert(writer, f"v{i}", 100 + i, type="photo")  # supersede
+    writer.delete([f"v{i}" for i in range(15, 20)])
+    writer.compact()
+    assert len(writer._ids) == 15
+
+    assert reader.describe_index_stats()["total_vector_count"] == 15
+    top = reader.query(_vector(103), top_k=1)["matches"][0]
+    assert top["id"] == "v3" and top["score"] == pytest.approx(1.0)
+    _upsert(reader, "new", 7, type="photo")
+    assert writer.fetch(["new"])["vectors"]["new"]["values"] == pytest.approx(
+        _vector(7)
+    )
+
+
+def _write_many(path, worker, count):
+    index = LocalVectorIndex(path, dimension=DIM)
+    for i in range(count):
+        _upsert(index, f"w{worker}:{i}", worker * 1000 + i, worker=worker)
+        if i % 10 == 9:
+            index.delete([f"w{worker}:{i - 5}"])
+        if worker == 0 and i % 50 == 49:
+            index.compact()
+
+
+def test_processes_share_an_index(tmp_path):
+    ctx = multiprocessing.get_context("spawn")
+    procs = [
+        ctx.Process(target=_write_many, args=(str(tmp_path), w, 100))
+        for w in range(3)
+    ]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join(60)
+        assert p.exitcode == 0
+
+    index = LocalVectorIndex(str(tmp_path), dimension=DIM)
+    assert index.describe_index_stats()["total_vector_count"] == 3 * 90
+    fetched = index.fetch([f"w{w}:{i}" for w in range(3) for i in range(100)])
+    for vid, record in fetched["vectors"].items():
+        worker, i = (int(x) for x in vid[1:].split(":"))
+        assert i % 10 != 4
+        np.testing.assert_allclose(
+            record["values"], _vector(worker * 1000 + i), rtol=1e-6
+        )
@@ -0,0 +1,135 @@
+import numpy as np
+import pytest
+
+from services.embedding_store import EmbeddingStore
+from services.quantized_index import QuantizedFaceIndex
+
+DIM = 32
+
+
+def _exact(store, wedding_id, query, min_score):
+    ids, emb, _ = store.partition(wedding_id).snapshot()
+    q = np.asarray(query, dtype=np.float32)
+    q = q / np.linalg.norm(q)
+    scores = np.asarray(emb, dtype=np.float32) @ q
+    return {vid: float(s) for vid, s in zip(ids, scores) if s >= min_score}
+
+
+def _store(tmp_path, dtype, rows=3000, seed=0):
+    rng = np.random.default_rng(seed)
+    store = EmbeddingStore(root=str(tmp_path), dimension=DIM, dtype=dtype)
+    vectors = rng.standard_normal((rows, DIM)).astype(np.float32)
+    ids = [f"photo:p{i // 3}:{i % 3}" for i in range(rows)]
+    store.partition("w1").put(ids, vectors, bboxes=[[0, 0, 10, 10]] * rows)
+    return store, rng
+
+
+@pytest.mark.parametrize("dtype", ["float16", "float32"])
+def test_matches_exact_scan(tmp_path, dtype):
+    store, rng = _store(tmp_path, dtype)
+    index = QuantizedFaceIndex(store, min_rows=0)
+    for _ in range(5):
+        query = rng.standard_normal(DIM)
+        expected = _exact(store, "w1", query, 0.3)
+        matches = index.search(query.tolist(), ["w1"], top_k=None, min_score=0.3)
+        assert {m["face_id"] for m in matches} == set(expected)
+        for m in matches:
+            assert m["score"] == pytest.approx(expected[m["face_id"]], abs=1e-5)
+        assert [m["score"] for m in matches] == sorted(
+            (m["score"] for m in matches), reverse=True
+        )
+
+
+@pytest.mark.parametrize("dtype", ["float16", "float32"])
+def test_search_leaves_store_unchanged(tmp_path, dtype):
+    store, rng = _store(tmp_path, dtype)
+    _, before, _ = store.partition("w1").snapshot()
+    before = np.array(before)
+    index = QuantizedFaceIndex(store, min_rows=0)
+    index.search(rng.standard_normal(DIM).tolist(), ["w1"], min_score=0.3)
+
+    reopened = EmbeddingStore(root=str(tmp_path), dimension=DIM, dtype=dtype)
+    _, after, _ = reopened.partition("w1").snapshot()
+    np.testing.assert_array_equal(np.asarray(after), before)
+
+
+@pytest.mark.parametrize("dtype", ["float16", "float32"])
+def test_appended_and_deleted_rows(tmp_path, dtype):
+    store, rng = _store(tmp_path, dtype)
+    index = QuantizedFaceIndex(store, min_rows=0)
+    query = rng.standard_normal(DIM)
+    index.search(query.tolist(), ["w1"], min_score=0.3)
+
+    partition = store.partition("w1")
+    partition.put(
+        [f"photo:new:{i}" for i in range(50)],
+        rng.standard_normal((50, DIM)),
+    )
+    partition.delete_photo("p0")
+    partition.delete_photo("p1")
+
+    expected = _exact(store, "w1", query, 0.3)
+    matches = index.search(query.tolist(), ["w1"], top_k=None, min_score=0.3)
+    assert {m["face_id"] for m in matches} == set(expected)
+    assert not any(m["photo_id"] in ("p0", "p1") for m in matches)
+
+
+def test_top_k(tmp_path):
+    store, rng = _store(tmp_path, "float16")
+    index = QuantizedFaceIndex(store, min_rows=0)
+    query = rng.standard_normal(DIM).tolist()
+    full = index.search(query, ["w1"], top_k=None, min_score=0.2)
+    assert len(full) > 10
+    assert index.search(query, ["w1"], top_k=10, min_score=0.2) == full[:10]
+
+
+def test_codes_rebuilt_after_compaction(tmp_path):
+    store, rng = _store(tmp_path, "float16")
+    index = QuantizedFaceIndex(store, min_rows=0)
+    query = rng.standard_normal(DIM)
+    index.search(query.tolist(), ["w1"], min_score=0.3)
+
+    partition = store.partition("w1")
+    for i in range(0, 500, 2):
+        partition.delete_photo(f"p{i}")
+    partition.compact()
+
+    expected = _exact(store, "w1", query, 0.3)
+    matches = index.search(query.tolist(), ["w1"], top_k=None, min_score=0.3)
+    assert {m["face_id"] for m in matches} == set(expected)
+
+
+def test_iter_search_pages(tmp_path):
+    store, rng = _store(tmp_path, "float32")
+    store.partition("w2").put(
+        [f"photo:q{i}:0" for i in range(500)], rng.standard_normal((500, DIM))
+    )
+    index = QuantizedFaceIndex(store, min_rows=0)
+    query = rng.standard_normal(DIM).tolist()
+    full = index.search(query, ["w1", "w2"], top_k=None, min_score=0.2)
+
+    pages = list(index.iter_search(query, ["w1", "w2"], min_score=0.2, page_size=50))
+    assert all(0 < len(page) <= 50 for page in pages)
+    for page in pages:
+        scores = [m["score"] for m in page]
+        assert scores == sorted(scores, reverse=True)
+    paged = [m for page in pages for m in page]
+    assert len(paged) == len(full)
+    assert sorted(m["face_id"] for m in paged) == sorted(m["face_id"] for m in full)
+
+
+def test_vector_db_pages_local_photo_faces(tmp_path):
+    from services.vector_db import VectorDBService
+
+    store, rng = _store(tmp_path / "store", "float16")
+    vector_db = VectorDBService(
+        api_key="", dimension=DIM, backend="local", local_path=str(tmp_path / "db")
+    )
+    vector_db.attach_photo_face_index(QuantizedFaceIndex(store, min_rows=0))
+    query = rng.standard_normal(DIM)
+    pages = list(
+        vector_db.iter_photo_faces(query.tolist(), ["w1"], min_score=0.3, page_size=40)
+    )
+    assert all(len(page) <= 40 for page in pages)
+    found = {m["face_id"] for page in pages for m in page}
+    assert found == set(_exact(store, "w1", query, 0.3))
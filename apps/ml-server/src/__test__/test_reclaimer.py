@@ -0,0 +1,114 @@
+import threading
+import time
+
+import worker
+
+
+class FakeStreams:
+    """The RedisClient stream calls the worker makes, recorded in memory."""
+
+    def __init__(self, claimable=(), deliveries=None, batches=()):
+        self.claimable = list(claimable)
+        self.deliveries = deliveries or {}
+        self.batches = list(batches)
+        self.touched = []
+        self.dead = []
+        self.acked = []
+        self.lock = threading.Lock()
+
+    def trim_acknowledged(self, stream_key, max_len):
+        return 0
+
+    def autoclaim(self, stream_key, group, consumer, min_idle_ms, start_id, count):
+        return "0-0", self.claimable[:count]
+
+    def delivery_counts(self, stream_key, group, message_ids):
+        return {mid: self.deliveries.get(mid, 1) for mid in message_ids}
+
+    def dead_letter(self, stream_key, group, dead_stream, message_id, fields, n):
+        self.dead.append((message_id, n))
+        return True
+
+    def touch_pending(self, stream_key, group, consumer, message_ids):
+        with self.lock:
+            self.touched.append((time.monotonic(), list(message_ids)))
+        return True
+
+    def read_from_group(self, stream_key, group, consumer, count, block_ms):
+        if not self.batches:
+            worker._shutdown.set()
+            return []
+        return self.batches.pop(0)
+
+    def acknowledge(self, stream_key, group, message_id):
+        self.acked.append(message_id)
+        return True
+
+
+def _msg(mid, event="noop"):
+    return (mid, {"event": event, "payload": "{}"})
+
+
+def test_claim_dead_letters_poison_messages(monkeypatch):
+    monkeypatch.setattr(worker, "MAX_DELIVERIES", 3)
+    streams = FakeStreams(
+        claimable=[_msg("1-0"), _msg("2-0"), _msg("3-0")],
+        deliveries={"1-0": 2, "2-0": 4, "3-0": 3},
+    )
+    claimed = worker._Reclaimer(streams).claim()
+    assert [mid for mid, _ in claimed] == ["1-0", "3-0"]
+    assert streams.dead == [("2-0", 4)]
+
+
+def test_claim_skips_excluded_messages():
+    streams = FakeStreams(claimable=[_msg("1-0"), _msg("2-0")])
+    claimed = worker._Reclaimer(streams).claim(exclude={"1-0"})
+    assert [mid for mid, _ in claimed] == ["2-0"]
+    assert not streams.dead
+
+
+def test_keep_alive_touches_during_a_long_job(monkeypatch):
+    monkeypatch.setattr(worker, "RECLAIM_INTERVAL_S", 0.05)
+    streams = FakeStreams()
+    reclaimer = worker._Reclaimer(streams)
+    with reclaimer.keep_alive(["1-0", "2-0"]):
+        time.sleep(0.3)
+    touches = len(streams.touched)
+    assert touches >= 4
+    assert all(ids == ["1-0", "2-0"] for _, ids in streams.touched)
+    time.sleep(0.1)
+    assert len(streams.touched) == touches  # the thread stopped with the job
+
+
+def test_sequential_loop_heartbeats_current_message(monkeypatch):
+    monkeypatch.setattr(worker, "RECLAIM_INTERVAL_S", 0.05)
+    monkeypatch.setattr(worker, "_maybe_log_metrics", lambda: None)
+    monkeypatch.setattr(worker, "_shutdown", threading.Event())
+    streams = FakeStreams(batches=[[_msg("1-0"), _msg("2-0")]])
+    running = []
+
+    def handle(fields, vector_db, prefetcher):
+        running.append(time.monotonic())
+        time.sleep(0.2)
+        return True
+
+    monkeypatch.setattr(worker, "_handle_message", handle)
+    worker._run_sequential_loop(streams, None)
+
+    assert streams.acked == ["1-0", "2-0"]
+    second_start = running[1]
+    during_first = [ids for t, ids in streams.touched if t < second_start]
+    during_second = [ids for t, ids in streams.touched if t > second_start]
+    assert ["1-0", "2-0"] in during_first[1:]
+    assert ["2-0"] in during_second
+
+
+def test_sequential_loop_leaves_unflushed_message_pending(monkeypatch):
+    monkeypatch.setattr(worker, "_maybe_log_metrics", lambda: None)
+    monkeypatch.setattr(worker, "_shutdown", threading.Event())
+    streams = FakeStreams(batches=[[_msg("1-0", "unflushed"), _msg("2-0")]])
+    monkeypatch.setattr(
+        worker, "_handle_message", lambda fields, db, p: fields["event"] == "noop"
+    )
+    worker._run_sequential_loop(streams, None)
+    assert streams.acked == ["2-0"]
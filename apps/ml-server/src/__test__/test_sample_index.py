@@ -0,0 +1,87 @@
+import numpy as np
+
+from services.sample_index import SampleIndex
+
+DIM = 4
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+        self.sets = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def incr(self, key):
+        self.values[key] = str(int(self.values.get(key, 0)) + 1)
+        return int(self.values[key])
+
+    def smembers(self, key):
+        return set(self.sets.get(key, ()))
+
+    def sadd_with_ttl(self, key, members, ttl_s):
+        self.sets.setdefault(key, set()).update(members)
+        return True
+
+
+class FakeVectorDB:
+    dimension = DIM
+
+    def __init__(self):
+        self.vectors = {}
+
+    def add(self, vid, values, guest_id):
+        self.vectors[vid] = {
+            "values": list(values),
+            "metadata": {"guest_id": guest_id, "type": "sample"},
+        }
+
+    def list_vectors_by_filter(self, filter, limit):
+        return [{"id": vid, **v} for vid, v in self.vectors.items()]
+
+    def fetch_vectors(self, ids):
+        return {vid: self.vectors[vid] for vid in ids if vid in self.vectors}
+
+
+def _guests(index, query):
+    return [m["guest_id"] for m in index.search("w1", [query], top_k=5)[0]]
+
+
+def test_upsert_patches_copy_at_previous_version():
+    redis, db = FakeRedis(), FakeVectorDB()
+    db.add("s1", [1, 0, 0, 0], "g1")
+    index = SampleIndex(db, redis)
+    assert _guests(index, [1, 0, 0, 0]) == ["g1"]
+
+    index.upsert("w1", "s2", [0, 1, 0, 0], {"guest_id": "g2"})
+    # Not in Pinecone's listing yet: served from the patched copy
+    assert _guests(index, [0, 1, 0, 0]) == ["g2"]
+
+
+def test_upsert_drops_copy_after_concurrent_bump():
+    redis, db = FakeRedis(), FakeVectorDB()
+    db.add("s1", [1, 0, 0, 0], "g1")
+    mine, other = SampleIndex(db, redis), SampleIndex(db, redis)
+    assert _guests(mine, [1, 0, 0, 0]) == ["g1"]
+
+    # Another process upserts a sample after our load ...
+    db.add("s3", [0, 0, 1, 0], "g3")
+    other.upsert("w1", "s3", [0, 0, 1, 0], {"guest_id": "g3"})
+    # ... and our own upsert must not stamp our copy with its version
+    db.add("s2", [0, 1, 0, 0], "g2")
+    mine.upsert("w1", "s2", [0, 1, 0, 0], {"guest_id": "g2"})
+
+    assert _guests(mine, [0, 0, 1, 0]) == ["g3"]
+    assert _guests(mine, [0, 1, 0, 0]) == ["g2"]
+
+
+def test_upsert_without_redis_patches_in_place():
+    db = FakeVectorDB()
+    db.add("s1", [1, 0, 0, 0], "g1")
+    index = SampleIndex(db)
+    index.search("w1", [[1, 0, 0, 0]])
+    index.upsert("w1", "s1", [0, 1, 0, 0], {"guest_id": "g1b"})
+    ids, matrix, metadata = index.samples("w1")
+    assert ids == ["s1"] and metadata == [{"guest_id": "g1b"}]
+    np.testing.assert_allclose(matrix[0], [0, 1, 0, 0])
@@ -0,0 +1,113 @@
+import threading
+import time
+
+import pytest
+
+from services import status_reporter
+from services.status_reporter import StatusReporter
+
+
+class FakeApi:
+    def __init__(self, bulk_ok=True, failing=()):
+        self.bulk_ok = bulk_ok
+        self.failing = set(failing)
+        self.bulk = []
+        self.patches = []
+        self.sent = threading.Event()
+
+    def post_photo_status_bulk(self, updates):
+        self.bulk.append(updates)
+        self.sent.set()
+        return self.bulk_ok
+
+    def patch_photo(self, photo_id, **fields):
+        self.patches.append(("photo", photo_id, fields))
+        return photo_id not in self.failing
+
+    def patch_processing_queue(self, photo_id, **fields):
+        self.patches.append(("queue", photo_id, fields))
+        return photo_id not in self.failing
+
+
+@pytest.fixture
+def api(monkeypatch):
+    api = FakeApi()
+    for name in ("post_photo_status_bulk", "patch_photo", "patch_processing_queue"):
+        monkeypatch.setattr(status_reporter, name, getattr(api, name))
+    return api
+
+
+def test_updates_merge_into_one_bulk_request(api):
+    reporter = StatusReporter(flush_interval_s=60, linger_ms=0)
+    reporter.update_photo("p1", status="processing")
+    reporter.update_queue("p1", status="processing", attempts=1)
+    reporter.update_photo("p1", status="completed", face_count=2)
+    reporter.update_photo("p2", status="failed", error_message=None)
+
+    assert reporter.flush("p1")
+    assert api.bulk == [
+        [
+            {
+                "photo_id": "p1",
+                "photo": {"status": "completed", "face_count": 2},
+                "queue": {"status": "processing", "attempts": 1},
+            },
+            {"photo_id": "p2", "photo": {"status": "failed"}, "queue": {}},
+        ]
+    ]
+    assert not api.patches
+    reporter.close()
+
+
+def test_failed_bulk_falls_back_to_single_patches(api):
+    api.bulk_ok = False
+    api.failing = {"p2"}
+    reporter = StatusReporter(flush_interval_s=60, linger_ms=0)
+    reporter.update_photo("p1", status="completed")
+    reporter.update_queue("p2", status="completed")
+
+    assert reporter.flush("p1")
+    assert not reporter.flush("p2")
+    # The failure is reported once; nothing is pending for p2 afterwards
+    assert reporter.flush("p2")
+    assert ("photo", "p1", {"status": "completed"}) in api.patches
+    assert ("queue", "p2", {"status": "completed"}) in api.patches
+    reporter.close()
+
+
+def test_flush_all_reports_any_failure(api):
+    api.bulk_ok = False
+    api.failing = {"p1"}
+    reporter = StatusReporter(flush_interval_s=60, linger_ms=0)
+    reporter.update_photo("p1", status="completed")
+    reporter.update_photo("p2", status="completed")
+    assert not reporter.flush()
+    assert reporter.flush()
+    reporter.close()
+
+
+def test_sends_on_timer_and_when_full(api):
+    reporter = StatusReporter(flush_interval_s=0.05, max_photos=100, linger_ms=0)
+    reporter.update_photo("p1", status="processing")
+    assert api.sent.wait(2)
+
+    api.sent.clear()
+    full = StatusReporter(flush_interval_s=60, max_photos=3, linger_ms=0)
+    for pid in ("a", "b"):
+        full.update_photo(pid, status="processing")
+    time.sleep(0.1)
+    assert len(api.bulk) == 1  # only the timer's send so far
+    full.update_photo("c", status="processing")
+    assert api.sent.wait(2)
+    assert [u["photo_id"] for u in api.bulk[-1]] == ["a", "b", "c"]
+    reporter.close()
+    full.close()
+
+
+def test_close_sends_pending(api):
+    reporter = StatusReporter(flush_interval_s=60, linger_ms=0)
+    reporter.update_queue("p1", status="completed")
+    reporter.close()
+    assert api.bulk == [
+        [{"photo_id": "p1", "photo": {}, "queue": {"status": "completed"}}]
+    ]
@@ -0,0 +1,276 @@
+import json
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import worker
+from services.embedding_store import EmbeddingStore
+from services.face_assignment import AssignmentRecord
+from services.quantized_index import QuantizedFaceIndex
+
+DIM = 4
+A = {"guest_id": "A", "user_id": None}
+B = {"guest_id": "B", "user_id": None}
+
+
+def _message(event, payload):
+    return {"event": event, "payload": json.dumps(payload)}
+
+
+def test_reprocess_and_rematch_are_separate_jobs(monkeypatch):
+    calls = []
+
+    def enqueue(ids):
+        calls.append(("queue", ids))
+        return len(ids)
+
+    monkeypatch.setattr(
+        worker, "_rematch_wedding", lambda w, db: calls.append(("rematch", w))
+    )
+    monkeypatch.setattr(worker, "get_wedding_photo_ids", lambda w: ["p1", "p2"])
+    monkeypatch.setattr(worker, "_enqueue_photo_jobs", enqueue)
+
+    class Ledger:
+        def forget_many(self, ids):
+            calls.append(("forget", ids))
+
+    monkeypatch.setattr(worker, "_ledger", Ledger)
+
+    worker._handle_message(_message("rematch_wedding", {"weddingId": "w1"}), None)
+    assert calls == [("rematch", "w1")]
+
+    calls.clear()
+    worker._handle_message(_message("reprocess_wedding", {"weddingId": "w1"}), None)
+    assert calls == [("forget", ["p1", "p2"]), ("queue", ["p1", "p2"])]
+
+    calls.clear()
+    full = {"weddingId": "w1", "full": True}
+    worker._handle_message(_message("rematch_wedding", full), None)
+    assert calls == [("forget", ["p1", "p2"]), ("queue", ["p1", "p2"])]
+
+
+class FakeHashes:
+    def __init__(self):
+        self.hashes = {}
+
+    def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    def hmget(self, key, fields):
+        return [self.hashes.get(key, {}).get(f) for f in fields]
+
+    def hset_many(self, key, mapping):
+        self.hashes.setdefault(key, {}).update(mapping)
+
+    def hdel_many(self, key, fields):
+        for f in fields:
+            self.hashes.get(key, {}).pop(f, None)
+
+
+class FakeLedger:
+    def face_counts(self, photo_ids):
+        return {}
+
+    def forget_many(self, photo_ids):
+        pass
+
+
+def _unit(v):
+    v = np.asarray(v, dtype=np.float32)
+    return v / np.linalg.norm(v)
+
+
+@pytest.fixture
+def wedding(tmp_path, monkeypatch):
+    """
+    Wedding w1 backed by a real embedding store; samples, API posts, the
+    assignment record and the ledger are in memory.
+    """
+    store = EmbeddingStore(root=str(tmp_path), dimension=DIM)
+    env = SimpleNamespace(
+        store=store,
+        photos=[],
+        samples=[],  # (vector_id, embedding, metadata)
+        posted=[],
+        fail=set(),
+        queued=[],
+        record=AssignmentRecord(FakeHashes()),
+    )
+
+    def add_photo(photo_id, *vectors):
+        env.photos.append(photo_id)
+        if vectors:
+            store.partition("w1").put(
+                [f"photo:{photo_id}:{i}" for i in range(len(vectors))],
+                [_unit(v) for v in vectors],
+                bboxes=[[10 * i, 0, 10 * i + 5, 5] for i in range(len(vectors))],
+            )
+
+    def samples(wedding_id):
+        return (
+            [vid for vid, _, _ in env.samples],
+            np.asarray([_unit(e) for _, e, _ in env.samples]),
+            [m for _, _, m in env.samples],
+        )
+
+    def post(tags, failed=None):
+        env.posted.append(tags)
+        bad = [t for t in tags if t["face_encoding_id"] in env.fail]
+        if failed is not None:
+            failed.extend(bad)
+        return len(tags) - len(bad)
+
+    def enqueue(photo_ids):
+        env.queued.extend(photo_ids)
+        return len(photo_ids)
+
+    env.add_photo = add_photo
+    monkeypatch.setattr(worker, "EMBEDDING_STORE_ENABLED", True)
+    monkeypatch.setattr(worker, "SIMILARITY_THRESHOLD", 0.5)
+    monkeypatch.setattr(worker, "_embeddings", lambda: store)
+    monkeypatch.setattr(worker, "_ledger", FakeLedger)
+    monkeypatch.setattr(worker, "_assignments", lambda: env.record)
+    monkeypatch.setattr(
+        worker, "_samples", lambda db: SimpleNamespace(samples=samples)
+    )
+    monkeypatch.setattr(worker, "get_wedding_photo_ids", lambda w: list(env.photos))
+    monkeypatch.setattr(worker, "post_photo_tags_bulk", post)
+    monkeypatch.setattr(worker, "_enqueue_photo_jobs", enqueue)
+    return env
+
+
+def _people(tags):
+    return {t["face_encoding_id"]: t["guest_id"] for t in tags}
+
+
+def test_rematch_posts_only_changed_tags(wedding):
+    wedding.samples = [("sA", [1, 0, 0, 0], A), ("sB", [0, 1, 0, 0], B)]
+    wedding.add_photo("p1", [1, 0.1, 0, 0], [0.9, 0.2, 0, 0])  # both prefer A
+    wedding.add_photo("p2", [0.2, 1, 0, 0])
+    wedding.add_photo("p3")  # never processed
+    db = SimpleNamespace(dimension=DIM)
+
+    worker._rematch_wedding("w1", db)
+    (tags,) = wedding.posted
+    # One A per photo: the second face of p1 stays untagged
+    assert _people(tags) == {"photo:p1:0": "A", "photo:p2:0": "B"}
+    assert all(t["replace"] for t in tags)
+    assert tags[0]["bounding_box"] == {"x": 0, "y": 0, "width": 5, "height": 5}
+    assert wedding.queued == ["p3"]
+
+    wedding.posted.clear()
+    worker._rematch_wedding("w1", db)
+    assert wedding.posted == []
+
+    # B's new sample is closer to p1's second face than A's
+    wedding.samples.append(("sB2", [0.9, 0.25, 0, 0], B))
+    worker._rematch_wedding("w1", db)
+    (tags,) = wedding.posted
+    assert _people(tags) == {"photo:p1:1": "B"}
+
+
+def test_failed_tags_are_posted_again(wedding):
+    wedding.samples = [("sA", [1, 0, 0, 0], A)]
+    wedding.add_photo("p1", [1, 0, 0, 0])
+    wedding.add_photo("p2", [0.9, 0.1, 0, 0])
+    wedding.fail = {"photo:p2:0"}
+    db = SimpleNamespace(dimension=DIM)
+
+    worker._rematch_wedding("w1", db)
+    assert set(wedding.record.load("w1")) == {"photo:p1:0"}
+
+    wedding.fail = set()
+    wedding.posted.clear()
+    worker._rematch_wedding("w1", db)
+    (tags,) = wedding.posted
+    assert _people(tags) == {"photo:p2:0": "A"}
+
+
+def test_post_assignment_diff_clears_and_drops_stale_faces(wedding):
+    a = {"guest_id": "A", "user_id": None, "score": 0.9}
+    wedding.record.apply("w1", {"photo:p1:0": a, "photo:p9:0": a}, [])
+    posted = worker._post_assignment_diff(
+        "w1",
+        wedding.record.load("w1"),
+        {},
+        ["photo:p1:0"],
+        [[0, 0, 4, 4]],
+        stale=["photo:p9:0"],
+    )
+    assert posted == 1
+    (tags,) = wedding.posted
+    assert tags[0]["face_encoding_id"] == "photo:p1:0"
+    assert tags[0]["guest_id"] is None and tags[0]["user_id"] is None
+    assert wedding.record.load("w1") == {}
+
+
+def _local_db(store):
+    """vector_db whose photo-face pages come from the local quantized index."""
+    index = QuantizedFaceIndex(store, min_rows=0)
+    return SimpleNamespace(
+        dimension=DIM,
+        iter_photo_faces=lambda query_embedding, wedding_ids, min_score: (
+            index.iter_search(query_embedding, wedding_ids, min_score=min_score)
+        ),
+    )
+
+
+def test_new_sample_takes_contested_face(wedding):
+    wedding.samples = [("sA", [1, 0, 0, 0], A), ("sB", [0, 0, 1, 0], B)]
+    wedding.add_photo("p1", [0.8, 0.6, 0, 0], [0.7, 0, 0, 0.714])  # A: 0.8, 0.7
+    wedding.add_photo("p2", [0, 0, 1, 0])  # B with the old sample
+    wedding.add_photo("p3", [0, 0, 0, 1])
+    db = _local_db(wedding.store)
+    worker._rematch_wedding("w1", db)
+    assert _people(wedding.posted[0]) == {"photo:p1:0": "A", "photo:p2:0": "B"}
+    wedding.posted.clear()
+
+    # B replaces their sample: p1's first face now scores 0.96 for B
+    new_sample = ("sB", [0.6, 0.8, 0, 0], B)
+    wedding.samples[1] = new_sample
+    worker._reconcile_new_sample(
+        db,
+        embedding=new_sample[1],
+        guest_id="B",
+        user_id=None,
+        new_samples={"w1": new_sample},
+    )
+
+    tags = [t for batch in wedding.posted for t in batch]
+    # B takes the contested face, A moves to the other face of p1, and B's
+    # old face in p2 (matched by the replaced sample only) is cleared
+    assert _people(tags) == {
+        "photo:p1:0": "B",
+        "photo:p1:1": "A",
+        "photo:p2:0": None,
+    }
+    by_face = {t["face_encoding_id"]: t for t in tags}
+    assert by_face["photo:p1:0"]["confidence_score"] == pytest.approx(0.96, abs=1e-3)
+    assert by_face["photo:p2:0"]["user_id"] is None
+    assert all(t["replace"] for t in tags)
+    record = wedding.record.load("w1")
+    assert {vid: a["guest_id"] for vid, a in record.items()} == {
+        "photo:p1:0": "B",
+        "photo:p1:1": "A",
+    }
+
+
+def test_unmatched_new_sample_changes_nothing(wedding):
+    wedding.samples = [("sA", [1, 0, 0, 0], A)]
+    wedding.add_photo("p1", [1, 0, 0, 0])
+    db = _local_db(wedding.store)
+    worker._rematch_wedding("w1", db)
+    wedding.posted.clear()
+
+    new_sample = ("sC", [0, 0, 0, 1], {"guest_id": "C", "user_id": None})
+    wedding.samples.append(new_sample)
+    worker._reconcile_new_sample(
+        db,
+        embedding=new_sample[1],
+        guest_id="C",
+        user_id=None,
+        new_samples={"w1": new_sample},
+    )
+    assert wedding.posted == []
+    assert wedding.queued == []
@@ -0,0 +1,242 @@
+"""
+asyncio variant of the AI pipeline worker (WORKER_MODE=async).
+
+One event loop keeps up to ASYNC_MAX_IN_FLIGHT jobs in flight. Stream reads
+and acks use redis.asyncio; face inference runs on a thread pool sized for
+full batches on every pooled model, so models stay busy while other jobs wait
+on the network. The remaining blocking calls (internal API, S3 / HTTP
+downloads, Pinecone) run via asyncio.to_thread on a bounded I/O pool. Job
+logic is shared with worker.py.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+import redis
+
+from services.api_client import get_photo
+from services.metrics import metrics
+from services.redis_service import create_async_client
+from worker import (
+    CONSUMER_GROUP,
+    CONSUMER_NAME,
+    INFERENCE_MAX_BATCH,
+    STREAM_KEY,
+    VectorDBService,
+    _download_image,
+    _extract_photo_faces,
+    _fail_photo,
+    _finish_photo,
+    _handle_message,
+    _maybe_log_metrics,
+    _models,
+    _Reclaimer,
+    _redis,
+    _shutdown,
+    _start_photo,
+    _start_worker,
+    _status,
+    _status_flushed,
+    _stored_faces,
+)
+
+logger = logging.getLogger(__name__)
+
+# Jobs read from the stream but not yet acked
+ASYNC_MAX_IN_FLIGHT = max(1, int(os.getenv("ASYNC_MAX_IN_FLIGHT", "32")))
+# Threads for blocking API / download / Pinecone calls
+ASYNC_IO_THREADS = max(1, int(os.getenv("ASYNC_IO_THREADS", "32")))
+
+
+async def process_photo_job_async(
+    photo_id: str, vector_db: VectorDBService, inference_pool: ThreadPoolExecutor
+) -> bool:
+    """Same flow as worker.process_photo_job, awaiting each I/O stage."""
+    photo = await asyncio.to_thread(get_photo, photo_id)
+    started = _start_photo(photo_id, photo)
+    if started is None:
+        return False
+    wedding_id, original_url, started_at = started
+
+    # Own buffer: the I/O thread may download another photo before inference runs
+    image = await asyncio.to_thread(_download_image, original_url, reuse_buffer=False)
+    if image is None:
+        _fail_photo(photo_id, "Download failed")
+        return False
+
+    loop = asyncio.get_running_loop()
+    try:
+        content_hash, faces = await asyncio.to_thread(
+            _stored_faces, photo_id, wedding_id, image, vector_db
+        )
+        reused = faces is not None
+        if faces is None:
+            faces = await loop.run_in_executor(
+                inference_pool, _extract_photo_faces, image
+            )
+    except Exception as e:
+        logger.exception("Face extraction failed for %s", photo_id)
+        _fail_photo(photo_id, str(e))
+        return False
+    finally:
+        image.close()
+
+    return await asyncio.to_thread(
+        _finish_photo,
+        photo_id,
+        wedding_id,
+        original_url,
+        faces,
+        started_at,
+        vector_db,
+        content_hash,
+        reused,
+    )
+
+
+async def _handle_message_async(
+    fields: Dict[str, Any],
+    vector_db: VectorDBService,
+    inference_pool: ThreadPoolExecutor,
+) -> bool:
+    """
+    Run one stream entry's job. Exceptions are logged, never raised.
+    Returns False when the message must stay pending (see _handle_message).
+    """
+    if fields.get("event") != "photo_process":
+        return await asyncio.to_thread(_handle_message, fields, vector_db)
+    try:
+        payload = json.loads(fields.get("payload") or "{}")
+    except json.JSONDecodeError:
+        payload = {}
+    photo_id = payload.get("photoId")
+    job_start = time.perf_counter()
+    ack = True
+    try:
+        if photo_id:
+            try:
+                await process_photo_job_async(photo_id, vector_db, inference_pool)
+            finally:
+                # Terminal status must reach the API before the message is acked
+                ack = await asyncio.to_thread(_status_flushed, photo_id)
+    except Exception as e:
+        logger.exception("Job failed for photo_process: %s", e)
+    finally:
+        metrics().observe(
+            "job.photo_process_ms", (time.perf_counter() - job_start) * 1000
+        )
+    return ack
+
+
+async def _read(client, count: int, block_ms: int) -> List[tuple]:
+    try:
+        result = await client.xreadgroup(
+            groupname=CONSUMER_GROUP,
+            consumername=CONSUMER_NAME,
+            streams={STREAM_KEY: ">"},
+            count=count,
+            block=block_ms,
+        )
+    except redis.exceptions.TimeoutError:
+        return []
+    except redis.RedisError as e:
+        logger.error("Redis XREADGROUP failed", exc_info=e)
+        await asyncio.sleep(1)
+        return []
+    if not result:
+        return []
+    return [(msg_id, dict(fields)) for msg_id, fields in result[0][1]]
+
+
+async def _run_job(client, message_id: str, fields, vector_db, inference_pool) -> None:
+    ack = True
+    try:
+        ack = await _handle_message_async(fields, vector_db, inference_pool)
+    finally:
+        if ack:
+            try:
+                await client.xack(STREAM_KEY, CONSUMER_GROUP, message_id)
+            except redis.RedisError as e:
+                logger.error("Redis XACK failed for %s", message_id, exc_info=e)
+
+
+async def _run_async_loop(vector_db: VectorDBService) -> None:
+    logger.info(
+        "Async worker started, reading from %s (%d in flight max, %d I/O threads)",
+        STREAM_KEY,
+        ASYNC_MAX_IN_FLIGHT,
+        ASYNC_IO_THREADS,
+    )
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(
+        ThreadPoolExecutor(max_workers=ASYNC_IO_THREADS, thread_name_prefix="io")
+    )
+    # Threads beyond the model pool queue their photos for batched inference
+    inference_pool = ThreadPoolExecutor(
+        max_workers=_models().pool_size * INFERENCE_MAX_BATCH,
+        thread_name_prefix="inference",
+    )
+    client = create_async_client()
+    reclaimer = _Reclaimer(_redis())
+    in_flight: Dict[asyncio.Task, str] = {}
+    idle_cycles = 0
+    try:
+        while in_flight or not _shutdown.is_set():
+            _maybe_log_metrics()
+            if reclaimer.heartbeat_due():
+                await asyncio.to_thread(reclaimer.heartbeat, list(in_flight.values()))
+            capacity = ASYNC_MAX_IN_FLIGHT - len(in_flight)
+            messages: List[tuple] = []
+            if capacity > 0 and not _shutdown.is_set():
+                if idle_cycles == 0 and not in_flight:
+                    logger.info("Waiting for jobs...")
+                if reclaimer.due():
+                    messages = await asyncio.to_thread(
+                        reclaimer.claim, set(in_flight.values()), capacity
+                    )
+                if not messages:
+                    messages = await _read(
+                        client, capacity, block_ms=100 if in_flight else 5000
+                    )
+                for message_id, fields in messages:
+                    task = asyncio.create_task(
+                        _run_job(client, message_id, fields, vector_db, inference_pool)
+                    )
+                    in_flight[task] = message_id
+                    task.add_done_callback(lambda t: in_flight.pop(t, None))
+                if messages:
+                    idle_cycles = 0
+                elif not in_flight:
+                    idle_cycles += 1
+                    if idle_cycles % 6 == 1 and idle_cycles > 1:
+                        logger.info("Idle, waiting for jobs...")
+                    continue
+            metrics().set_gauge("worker.in_flight", len(in_flight))
+            if in_flight and (not messages or len(in_flight) >= ASYNC_MAX_IN_FLIGHT):
+                await asyncio.wait(
+                    list(in_flight), timeout=0.5, return_when=asyncio.FIRST_COMPLETED
+                )
+    finally:
+        inference_pool.shutdown(wait=True)
+        await client.aclose()
+    logger.info("Worker %s stopped", CONSUMER_NAME)
+
+
+def run_async_worker():
+    """Entry point for WORKER_MODE=async (same setup as worker.run_worker)."""
+    started = _start_worker()
+    if started is None:
+        return
+    _, vector_db = started
+    try:
+        asyncio.run(_run_async_loop(vector_db))
+    finally:
+        _status().close()
+
+
+if __name__ == "__main__":
+    run_async_worker()
@@ -4,14 +4,28 @@ Calls Express internal routes with x-internal-secret.
 """
 import os
 import logging
+import threading
+import time
 from typing import Any, Dict, List, Optional
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .metrics import metrics
 
 logger = logging.getLogger(__name__)
 
 API_BASE = os.getenv("API_BASE_URL", "http://localhost:9090")
 INTERNAL_SECRET = os.getenv("INTERNAL_SECRET", "")
+# Keep-alive connections to the API per worker process (size to WORKER_CONCURRENCY)
+API_POOL_SIZE = int(os.getenv("API_POOL_SIZE", "16"))
+# Retries for idempotent calls (GET, and PATCHes that set absolute field values)
+API_MAX_RETRIES = int(os.getenv("API_MAX_RETRIES", "3"))
+API_RETRY_BACKOFF = float(os.getenv("API_RETRY_BACKOFF", "0.3"))
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
 
 
 def _headers() -> Dict[str, str]:
@@ -21,10 +35,65 @@ def _headers() -> Dict[str, str]:
     }
 
 
+def _build_retry() -> Retry:
+    kwargs: Dict[str, Any] = dict(
+        total=API_MAX_RETRIES,
+        connect=API_MAX_RETRIES,
+        read=API_MAX_RETRIES,
+        status=API_MAX_RETRIES,
+        status_forcelist=(429, 502, 503, 504),
+        # POST creates rows (tags, samples), so it is never retried automatically
+        allowed_methods=frozenset({"GET", "HEAD", "PATCH"}),
+        backoff_factor=API_RETRY_BACKOFF,
+        raise_on_status=False,
+        respect_retry_after_header=True,
+    )
+    try:
+        return Retry(backoff_jitter=API_RETRY_BACKOFF, **kwargs)
+    except TypeError:
+        # urllib3 < 2 has no jitter option
+        return Retry(**kwargs)
+
+
+def _get_session() -> requests.Session:
+    """Process-wide pooled keep-alive session for all internal API calls."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=1,
+                    pool_maxsize=API_POOL_SIZE,
+                    max_retries=_build_retry(),
+                )
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session = session
+    return _session
+
+
+def _request(method: str, endpoint: str, url: str, **kwargs) -> requests.Response:
+    """Send through the pooled session and record latency as api.<endpoint>_ms."""
+    start = time.perf_counter()
+    try:
+        r = _get_session().request(method, url, **kwargs)
+    except requests.RequestException:
+        metrics().incr(f"api.{endpoint}.errors")
+        raise
+    finally:
+        metrics().observe(f"api.{endpoint}_ms", (time.perf_counter() - start) * 1000)
+    if r.status_code >= 400:
+        metrics().incr(f"api.{endpoint}.errors")
+    return r
+
+
 def get_photo(photo_id: str) -> Optional[Dict[str, Any]]:
     """GET /internal/photos/:photoId"""
     try:
-        r = requests.get(
+        r = _request(
+            "GET",
+            "get_photo",
             f"{API_BASE}/internal/photos/{photo_id}",
             headers=_headers(),
             timeout=30,
@@ -58,7 +127,9 @@ def patch_photo(
     if not body:
         return True
     try:
-        r = requests.patch(
+        r = _request(
+            "PATCH",
+            "patch_photo",
             f"{API_BASE}/internal/photos/{photo_id}",
             json=body,
             headers=_headers(),
@@ -74,7 +145,9 @@ def patch_photo(
 def get_guest_encodings(wedding_id: str) -> List[Dict[str, Any]]:
     """GET /internal/weddings/:weddingId/guest-encodings"""
     try:
-        r = requests.get(
+        r = _request(
+            "GET",
+            "get_guest_encodings",
             f"{API_BASE}/internal/weddings/{wedding_id}/guest-encodings",
             headers=_headers(),
             timeout=15,
@@ -90,7 +163,7 @@ def get_guest_encodings(wedding_id: str) -> List[Dict[str, Any]]:
         return []
 
 
-def post_photo_tag(
+def _photo_tag_body(
     photo_id: str,
     *,
     guest_id: Optional[str] = None,
@@ -98,8 +171,8 @@ def post_photo_tag(
     confidence_score: Optional[float] = None,
     bounding_box: Optional[Dict[str, int]] = None,
     face_encoding_id: Optional[str] = None,
-) -> bool:
-    """POST /internal/photo-tags"""
+    replace: bool = False,
+) -> Dict[str, Any]:
     body: Dict[str, Any] = {"photoId": photo_id}
     if guest_id is not None:
         body["guestId"] = guest_id
@@ -111,8 +184,33 @@ def post_photo_tag(
         body["boundingBox"] = bounding_box
     if face_encoding_id is not None:
         body["faceEncodingId"] = face_encoding_id
+    if replace:
+        body["replace"] = True
+    return body
+
+
+def post_photo_tag(
+    photo_id: str,
+    *,
+    guest_id: Optional[str] = None,
+    user_id: Optional[int] = None,
+    confidence_score: Optional[float] = None,
+    bounding_box: Optional[Dict[str, int]] = None,
+    face_encoding_id: Optional[str] = None,
+) -> bool:
+    """POST /internal/photo-tags"""
+    body = _photo_tag_body(
+        photo_id,
+        guest_id=guest_id,
+        user_id=user_id,
+        confidence_score=confidence_score,
+        bounding_box=bounding_box,
+        face_encoding_id=face_encoding_id,
+    )
     try:
-        r = requests.post(
+        r = _request(
+            "POST",
+            "post_photo_tag",
             f"{API_BASE}/internal/photo-tags",
             json=body,
             headers=_headers(),
@@ -125,6 +223,51 @@ def post_photo_tag(
         return False
 
 
+# Server-side cap on tags per bulk request
+PHOTO_TAGS_BULK_CHUNK = 500
+
+
+def post_photo_tags_bulk(
+    tags: List[Dict[str, Any]],
+    chunk_size: int = PHOTO_TAGS_BULK_CHUNK,
+    failed: Optional[List[Dict[str, Any]]] = None,
+) -> int:
+    """
+    POST /internal/photo-tags/bulk in chunks.
+    Each tag is a dict with post_photo_tag's arguments:
+    photo_id, guest_id, user_id, confidence_score, bounding_box, face_encoding_id.
+    The API upserts by (photo_id, face_encoding_id), so re-posting is safe.
+    With replace=True a tag overwrites the face's person even at a lower score
+    (no guest_id / user_id clears it).
+    Returns the number of tags created or updated. Failed chunks are logged
+    and skipped; their tags are appended to failed when given.
+    """
+    bodies = [_photo_tag_body(**tag) for tag in tags]
+    created = 0
+    for i in range(0, len(bodies), chunk_size):
+        chunk = bodies[i : i + chunk_size]
+        try:
+            r = _request(
+                "POST",
+                "post_photo_tags_bulk",
+                f"{API_BASE}/internal/photo-tags/bulk",
+                json={"tags": chunk},
+                headers=_headers(),
+                timeout=30,
+            )
+            r.raise_for_status()
+            data = r.json()
+            payload = data.get("data", data) if isinstance(data, dict) else {}
+            created += int(payload.get("count", len(chunk)))
+        except (requests.RequestException, ValueError) as e:
+            logger.error(
+                "post_photo_tags_bulk failed for %d tags: %s", len(chunk), e
+            )
+            if failed is not None:
+                failed.extend(tags[i : i + chunk_size])
+    return created
+
+
 def patch_processing_queue(
     photo_id: str,
     *,
@@ -155,7 +298,9 @@ def patch_processing_queue(
     if not body:
         return True
     try:
-        r = requests.patch(
+        r = _request(
+            "PATCH",
+            "patch_processing_queue",
             f"{API_BASE}/internal/processing-queue/{photo_id}",
             json=body,
             headers=_headers(),
@@ -168,6 +313,61 @@ def patch_processing_queue(
         return False
 
 
+_PHOTO_STATUS_FIELDS = {
+    "processing_status": "processingStatus",
+    "faces_detected": "facesDetected",
+    "processed_at": "processedAt",
+    "ai_error_message": "aiErrorMessage",
+}
+_QUEUE_STATUS_FIELDS = {
+    "status": "status",
+    "started_at": "startedAt",
+    "faces_found": "facesFound",
+    "matches_created": "matchesCreated",
+    "completed_at": "completedAt",
+    "error_message": "errorMessage",
+    "processing_time_ms": "processingTimeMs",
+}
+
+
+def post_photo_status_bulk(updates: List[Dict[str, Any]]) -> bool:
+    """
+    POST /internal/photo-status/bulk
+    Each update: {"photo_id", "photo": {patch_photo kwargs}, "queue": {patch_processing_queue kwargs}}.
+    Applied by the API in one transaction.
+    """
+    body = []
+    for update in updates:
+        item: Dict[str, Any] = {"photoId": update["photo_id"]}
+        photo = update.get("photo") or {}
+        queue = update.get("queue") or {}
+        if photo:
+            item["photo"] = {
+                _PHOTO_STATUS_FIELDS[k]: v for k, v in photo.items() if v is not None
+            }
+        if queue:
+            item["queue"] = {
+                _QUEUE_STATUS_FIELDS[k]: v for k, v in queue.items() if v is not None
+            }
+        body.append(item)
+    if not body:
+        return True
+    try:
+        r = _request(
+            "POST",
+            "post_photo_status_bulk",
+            f"{API_BASE}/internal/photo-status/bulk",
+            json={"updates": body},
+            headers=_headers(),
+            timeout=30,
+        )
+        r.raise_for_status()
+        return True
+    except requests.RequestException as e:
+        logger.error("post_photo_status_bulk failed for %d photos: %s", len(body), e)
+        return False
+
+
 def post_face_sample(
     *,
     user_id: Optional[int] = None,
@@ -195,7 +395,9 @@ def post_face_sample(
     if encoding_quality is not None:
         body["encodingQuality"] = encoding_quality
     try:
-        r = requests.post(
+        r = _request(
+            "POST",
+            "post_face_sample",
             f"{API_BASE}/internal/face-samples",
             json=body,
             headers=_headers(),
@@ -226,7 +428,9 @@ def patch_guest(
     if not body:
         return True
     try:
-        r = requests.patch(
+        r = _request(
+            "PATCH",
+            "patch_guest",
             f"{API_BASE}/internal/guests/{guest_id}",
             json=body,
             headers=_headers(),
@@ -254,7 +458,9 @@ def patch_user(
     if not body:
         return True
     try:
-        r = requests.patch(
+        r = _request(
+            "PATCH",
+            "patch_user",
             f"{API_BASE}/internal/users/{user_id}",
             json=body,
             headers=_headers(),
@@ -270,7 +476,9 @@ def patch_user(
 def get_wedding_photo_ids(wedding_id: str) -> List[str]:
     """GET /internal/weddings/:weddingId/photo-ids"""
     try:
-        r = requests.get(
+        r = _request(
+            "GET",
+            "get_wedding_photo_ids",
             f"{API_BASE}/internal/weddings/{wedding_id}/photo-ids",
             headers=_headers(),
             timeout=30,
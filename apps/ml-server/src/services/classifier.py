@@ -1,6 +1,6 @@
 import os
 from typing import List, Dict, Optional
-from .face_processor import FaceProcessor
+from .model_registry import ModelRegistry
 from .vector_db import VectorDBService
 from .s3_client import S3Client
 import logging
@@ -14,7 +14,7 @@ class PhotoClassifier:
     """
     
     def __init__(self, s3_client: S3Client, vector_db: VectorDBService):
-        self.face_processor = FaceProcessor()
+        self.face_processor = ModelRegistry.get_instance().get_face_processor()
         self.s3_client = s3_client
         self.vector_db = vector_db
     
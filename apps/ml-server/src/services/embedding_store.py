@@ -0,0 +1,400 @@
+"""
+Compact on-disk store of photo-face embeddings, partitioned by wedding.
+
+Each wedding directory holds:
+- embeddings.f16 (or .f32): contiguous (rows, dim) array, L2-normalised, memory-mapped
+- faces.bin: side table per row (bbox, detection confidence), memory-mapped
+- ids.log: append-only "<id>" / "-<id>" lines; line order = row order, "-" = delete
+
+ids.log is the commit point: a row is visible only after its id line is
+written, so several worker processes can share a partition (writes take an
+flock) and readers pick up new rows by reading the log tail. Reads return
+NumPy views of the mapped file without copying. Once dead rows (superseded,
+deleted, and the tombstones themselves) make up EMBEDDING_STORE_COMPACT_RATIO
+of a partition, the writer rewrites it without them; other processes see the
+new ids.log and reload.
+"""
+import fcntl
+import logging
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_STORE_PATH = os.getenv("EMBEDDING_STORE_PATH", "data/embeddings")
+EMBEDDING_STORE_DTYPE = os.getenv("EMBEDDING_STORE_DTYPE", "float16")
+EMBEDDING_STORE_MAX_OPEN = int(os.getenv("EMBEDDING_STORE_MAX_OPEN", "32"))
+# Compact a partition once this fraction of its rows is dead (<= 0: never)
+EMBEDDING_STORE_COMPACT_RATIO = float(
+    os.getenv("EMBEDDING_STORE_COMPACT_RATIO", "0.5")
+)
+
+FACE_DTYPE = np.dtype([("bbox", "<i4", (4,)), ("confidence", "<f4")])
+_INITIAL_ROWS = 1024
+# Rows copied per block when compacting
+_COMPACT_BLOCK_ROWS = 65536
+
+
+class WeddingPartition:
+    def __init__(
+        self,
+        path: str,
+        dimension: int,
+        dtype: str,
+        compact_ratio: float = EMBEDDING_STORE_COMPACT_RATIO,
+    ):
+        self.path = path
+        self.dimension = dimension
+        self.dtype = np.dtype(dtype)
+        self.compact_ratio = compact_ratio
+        os.makedirs(path, exist_ok=True)
+        suffix = "f16" if self.dtype == np.float16 else "f32"
+        self._emb_path = os.path.join(path, f"embeddings.{suffix}")
+        self._faces_path = os.path.join(path, "faces.bin")
+        self._ids_path = os.path.join(path, "ids.log")
+        self._lock_path = os.path.join(path, ".lock")
+        self._lock = threading.RLock()
+
+        # row -> id; None once superseded or deleted
+        self._row_ids: List[Optional[str]] = []
+        self._rows: Dict[str, int] = {}  # id -> live row
+        self._ids_offset = 0  # bytes of ids.log already applied
+        self._ids_ino: Optional[int] = None
+        # Bumped whenever rows move (a compaction), see view()
+        self.generation = 0
+        self._emb: Optional[np.memmap] = None
+        self._faces: Optional[np.memmap] = None
+        with self._file_lock():
+            self._map()
+            self._refresh_locked()
+
+    # --- files -------------------------------------------------------------
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        with open(self._lock_path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _map(self) -> None:
+        """
+        (Re)map data files; capacity is whatever the files currently hold.
+        Creates them at the initial size, so the first call must hold the file lock.
+        """
+        row_bytes = self.dimension * self.dtype.itemsize
+        for path, size in (
+            (self._emb_path, row_bytes),
+            (self._faces_path, FACE_DTYPE.itemsize),
+        ):
+            if not os.path.exists(path) or os.path.getsize(path) < size * _INITIAL_ROWS:
+                with open(path, "ab") as f:
+                    f.truncate(size * _INITIAL_ROWS)
+        capacity = min(
+            os.path.getsize(self._emb_path) // row_bytes,
+            os.path.getsize(self._faces_path) // FACE_DTYPE.itemsize,
+        )
+        self._emb = np.memmap(
+            self._emb_path,
+            dtype=self.dtype,
+            mode="r+",
+            shape=(capacity, self.dimension),
+        )
+        self._faces = np.memmap(
+            self._faces_path, dtype=FACE_DTYPE, mode="r+", shape=(capacity,)
+        )
+
+    def _grow(self, rows: int) -> None:
+        """Extend files to hold rows (caller holds the file lock)."""
+        capacity = self._emb.shape[0]
+        if rows <= capacity:
+            return
+        new_capacity = max(rows, capacity * 2)
+        self._emb.flush()
+        self._faces.flush()
+        with open(self._emb_path, "ab") as f:
+            f.truncate(new_capacity * self.dimension * self.dtype.itemsize)
+        with open(self._faces_path, "ab") as f:
+            f.truncate(new_capacity * FACE_DTYPE.itemsize)
+        self._map()
+
+    def refresh(self) -> None:
+        """Apply ids.log lines written since the last refresh (by any process)."""
+        try:
+            st = os.stat(self._ids_path)
+        except FileNotFoundError:
+            return
+        if st.st_ino == self._ids_ino and st.st_size == self._ids_offset:
+            return
+        with self._lock, self._file_lock():
+            self._refresh_locked()
+
+    def _refresh_locked(self) -> None:
+        """Replay the ids.log tail (caller holds the file lock)."""
+        with self._lock:
+            if not os.path.exists(self._ids_path):
+                return
+            with open(self._ids_path, "rb") as f:
+                ino = os.fstat(f.fileno()).st_ino
+                compacted = self._ids_ino is not None and ino != self._ids_ino
+                if compacted:
+                    # Another process compacted: replay the new log from the start
+                    self._row_ids = []
+                    self._rows = {}
+                    self._ids_offset = 0
+                    self.generation += 1
+                self._ids_ino = ino
+                f.seek(self._ids_offset)
+                data = f.read()
+            # Only apply complete lines; a writer may be mid-append
+            end = data.rfind(b"\n") + 1
+            for line in data[:end].decode().splitlines():
+                if line.startswith("-"):
+                    row = self._rows.pop(line[1:], None)
+                    if row is not None:
+                        self._row_ids[row] = None
+                    self._row_ids.append(None)
+                    continue
+                old = self._rows.get(line)
+                if old is not None:
+                    self._row_ids[old] = None
+                self._rows[line] = len(self._row_ids)
+                self._row_ids.append(line)
+            self._ids_offset += end
+            if compacted or len(self._row_ids) > self._emb.shape[0]:
+                # New files, or another process grew them
+                self._map()
+
+    # --- writes ------------------------------------------------------------
+
+    def put(
+        self,
+        ids: Sequence[str],
+        embeddings,
+        bboxes: Optional[Sequence[Sequence[int]]] = None,
+        confidences: Optional[Sequence[float]] = None,
+    ) -> None:
+        """Append (or replace) faces. Embeddings are L2-normalised before storage."""
+        if not ids:
+            return
+        vectors = np.asarray(embeddings, dtype=np.float32).reshape(
+            len(ids), self.dimension
+        )
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        vectors = vectors / norms
+        with self._lock, self._file_lock():
+            self._refresh_locked()
+            start = len(self._row_ids)
+            self._grow(start + len(ids))
+            self._emb[start : start + len(ids)] = vectors.astype(self.dtype)
+            faces = np.zeros(len(ids), dtype=FACE_DTYPE)
+            if bboxes is not None:
+                faces["bbox"] = np.asarray(bboxes, dtype=np.int32).reshape(-1, 4)
+            if confidences is not None:
+                faces["confidence"] = np.asarray(confidences, dtype=np.float32)
+            self._faces[start : start + len(ids)] = faces
+            self._emb.flush()
+            self._faces.flush()
+            with open(self._ids_path, "ab") as f:
+                f.write("".join(f"{vid}\n" for vid in ids).encode())
+            self._refresh_locked()
+            self._maybe_compact()
+
+    def delete(self, ids: Sequence[str]) -> None:
+        """Delete ids (tombstone rows are skipped by all reads)."""
+        with self._lock, self._file_lock():
+            self._refresh_locked()
+            present = [vid for vid in ids if vid in self._rows]
+            if not present:
+                return
+            self._grow(len(self._row_ids) + len(present))
+            with open(self._ids_path, "ab") as f:
+                f.write("".join(f"-{vid}\n" for vid in present).encode())
+            self._refresh_locked()
+            self._maybe_compact()
+
+    def delete_photo(self, photo_id: str) -> None:
+        self.refresh()
+        self.delete(self.photo_face_ids(photo_id))
+
+    def _maybe_compact(self) -> None:
+        """Compact when dead rows pass compact_ratio (caller holds the file lock)."""
+        total = len(self._row_ids)
+        dead = total - len(self._rows)
+        if (
+            self.compact_ratio > 0
+            and dead >= _INITIAL_ROWS
+            and dead >= total * self.compact_ratio
+        ):
+            self._compact_locked()
+
+    def compact(self) -> None:
+        """Rewrite the partition without its dead rows."""
+        with self._lock, self._file_lock():
+            self._refresh_locked()
+            self._compact_locked()
+
+    def _compact_locked(self) -> None:
+        live = np.fromiter(
+            (r for r, vid in enumerate(self._row_ids) if vid is not None),
+            dtype=np.int64,
+            count=len(self._rows),
+        )
+        capacity = max(len(live), _INITIAL_ROWS)
+        for path, data in (
+            (self._emb_path, self._emb),
+            (self._faces_path, self._faces),
+        ):
+            tmp = path + ".tmp"
+            with open(tmp, "wb") as f:
+                for b in range(0, len(live), _COMPACT_BLOCK_ROWS):
+                    f.write(data[live[b : b + _COMPACT_BLOCK_ROWS]].tobytes())
+                f.truncate(capacity * data[:1].nbytes)
+            os.replace(tmp, path)
+        tmp = self._ids_path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write("".join(f"{self._row_ids[r]}\n" for r in live).encode())
+        # Data files first: a process that sees the new log maps the new files
+        os.replace(tmp, self._ids_path)
+        dead = len(self._row_ids) - len(live)
+        self._refresh_locked()
+        metrics().incr("embedding_store.compactions")
+        logger.info(
+            "Compacted %s: %d live rows, %d dead rows dropped",
+            self.path,
+            len(live),
+            dead,
+        )
+
+    # --- reads -------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def snapshot(self) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        """
+        Consistent view of the live faces: (ids, embeddings, side table), aligned
+        by position. embeddings / side table are zero-copy memmap slices when no
+        rows are dead, otherwise gathered copies of the live rows.
+        """
+        with self._lock:
+            count = len(self._row_ids)
+            if len(self._rows) == count:
+                return list(self._row_ids), self._emb[:count], self._faces[:count]
+            rows = np.fromiter(
+                (r for r, vid in enumerate(self._row_ids) if vid is not None),
+                dtype=np.int64,
+                count=len(self._rows),
+            )
+            ids = [self._row_ids[r] for r in rows]
+            return ids, self._emb[rows], self._faces[rows]
+
+    def view(self) -> Tuple[List[Optional[str]], np.ndarray, np.ndarray]:
+        """
+        Zero-copy view of every row: (row_ids, embeddings, side table,
+        generation). Dead rows (superseded or deleted) have row_id None. Rows
+        only move when the partition is compacted, which bumps generation, so
+        callers can cache per-row data for a generation and only process rows
+        added since their last view.
+        """
+        with self._lock:
+            count = len(self._row_ids)
+            return (
+                list(self._row_ids),
+                self._emb[:count],
+                self._faces[:count],
+                self.generation,
+            )
+
+    def get(self, ids: Sequence[str]) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        """(found_ids, float32 embeddings, side-table rows) for ids in the store."""
+        with self._lock:
+            found = [vid for vid in ids if vid in self._rows]
+            rows = np.array([self._rows[vid] for vid in found], dtype=np.int64)
+            return (
+                found,
+                np.asarray(self._emb[rows], dtype=np.float32),
+                self._faces[rows],
+            )
+
+    def photo_faces(
+        self, photo_ids: Iterable[str]
+    ) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        """
+        (ids, embeddings, side table) of the live faces of photo_ids, in row
+        order. Gathers only those rows, unlike snapshot() with dead rows.
+        """
+        wanted = set(photo_ids)
+        with self._lock:
+            rows = sorted(
+                row
+                for vid, row in self._rows.items()
+                if vid[len("photo:") :].rsplit(":", 1)[0] in wanted
+            )
+            rows = np.asarray(rows, dtype=np.int64)
+            ids = [self._row_ids[r] for r in rows]
+            return ids, self._emb[rows], self._faces[rows]
+
+    def photo_face_ids(self, photo_id: str) -> List[str]:
+        prefix = f"photo:{photo_id}:"
+        with self._lock:
+            return [vid for vid in self._rows if vid.startswith(prefix)]
+
+
+class EmbeddingStore:
+    """Opens wedding partitions on demand and keeps the most recent ones mapped."""
+
+    _instance: Optional["EmbeddingStore"] = None
+    _instance_lock = threading.Lock()
+
+    def __init__(
+        self,
+        root: str = EMBEDDING_STORE_PATH,
+        dimension: int = 512,
+        dtype: str = EMBEDDING_STORE_DTYPE,
+        max_open: int = EMBEDDING_STORE_MAX_OPEN,
+    ):
+        self.root = root
+        self.dimension = dimension
+        self.dtype = dtype
+        self.max_open = max(1, max_open)
+        self._open: "OrderedDict[str, WeddingPartition]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def get_instance(cls) -> "EmbeddingStore":
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    def partition(self, wedding_id: str) -> WeddingPartition:
+        with self._lock:
+            part = self._open.get(wedding_id)
+            if part is None:
+                part = WeddingPartition(
+                    os.path.join(self.root, str(wedding_id)),
+                    self.dimension,
+                    self.dtype,
+                )
+                self._open[wedding_id] = part
+                while len(self._open) > self.max_open:
+                    self._open.popitem(last=False)
+            else:
+                self._open.move_to_end(wedding_id)
+        part.refresh()
+        return part
+
+    def has_partition(self, wedding_id: str) -> bool:
+        return os.path.exists(os.path.join(self.root, str(wedding_id), "ids.log"))
@@ -0,0 +1,279 @@
+"""
+Wedding-wide assignment of photo faces to guests / users.
+
+Every photo face is scored against every sample of the wedding with blocked
+matrix products, and each person (guest or user) keeps the score of their best
+sample. Faces are then assigned greedily in descending score order under two
+constraints: a face gets at most one person, and a person is tagged at most
+once per photo. The result is compared with the previous assignment, kept per
+wedding in Redis, to get the tags that changed.
+
+Both constraints are local to a photo, so assigning a subset of photos gives
+the same answer for those photos as assigning the whole wedding. That lets a
+photo job or a new sample re-assign only the photos it affects.
+"""
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .metrics import metrics
+from .redis_service import RedisClient
+
+logger = logging.getLogger(__name__)
+
+# Faces scored per matrix product (block x samples float32 scores)
+FACE_ASSIGN_BLOCK_ROWS = int(os.getenv("FACE_ASSIGN_BLOCK_ROWS", "4096"))
+# Score changes smaller than this don't count as a tag change
+_SCORE_TOLERANCE = 1e-4
+_RECORD_KEY = "ai:assignment:{wedding_id}"
+
+# (guest_id, user_id) of a sample's owner
+Person = Tuple[Optional[str], Optional[str]]
+
+
+def person_of(metadata: Dict[str, Any]) -> Optional[Person]:
+    """(guest_id, user_id) of a sample or assignment; None if it has neither."""
+    guest_id = metadata.get("guest_id") or None
+    user_id = metadata.get("user_id")
+    user_id = str(user_id) if user_id not in (None, "") else None
+    if guest_id is None and user_id is None:
+        return None
+    return guest_id, user_id
+
+
+def _people(
+    sample_metadata: Sequence[Dict[str, Any]],
+) -> Tuple[List[Person], np.ndarray, np.ndarray]:
+    """
+    (people, sample order, group starts): sample columns sorted by owner, and
+    where each owner's run starts, for np.maximum.reduceat. Samples without
+    an owner are left out.
+    """
+    index: Dict[Person, int] = {}
+    owners = []
+    columns = []
+    for col, metadata in enumerate(sample_metadata):
+        person = person_of(metadata)
+        if person is None:
+            continue
+        owners.append(index.setdefault(person, len(index)))
+        columns.append(col)
+    people = list(index)
+    if not columns:
+        return people, np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    owners = np.asarray(owners)
+    order = np.argsort(owners, kind="stable")
+    starts = np.flatnonzero(np.r_[True, np.diff(owners[order]) != 0])
+    return people, np.asarray(columns)[order], starts
+
+
+def score_people(
+    embeddings,
+    sample_matrix: np.ndarray,
+    sample_metadata: Sequence[Dict[str, Any]],
+    min_score: float,
+    block_rows: int = FACE_ASSIGN_BLOCK_ROWS,
+) -> Tuple[List[Person], np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Candidate (face, person) pairs with cosine >= min_score, using each
+    person's best sample. embeddings is any (faces, dim) array (e.g. a float16
+    memmap); rows are normalised per block.
+    Returns (people, face rows, person indices, scores).
+    """
+    people, order, starts = _people(sample_metadata)
+    face_rows, person_idx, scores = [], [], []
+    if not people or len(embeddings) == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return people, empty, empty, np.empty(0, dtype=np.float32)
+    samples_t = np.ascontiguousarray(sample_matrix[order].T, dtype=np.float32)
+    for b in range(0, len(embeddings), block_rows):
+        block = np.asarray(embeddings[b : b + block_rows], dtype=np.float32)
+        norms = np.linalg.norm(block, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        block_scores = (block / norms) @ samples_t  # (faces, samples by owner)
+        best = np.maximum.reduceat(block_scores, starts, axis=1)  # (faces, people)
+        rows, cols = np.nonzero(best >= min_score)
+        face_rows.append(rows + b)
+        person_idx.append(cols)
+        scores.append(best[rows, cols])
+    return (
+        people,
+        np.concatenate(face_rows),
+        np.concatenate(person_idx),
+        np.concatenate(scores),
+    )
+
+
+def _greedy(
+    rows: np.ndarray,
+    person_idx: np.ndarray,
+    scores: np.ndarray,
+    face_ids: Sequence[str],
+    photo_ids: Sequence[str],
+    people: Sequence[Person],
+) -> Dict[str, Dict[str, Any]]:
+    """Greedy on sorted scores: each face and each (photo, person) used once."""
+    assignment: Dict[str, Dict[str, Any]] = {}
+    taken_faces = set()
+    taken_in_photo = set()
+    for i in np.argsort(-scores, kind="stable"):
+        row = int(rows[i])
+        if row in taken_faces:
+            continue
+        photo_person = (photo_ids[row], int(person_idx[i]))
+        if photo_person in taken_in_photo:
+            continue
+        taken_faces.add(row)
+        taken_in_photo.add(photo_person)
+        guest_id, user_id = people[person_idx[i]]
+        assignment[face_ids[row]] = {
+            "guest_id": guest_id,
+            "user_id": user_id,
+            "score": float(scores[i]),
+        }
+    return assignment
+
+
+def assign_faces(
+    face_ids: Sequence[str],
+    photo_ids: Sequence[str],
+    embeddings,
+    sample_matrix: np.ndarray,
+    sample_metadata: Sequence[Dict[str, Any]],
+    min_score: float,
+    block_rows: int = FACE_ASSIGN_BLOCK_ROWS,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Assign faces (face_ids[i] in photo photo_ids[i], embedding row i) to people.
+    Returns face_id -> {"guest_id", "user_id", "score"} for assigned faces.
+    """
+    start = time.perf_counter()
+    people, rows, person_idx, scores = score_people(
+        embeddings, sample_matrix, sample_metadata, min_score, block_rows
+    )
+    assignment = _greedy(rows, person_idx, scores, face_ids, photo_ids, people)
+    metrics().observe("assign.ms", (time.perf_counter() - start) * 1000)
+    metrics().observe_count("assign.candidates", len(scores))
+    return assignment
+
+
+def assign_from_matches(
+    face_ids: Sequence[str],
+    photo_ids: Sequence[str],
+    match_lists: Sequence[Sequence[Dict[str, Any]]],
+) -> Dict[str, Dict[str, Any]]:
+    """
+    assign_faces for faces already matched against the samples: match_lists[i]
+    are face i's sample matches (SampleIndex / Pinecone search format).
+    """
+    index: Dict[Person, int] = {}
+    rows, person_idx, scores = [], [], []
+    for row, matches in enumerate(match_lists):
+        best: Dict[int, float] = {}
+        for match in matches or []:
+            person = person_of(match)
+            if person is None:
+                continue
+            p = index.setdefault(person, len(index))
+            best[p] = max(best.get(p, -1.0), float(match["score"]))
+        for p, score in best.items():
+            rows.append(row)
+            person_idx.append(p)
+            scores.append(score)
+    return _greedy(
+        np.asarray(rows, dtype=np.int64),
+        np.asarray(person_idx, dtype=np.int64),
+        np.asarray(scores, dtype=np.float64),
+        face_ids,
+        photo_ids,
+        list(index),
+    )
+
+
+def diff_assignments(
+    previous: Dict[str, Dict[str, Any]],
+    current: Dict[str, Dict[str, Any]],
+    face_ids: Sequence[str],
+) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+    """
+    Tag changes among face_ids: (changed, cleared). changed maps faces whose
+    person or score differs from previous to their new assignment; cleared
+    lists faces that had a person before and have none now.
+    """
+    changed: Dict[str, Dict[str, Any]] = {}
+    cleared: List[str] = []
+    for face_id in face_ids:
+        new = current.get(face_id)
+        old = previous.get(face_id)
+        if new is None:
+            if old is not None:
+                cleared.append(face_id)
+            continue
+        if (
+            old is None
+            or old.get("guest_id") != new["guest_id"]
+            or old.get("user_id") != new["user_id"]
+            or abs(float(old.get("score", 0)) - new["score"]) > _SCORE_TOLERANCE
+        ):
+            changed[face_id] = new
+    return changed, cleared
+
+
+class AssignmentRecord:
+    """
+    Last applied assignment per wedding (Redis hash face_id -> JSON), the
+    baseline for diff_assignments. Best effort: errors are logged, and a
+    missing record means every assignment counts as changed.
+    """
+
+    def __init__(self, redis_client: RedisClient):
+        self.redis_client = redis_client
+
+    def load(self, wedding_id: str) -> Dict[str, Dict[str, Any]]:
+        try:
+            raw = self.redis_client.hgetall(_RECORD_KEY.format(wedding_id=wedding_id))
+            return {face_id: json.loads(value) for face_id, value in raw.items()}
+        except Exception as e:
+            logger.warning("Assignment record read failed for %s: %s", wedding_id, e)
+            return {}
+
+    def get(
+        self, wedding_id: str, face_ids: Sequence[str]
+    ) -> Dict[str, Dict[str, Any]]:
+        """Recorded assignments of face_ids (faces without one are left out)."""
+        if not face_ids:
+            return {}
+        try:
+            raw = self.redis_client.hmget(
+                _RECORD_KEY.format(wedding_id=wedding_id), list(face_ids)
+            )
+        except Exception as e:
+            logger.warning("Assignment record read failed for %s: %s", wedding_id, e)
+            return {}
+        return {
+            face_id: json.loads(value)
+            for face_id, value in zip(face_ids, raw)
+            if value
+        }
+
+    def apply(
+        self,
+        wedding_id: str,
+        changed: Dict[str, Dict[str, Any]],
+        removed: Sequence[str],
+    ) -> None:
+        """Store changed assignments and drop removed faces from the record."""
+        key = _RECORD_KEY.format(wedding_id=wedding_id)
+        try:
+            if changed:
+                self.redis_client.hset_many(
+                    key, {face_id: json.dumps(a) for face_id, a in changed.items()}
+                )
+            if removed:
+                self.redis_client.hdel_many(key, list(removed))
+        except Exception as e:
+            logger.warning("Assignment record write failed for %s: %s", wedding_id, e)
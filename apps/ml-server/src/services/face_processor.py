@@ -1,27 +1,125 @@
 import numpy as np
 import insightface
 from insightface.app import FaceAnalysis
+from insightface.app.common import Face
+from insightface.utils import face_align
 import cv2
-from typing import List, Dict, Optional
+import onnxruntime
+import io
+import time
+from typing import List, Dict, Optional, Sequence, Tuple, Union
 import logging
 
+from .metrics import metrics
+
 logger = logging.getLogger(__name__)
 
+# Smallest face (px at detector input) SCRFD finds reliably
+_DET_MIN_FACE_PX = 16
+_REDUCED_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+# SOFn markers carry the frame size; C4/C8/CC are DHT/JPG/DAC
+_JPEG_SOF = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+# Encoded image: a file path or the file's bytes (e.g. a download buffer)
+ImageSource = Union[str, bytes, bytearray, memoryview]
+
+
+def _decode(source: ImageSource, flags: int = cv2.IMREAD_COLOR) -> Optional[np.ndarray]:
+    if isinstance(source, str):
+        return cv2.imread(source, flags)
+    return cv2.imdecode(np.frombuffer(source, dtype=np.uint8), flags)
+
+
+def _jpeg_size(source: ImageSource) -> Optional[Tuple[int, int]]:
+    """(width, height) from a JPEG frame header without decoding; None if not JPEG."""
+    try:
+        opened = open(source, "rb") if isinstance(source, str) else io.BytesIO(source)
+        with opened as f:
+            if f.read(2) != b"\xff\xd8":
+                return None
+            while True:
+                marker = f.read(2)
+                if len(marker) < 2 or marker[0] != 0xFF:
+                    return None
+                if marker[1] in (0x01, 0xFF) or 0xD0 <= marker[1] <= 0xD7:
+                    continue
+                length = int.from_bytes(f.read(2), "big")
+                if marker[1] in _JPEG_SOF:
+                    header = f.read(5)
+                    if len(header) < 5:
+                        return None
+                    height = int.from_bytes(header[1:3], "big")
+                    width = int.from_bytes(header[3:5], "big")
+                    return (width, height) if width and height else None
+                f.seek(length - 2, 1)
+    except (OSError, ValueError):
+        return None
+
+# (image, face, scale, (x, y)): a face detected in image, which is the original
+# scaled down by scale and/or cropped at (x, y) in original coordinates
+_Detection = Tuple[np.ndarray, Face, float, Tuple[int, int]]
+
 
 class FaceProcessor:
-    def __init__(self, model_name="buffalo_l", det_size=(640, 640)):
+    def __init__(
+        self,
+        model_name="buffalo_l",
+        det_size=(640, 640),
+        intra_op_threads: Optional[int] = None,
+        adaptive_resolution: bool = False,
+        min_face_px: int = 48,
+        max_det_size: int = 1280,
+        rerun_below_px: int = 48,
+    ):
         """
         Initialize InsightFace model
         buffalo_l: High accuracy model
         det_size: Detection size (larger = more accurate but slower)
+        intra_op_threads: Cap ONNX Runtime threads per session (None = one per core).
+            Set this when several worker processes share a machine.
+        adaptive_resolution: Decode JPEGs at reduced resolution and size detection
+            per image (see _read_image / _det_size_for) instead of a fixed det_size.
+        min_face_px: Smallest face, in original pixels, adaptive mode sizes
+            detection for (up to max_det_size).
+        rerun_below_px: In adaptive mode, faces smaller than this in the reduced
+            image are re-detected and embedded from the full-resolution region.
         """
+        self.det_size = det_size
+        self.adaptive_resolution = adaptive_resolution
+        self.min_face_px = max(1, min_face_px)
+        self.max_det_size = max(det_size[0], max_det_size)
+        self.rerun_below_px = rerun_below_px
         self.app = FaceAnalysis(
             # name=model_name, providers=["CUDAExecutionProvider", "CPUExecutionProvider"]
             name=model_name, providers=["CPUExecutionProvider"]
         )
+        if intra_op_threads:
+            self._limit_threads(intra_op_threads)
         self.app.prepare(ctx_id=0, det_size=det_size)
         logger.info(f"FaceProcessor initialized with model: {model_name}")
 
+    def _limit_threads(self, intra_op_threads: int):
+        """
+        Recreate each model's ONNX session with a fixed thread count.
+        FaceAnalysis does not forward SessionOptions to its sessions, so swap them here.
+        """
+        opts = onnxruntime.SessionOptions()
+        opts.intra_op_num_threads = intra_op_threads
+        opts.inter_op_num_threads = 1
+        for model in self.app.models.values():
+            model.session = onnxruntime.InferenceSession(
+                model.model_file,
+                sess_options=opts,
+                providers=["CPUExecutionProvider"],
+            )
+        logger.info(f"ONNX sessions limited to {intra_op_threads} intra-op threads")
+
     def extract_faces(self, image_path: str, min_confidence: float = 0.5) -> List[Dict]:
         """
         Extract all faces from an image with their embeddings
@@ -34,42 +132,10 @@ class FaceProcessor:
             - landmarks: facial landmarks
         """
         try:
-            # Read image
-            img = cv2.imread(image_path)
-            if img is None:
+            results = self.extract_faces_batch([image_path], min_confidence)[0]
+            if results is None:
                 raise ValueError(f"Cannot read image: {image_path}")
 
-            # Detect faces
-            faces = self.app.get(img)
-
-            results = []
-            for idx, face in enumerate(faces):
-                # Filter by confidence
-                if face.det_score < min_confidence:
-                    logger.debug(
-                        f"Skipping face {idx} with low confidence: {face.det_score}"
-                    )
-                    continue
-
-                # Normalize embedding (InsightFace embeddings are already L2 normalized)
-                embedding = face.embedding
-
-                # Extract face data
-                face_data = {
-                    "embedding": embedding.tolist(),  # Convert to list for JSON serialization
-                    "bbox": face.bbox.astype(int).tolist(),  # [x1, y1, x2, y2]
-                    "confidence": float(face.det_score),
-                    "landmarks": (
-                        face.kps.astype(int).tolist() if hasattr(face, "kps") else None
-                    ),
-                    "face_area": self._calculate_face_area(face.bbox),
-                    # Optional: age, gender if you need them
-                    "age": int(face.age) if hasattr(face, "age") else None,
-                    "gender": int(face.gender) if hasattr(face, "gender") else None,
-                }
-
-                results.append(face_data)
-
             logger.info(f"Extracted {len(results)} faces from {image_path}")
             return results
 
@@ -77,12 +143,224 @@ class FaceProcessor:
             logger.error(f"Error extracting faces from {image_path}: {str(e)}")
             raise
 
-    def extract_single_face(self, image_path: str) -> Optional[Dict]:
+    def extract_faces_from_bytes(
+        self,
+        image_bytes: Union[bytes, bytearray, memoryview],
+        min_confidence: float = 0.5,
+    ) -> List[Dict]:
+        """
+        extract_faces for an encoded image held in memory (decoded with
+        cv2.imdecode, no temp file). Raises ValueError if it cannot be decoded.
+        """
+        results = self.extract_faces_batch([image_bytes], min_confidence)[0]
+        if results is None:
+            raise ValueError(f"Cannot decode image ({len(image_bytes)} bytes)")
+        logger.info(f"Extracted {len(results)} faces from in-memory image")
+        return results
+
+    def extract_faces_batch(
+        self,
+        images: Sequence[Union[ImageSource, np.ndarray]],
+        min_confidence: float = 0.5,
+        rec_batch_size: int = 64,
+    ) -> List[Optional[List[Dict]]]:
+        """
+        Extract faces from several images (paths, encoded bytes or BGR arrays).
+        Detection runs per image (the bundled detector takes one image per run);
+        the aligned crops of all faces from all images then go through the
+        recognition model in batches of rec_batch_size instead of one run per face.
+
+        Returns:
+            One list per image, in input order, with the same dicts as
+            extract_faces; None for an image that could not be read
+        """
+        rec_model = self.app.models.get("recognition")
+        detected: List[Optional[List[_Detection]]] = []
+        for image in images:
+            if isinstance(image, np.ndarray):
+                img, scale = image, 1.0
+            else:
+                img, scale = self._read_image(image)
+            if img is None:
+                name = image if isinstance(image, str) else "<bytes>"
+                logger.error(f"Cannot read image: {name}")
+                detected.append(None)
+                continue
+            faces: List[_Detection] = [
+                (img, face, scale, (0, 0))
+                for face in self._detect(
+                    img, min_confidence, self._det_size_for(img, scale)
+                )
+            ]
+            if scale > 1:
+                faces = self._refine_small_faces(image, faces, scale, min_confidence)
+            detected.append(faces)
+
+        # One recognition pass over every kept face of every image
+        pending = [entry for faces in detected for entry in faces or []]
+        if rec_model is not None:
+            for i in range(0, len(pending), rec_batch_size):
+                chunk = pending[i : i + rec_batch_size]
+                crops = [
+                    face_align.norm_crop(
+                        img, landmark=face.kps, image_size=rec_model.input_size[0]
+                    )
+                    for img, face, _, _ in chunk
+                ]
+                embeddings = rec_model.get_feat(crops)
+                for (_, face, _, _), embedding in zip(chunk, embeddings):
+                    face.embedding = embedding.flatten()
+
+        # Report boxes / landmarks in original image coordinates
+        for _, face, scale, (x, y) in pending:
+            face.bbox = face.bbox * scale + np.array([x, y, x, y], dtype=np.float32)
+            if face.kps is not None:
+                face.kps = face.kps * scale + np.array([x, y], dtype=np.float32)
+
+        return [
+            None if faces is None else [self._face_data(f) for _, f, _, _ in faces]
+            for faces in detected
+        ]
+
+    def _read_image(self, source: ImageSource) -> Tuple[Optional[np.ndarray], float]:
+        """
+        Decode source; returns (image, scale) where original = image size * scale.
+        In adaptive mode a JPEG is decoded with libjpeg DCT scaling (1/2, 1/4,
+        1/8) down to the smallest size that still covers the detection input.
+        """
+        start = time.perf_counter()
+        size = _jpeg_size(source) if self.adaptive_resolution else None
+        reduce = 1
+        if size is not None:
+            long_side = max(size)
+            det = self._det_long_side(long_side)
+            reduce = next((r for r in (8, 4, 2) if long_side / r >= det), 1)
+        img = _decode(source, _REDUCED_FLAGS[reduce])
+        metrics().observe("face.decode_ms", (time.perf_counter() - start) * 1000)
+        if img is None:
+            return None, 1.0
+        # Ratio of long sides: imread applies EXIF rotation, the header does not
+        scale = max(size) / max(img.shape[:2]) if reduce > 1 else 1.0
+        return img, scale
+
+    def _det_long_side(self, original_long_side: float) -> int:
+        """Detection input size that keeps min_face_px faces detectable."""
+        needed = _DET_MIN_FACE_PX * original_long_side / self.min_face_px
+        size = min(max(needed, self.det_size[0]), self.max_det_size)
+        return int(np.ceil(size / 32) * 32)
+
+    def _det_size_for(
+        self, img: np.ndarray, scale: float
+    ) -> Optional[Tuple[int, int]]:
+        if not self.adaptive_resolution:
+            return None
+        decoded_long = max(img.shape[:2])
+        size = self._det_long_side(decoded_long * scale)
+        # No point upsampling beyond the decoded image
+        size = max(self.det_size[0], min(size, int(np.ceil(decoded_long / 32) * 32)))
+        return (size, size)
+
+    def _refine_small_faces(
+        self,
+        source: ImageSource,
+        faces: List[_Detection],
+        scale: float,
+        min_confidence: float,
+    ) -> List[_Detection]:
+        """
+        Faces found tiny in a reduced decode get poor embeddings, and neighbours
+        even smaller may have been missed. Decode the original once and run
+        detection on the region around the small faces at full resolution;
+        those results replace the reduced-resolution ones inside the region.
+        """
+        small = [
+            face.bbox
+            for _, face, _, _ in faces
+            if min(face.bbox[2] - face.bbox[0], face.bbox[3] - face.bbox[1])
+            < self.rerun_below_px
+        ]
+        if not small:
+            return faces
+        boxes = np.array(small) * scale
+        pad = float((boxes[:, 2:] - boxes[:, :2]).max())
+        full = _decode(source)
+        if full is None:
+            return faces
+        h, w = full.shape[:2]
+        x0 = int(max(0, boxes[:, 0].min() - pad))
+        y0 = int(max(0, boxes[:, 1].min() - pad))
+        x1 = int(min(w, boxes[:, 2].max() + pad))
+        y1 = int(min(h, boxes[:, 3].max() + pad))
+        region = full[y0:y1, x0:x1]
+        region_faces = self._detect(
+            region, min_confidence, self._det_size_for(region, 1.0)
+        )
+        metrics().incr("face.region_reruns")
+
+        def outside(face: Face) -> bool:
+            cx = (face.bbox[0] + face.bbox[2]) / 2 * scale
+            cy = (face.bbox[1] + face.bbox[3]) / 2 * scale
+            return not (x0 <= cx < x1 and y0 <= cy < y1)
+
+        kept = [entry for entry in faces if outside(entry[1])]
+        return kept + [(region, face, 1.0, (x0, y0)) for face in region_faces]
+
+    def _detect(
+        self,
+        img: np.ndarray,
+        min_confidence: float,
+        det_size: Optional[Tuple[int, int]] = None,
+    ) -> List[Face]:
+        """
+        Same as FaceAnalysis.get without the recognition model: detection plus
+        the per-face attribute models, skipping faces below min_confidence.
+        det_size overrides the prepared detection size for this image.
+        """
+        bboxes, kpss = self.app.det_model.detect(
+            img, input_size=det_size, max_num=0, metric="default"
+        )
+        faces = []
+        for idx in range(bboxes.shape[0]):
+            det_score = bboxes[idx, 4]
+            if det_score < min_confidence:
+                logger.debug(f"Skipping face {idx} with low confidence: {det_score}")
+                continue
+            face = Face(
+                bbox=bboxes[idx, 0:4],
+                kps=kpss[idx] if kpss is not None else None,
+                det_score=det_score,
+            )
+            for taskname, model in self.app.models.items():
+                if taskname in ("detection", "recognition"):
+                    continue
+                model.get(img, face)
+            faces.append(face)
+        return faces
+
+    def _face_data(self, face: Face) -> Dict:
+        return {
+            "embedding": face.embedding.tolist(),  # list for JSON serialization
+            "bbox": face.bbox.astype(int).tolist(),  # [x1, y1, x2, y2]
+            "confidence": float(face.det_score),
+            "landmarks": (
+                face.kps.astype(int).tolist() if face.kps is not None else None
+            ),
+            "face_area": self._calculate_face_area(face.bbox),
+            # Optional: age, gender if you need them
+            "age": int(face.age) if face.age is not None else None,
+            "gender": int(face.gender) if face.gender is not None else None,
+        }
+
+    def extract_single_face(self, image: ImageSource) -> Optional[Dict]:
         """
         Extract the most prominent face (largest face area)
         Useful for query images where user uploads their photo
+        image: file path or encoded bytes
         """
-        faces = self.extract_faces(image_path)
+        if isinstance(image, str):
+            faces = self.extract_faces(image)
+        else:
+            faces = self.extract_faces_from_bytes(image)
 
         if not faces:
             return None
@@ -96,18 +374,14 @@ class FaceProcessor:
         Useful for API endpoints
         """
         try:
-            # Decode image
-            nparr = np.frombuffer(image_bytes, np.uint8)
-            img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-
-            faces = self.app.get(img)
+            faces = self.extract_faces_from_bytes(image_bytes, min_confidence=0.0)
 
             if not faces:
                 return None
 
             # Return largest face embedding
-            largest_face = max(faces, key=lambda x: self._calculate_face_area(x.bbox))
-            return largest_face.embedding
+            largest_face = max(faces, key=lambda x: x["face_area"])
+            return np.asarray(largest_face["embedding"], dtype=np.float32)
 
         except Exception as e:
             logger.error(f"Error processing image bytes: {str(e)}")
@@ -0,0 +1,432 @@
+"""
+Local on-disk vector index with the subset of the Pinecone Index API that
+VectorDBService uses (upsert, query, fetch, delete, describe_index_stats).
+
+Vectors live in a memory-mapped float32 file; ids and metadata are kept in an
+append-only JSON-lines log that is replayed on open. The log is the commit
+point, as in embedding_store: writers take an flock, replay the log tail and
+append new rows after the last one, so several worker processes can share an
+index; readers pick up other processes' writes from the log tail (and reload
+after another process compacts). Search is exact cosine
+(flat) over the rows that pass the metadata filter; equality filters on
+type / wedding_id / photo_id are answered from an inverted index, so a query
+scoped to one wedding only scores that wedding's rows.
+"""
+import fcntl
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Metadata fields with an inverted index (the filters the worker uses)
+INDEXED_FIELDS = ("type", "wedding_id", "photo_id")
+_INITIAL_CAPACITY = 1024
+
+
+def _as_list(value) -> list:
+    return value if isinstance(value, list) else [value]
+
+
+def _match_condition(value, cond) -> bool:
+    """Evaluate one field condition; list values match by membership, as in Pinecone."""
+    if not isinstance(cond, dict):
+        cond = {"$eq": cond}
+    for op, operand in cond.items():
+        if op == "$exists":
+            if (value is not None) != bool(operand):
+                return False
+            continue
+        if value is None:
+            if op in ("$ne", "$nin"):
+                continue
+            return False
+        values = _as_list(value)
+        if op == "$eq":
+            ok = operand in values
+        elif op == "$ne":
+            ok = operand not in values
+        elif op == "$in":
+            ok = any(v in operand for v in values)
+        elif op == "$nin":
+            ok = not any(v in operand for v in values)
+        elif op == "$gt":
+            ok = value > operand
+        elif op == "$gte":
+            ok = value >= operand
+        elif op == "$lt":
+            ok = value < operand
+        elif op == "$lte":
+            ok = value <= operand
+        else:
+            raise ValueError(f"Unsupported filter operator: {op}")
+        if not ok:
+            return False
+    return True
+
+
+def matches_filter(metadata: Dict[str, Any], filter_expr: Optional[Dict]) -> bool:
+    """True if metadata satisfies a Pinecone-style metadata filter."""
+    if not filter_expr:
+        return True
+    for key, cond in filter_expr.items():
+        if key == "$and":
+            if not all(matches_filter(metadata, f) for f in cond):
+                return False
+        elif key == "$or":
+            if not any(matches_filter(metadata, f) for f in cond):
+                return False
+        elif not _match_condition(metadata.get(key), cond):
+            return False
+    return True
+
+
+class LocalVectorIndex:
+    def __init__(self, path: str, dimension: int = 512):
+        self.path = path
+        self.dimension = dimension
+        os.makedirs(path, exist_ok=True)
+        self._vectors_path = os.path.join(path, "vectors.f32")
+        self._log_path = os.path.join(path, "records.jsonl")
+        self._lock_path = os.path.join(path, ".lock")
+        self._lock = threading.RLock()
+        self._vectors: Optional[np.memmap] = None
+        self._reset()
+        with self._file_lock():
+            self._refresh_locked()
+        logger.info(
+            f"Opened local vector index at {path} ({len(self._rows)} vectors)"
+        )
+
+    # --- storage -----------------------------------------------------------
+
+    def _reset(self) -> None:
+        self._ids: List[Optional[str]] = []  # row -> id (None = deleted)
+        self._metadata: List[Optional[Dict[str, Any]]] = []
+        self._rows: Dict[str, int] = {}  # id -> row
+        self._inverted: Dict[str, Dict[Any, Set[int]]] = {
+            f: {} for f in INDEXED_FIELDS
+        }
+        self._norms = np.zeros(0, dtype=np.float32)
+        self._log_ino: Optional[int] = None
+        self._log_offset = 0  # bytes of records.jsonl already applied
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        with open(self._lock_path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _open_vectors(self, capacity: int) -> None:
+        """(Re)map the vector file, grown to capacity rows (under the file lock)."""
+        needed = capacity * self.dimension * 4
+        if (
+            not os.path.exists(self._vectors_path)
+            or os.path.getsize(self._vectors_path) < needed
+        ):
+            with open(self._vectors_path, "ab") as f:
+                f.truncate(needed)
+        size = os.path.getsize(self._vectors_path) // (self.dimension * 4)
+        if self._vectors is not None:
+            self._vectors.flush()
+        self._vectors = np.memmap(
+            self._vectors_path,
+            dtype=np.float32,
+            mode="r+",
+            shape=(size, self.dimension),
+        )
+
+    def _ensure_capacity(self, rows: int) -> None:
+        capacity = self._vectors.shape[0]
+        if rows <= capacity:
+            return
+        self._open_vectors(max(rows, capacity * 2))
+
+    def _refresh(self) -> None:
+        """Apply log records written by other processes since the last refresh."""
+        try:
+            st = os.stat(self._log_path)
+        except FileNotFoundError:
+            return
+        if st.st_ino == self._log_ino and st.st_size == self._log_offset:
+            return
+        with self._file_lock():
+            self._refresh_locked()
+
+    def _refresh_locked(self) -> None:
+        """Replay the log tail (caller holds the file lock)."""
+        if not os.path.exists(self._log_path):
+            if self._vectors is None:
+                self._open_vectors(_INITIAL_CAPACITY)
+            return
+        with open(self._log_path, "rb") as f:
+            ino = os.fstat(f.fileno()).st_ino
+            if ino != self._log_ino:
+                # First open, or another process compacted: replay from the start
+                self._reset()
+                self._log_ino = ino
+                self._vectors = None
+            f.seek(self._log_offset)
+            data = f.read()
+        # Only complete lines; a torn line from a crash is terminated by _append
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].decode("utf-8").splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rec = json.loads(line)
+            except json.JSONDecodeError:
+                # Torn line after a crash; its vector row is simply unused
+                logger.warning("Skipping corrupt record in %s", self._log_path)
+                continue
+            if "delete" in rec:
+                for vid in rec["delete"]:
+                    self._remove(vid)
+            else:
+                self._assign(rec["row"], rec["id"], rec.get("metadata") or {})
+        self._log_offset += end
+
+        rows = len(self._ids)
+        if self._vectors is None or self._vectors.shape[0] < rows:
+            self._open_vectors(max(_INITIAL_CAPACITY, rows))
+        known = len(self._norms)
+        if rows > known:
+            self._norms = np.concatenate(
+                [self._norms, np.linalg.norm(self._vectors[known:rows], axis=1)]
+            )
+
+    def _append(self, records: List[Dict[str, Any]]) -> None:
+        """Commit records to the log and apply them (caller holds the file lock)."""
+        with open(self._log_path, "ab") as f:
+            if f.tell() > self._log_offset:
+                # Unterminated line left by a crashed writer
+                f.write(b"\n")
+            f.write("".join(json.dumps(rec) + "\n" for rec in records).encode())
+        self._refresh_locked()
+
+    def _assign(self, row: int, vid: str, metadata: Dict[str, Any]) -> None:
+        self._remove(vid)
+        while len(self._ids) <= row:
+            self._ids.append(None)
+            self._metadata.append(None)
+        self._ids[row] = vid
+        self._metadata[row] = metadata
+        self._rows[vid] = row
+        for field in INDEXED_FIELDS:
+            for value in _as_list(metadata.get(field)):
+                if value is not None:
+                    self._inverted[field].setdefault(value, set()).add(row)
+
+    def _remove(self, vid: str) -> None:
+        row = self._rows.pop(vid, None)
+        if row is None:
+            return
+        metadata = self._metadata[row] or {}
+        for field in INDEXED_FIELDS:
+            for value in _as_list(metadata.get(field)):
+                rows = self._inverted[field].get(value)
+                if rows is not None:
+                    rows.discard(row)
+                    if not rows:
+                        del self._inverted[field][value]
+        self._ids[row] = None
+        self._metadata[row] = None
+
+    # --- filtering ---------------------------------------------------------
+
+    def _candidates(self, filter_expr: Optional[Dict]) -> Optional[Set[int]]:
+        """Rows that may match, from the inverted index; None means all rows."""
+        if not filter_expr:
+            return None
+        result: Optional[Set[int]] = None
+
+        def narrow(rows: Set[int]):
+            nonlocal result
+            result = set(rows) if result is None else result & rows
+
+        for key, cond in filter_expr.items():
+            if key == "$and":
+                for sub in cond:
+                    rows = self._candidates(sub)
+                    if rows is not None:
+                        narrow(rows)
+            elif key in INDEXED_FIELDS:
+                index = self._inverted[key]
+                if not isinstance(cond, dict):
+                    narrow(index.get(cond, set()))
+                elif set(cond) == {"$eq"}:
+                    narrow(index.get(cond["$eq"], set()))
+                elif set(cond) == {"$in"}:
+                    rows: Set[int] = set()
+                    for value in cond["$in"]:
+                        rows |= index.get(value, set())
+                    narrow(rows)
+        return result
+
+    def _filtered_rows(self, filter_expr: Optional[Dict]) -> np.ndarray:
+        candidates = self._candidates(filter_expr)
+        rows: Iterable[int] = (
+            range(len(self._ids)) if candidates is None else sorted(candidates)
+        )
+        return np.fromiter(
+            (
+                r
+                for r in rows
+                if self._ids[r] is not None
+                and matches_filter(self._metadata[r], filter_expr)
+            ),
+            dtype=np.int64,
+        )
+
+    # --- Pinecone Index API subset ------------------------------------------
+
+    def upsert(self, vectors: List[Dict[str, Any]], **_kwargs) -> Dict[str, int]:
+        if not vectors:
+            return {"upserted_count": 0}
+        values = []
+        for v in vectors:
+            arr = np.asarray(v["values"], dtype=np.float32)
+            if arr.shape != (self.dimension,):
+                raise ValueError(
+                    f"Vector {v['id']} has shape {arr.shape}, "
+                    f"expected ({self.dimension},)"
+                )
+            values.append(arr)
+        with self._lock, self._file_lock():
+            self._refresh_locked()
+            # Always append: rows of existing ids go dead, readers never see a
+            # row change under them (compact() reclaims the space)
+            start = len(self._ids)
+            self._ensure_capacity(start + len(vectors))
+            self._vectors[start : start + len(vectors)] = np.stack(values)
+            self._vectors.flush()
+            self._append(
+                [
+                    {
+                        "row": start + i,
+                        "id": v["id"],
+                        "metadata": v.get("metadata") or {},
+                    }
+                    for i, v in enumerate(vectors)
+                ]
+            )
+            return {"upserted_count": len(vectors)}
+
+    def query(
+        self,
+        vector: List[float],
+        top_k: int = 10,
+        include_metadata: bool = False,
+        include_values: bool = False,
+        filter: Optional[Dict] = None,
+        **_kwargs,
+    ) -> Dict[str, Any]:
+        with self._lock:
+            self._refresh()
+            rows = self._filtered_rows(filter)
+            if len(rows) == 0:
+                return {"matches": []}
+            q = np.asarray(vector, dtype=np.float32)
+            q_norm = float(np.linalg.norm(q)) or 1.0
+            norms = self._norms[rows]
+            norms[norms == 0] = 1.0
+            scores = (self._vectors[rows] @ q) / (norms * q_norm)
+            k = min(top_k, len(rows))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            matches = []
+            for i in top:
+                row = int(rows[i])
+                match: Dict[str, Any] = {
+                    "id": self._ids[row],
+                    "score": float(scores[i]),
+                }
+                if include_metadata:
+                    match["metadata"] = dict(self._metadata[row])
+                if include_values:
+                    match["values"] = self._vectors[row].tolist()
+                matches.append(match)
+            return {"matches": matches}
+
+    def fetch(self, ids: List[str], **_kwargs) -> Dict[str, Any]:
+        with self._lock:
+            self._refresh()
+            vectors = {}
+            for vid in ids:
+                row = self._rows.get(vid)
+                if row is None:
+                    continue
+                vectors[vid] = {
+                    "id": vid,
+                    "values": self._vectors[row].tolist(),
+                    "metadata": dict(self._metadata[row]),
+                }
+            return {"vectors": vectors}
+
+    def delete(
+        self,
+        ids: Optional[List[str]] = None,
+        filter: Optional[Dict] = None,
+        delete_all: bool = False,
+        **_kwargs,
+    ) -> Dict[str, Any]:
+        with self._lock, self._file_lock():
+            self._refresh_locked()
+            if delete_all:
+                targets = [vid for vid in self._ids if vid is not None]
+            elif ids:
+                targets = [vid for vid in ids if vid in self._rows]
+            elif filter:
+                targets = [self._ids[r] for r in self._filtered_rows(filter)]
+            else:
+                targets = []
+            if targets:
+                self._append([{"delete": targets}])
+            return {}
+
+    def describe_index_stats(self, **_kwargs) -> Dict[str, Any]:
+        with self._lock:
+            self._refresh()
+            return {
+                "dimension": self.dimension,
+                "total_vector_count": len(self._rows),
+                "index_fullness": 0.0,
+                "namespaces": {"": {"vector_count": len(self._rows)}},
+            }
+
+    def compact(self) -> None:
+        """Rewrite the vector file and log without dead rows."""
+        with self._lock, self._file_lock():
+            self._refresh_locked()
+            live = [r for r, vid in enumerate(self._ids) if vid is not None]
+            vectors = np.array(self._vectors[live], dtype=np.float32)
+            tmp_log = self._log_path + ".tmp"
+            with open(tmp_log, "w", encoding="utf-8") as f:
+                for row, r in enumerate(live):
+                    record = {
+                        "row": row,
+                        "id": self._ids[r],
+                        "metadata": self._metadata[r],
+                    }
+                    f.write(json.dumps(record) + "\n")
+            tmp_vectors = self._vectors_path + ".tmp"
+            vectors.tofile(tmp_vectors)
+            # Vectors first: a process that sees the new log maps the new file
+            os.replace(tmp_vectors, self._vectors_path)
+            os.replace(tmp_log, self._log_path)
+            self._refresh_locked()
+            logger.info(f"Compacted local vector index to {len(live)} vectors")
+
+    def close(self) -> None:
+        with self._lock:
+            if self._vectors is not None:
+                self._vectors.flush()
@@ -0,0 +1,118 @@
+"""
+In-process metrics for the ML worker.
+Thread-safe counters, gauges and latency / size histograms; the worker logs a
+snapshot periodically.
+"""
+import bisect
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Latency bucket upper bounds in milliseconds (last bucket is +inf)
+DEFAULT_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+# Bucket upper bounds for sizes (faces, photos, candidates per operation)
+COUNT_BUCKETS = (1, 10, 100, 1000, 5000, 10000, 50000, 100000, 500000, 1000000)
+
+
+class _Histogram:
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Approximate quantile: upper bound of the bucket containing the q-th observation."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                return float(self.buckets[i]) if i < len(self.buckets) else self.max
+        return self.max
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "avg": round(self.total / self.count, 2) if self.count else None,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "max": round(self.max, 2),
+        }
+
+
+class Metrics:
+    _instance: Optional["Metrics"] = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = {}
+        self._gauges: Dict[str, float] = {}
+        self._histograms: Dict[str, _Histogram] = {}
+
+    @classmethod
+    def get_instance(cls) -> "Metrics":
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    def incr(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def set_gauge(self, name: str, value: float) -> None:
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name: str, value_ms: float) -> None:
+        self._observe(name, value_ms, DEFAULT_BUCKETS_MS)
+
+    def observe_count(self, name: str, value: int) -> None:
+        """Record a size (not a latency) in a histogram with COUNT_BUCKETS."""
+        self._observe(name, value, COUNT_BUCKETS)
+
+    def _observe(self, name: str, value: float, buckets: tuple) -> None:
+        with self._lock:
+            hist = self._histograms.get(name)
+            if hist is None:
+                hist = self._histograms[name] = _Histogram(buckets)
+            hist.observe(value)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+                "histograms": {k: h.summary() for k, h in self._histograms.items()},
+            }
+
+    def log_snapshot(self, prefixes: Optional[List[str]] = None) -> None:
+        """Log current values, optionally only names starting with one of prefixes."""
+        snap = self.snapshot()
+
+        def keep(name: str) -> bool:
+            return not prefixes or any(name.startswith(p) for p in prefixes)
+
+        for section in ("counters", "gauges", "histograms"):
+            values = {k: v for k, v in snap[section].items() if keep(k)}
+            if values:
+                logger.info("metrics %s: %s", section, values)
+
+
+def metrics() -> Metrics:
+    return Metrics.get_instance()
@@ -0,0 +1,171 @@
+"""
+Process-wide registry for face models.
+Loads FaceProcessor (buffalo_l) once per process, optionally keeps a pool of
+warmed instances for concurrent jobs, and records load time / memory metrics.
+"""
+import logging
+import os
+import queue
+import resource
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .face_processor import FaceProcessor
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+MODEL_NAME = os.getenv("FACE_MODEL_NAME", "buffalo_l")
+MODEL_POOL_SIZE = int(os.getenv("FACE_MODEL_POOL_SIZE", "1"))
+# Set per process by run_supervisor.py so N processes don't oversubscribe cores
+ONNX_INTRA_OP_THREADS = int(os.getenv("ONNX_INTRA_OP_THREADS", "0")) or None
+# Reduced-resolution JPEG decode + per-image detection size (see FaceProcessor)
+FACE_ADAPTIVE_RESOLUTION = (
+    os.getenv("FACE_ADAPTIVE_RESOLUTION", "false").lower() == "true"
+)
+FACE_MIN_FACE_PX = int(os.getenv("FACE_MIN_FACE_PX", "48"))
+FACE_MAX_DET_SIZE = int(os.getenv("FACE_MAX_DET_SIZE", "1280"))
+FACE_RERUN_BELOW_PX = int(os.getenv("FACE_RERUN_BELOW_PX", "48"))
+
+
+def _rss_mb() -> float:
+    """Current resident set size in MB (falls back to peak RSS where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        # ru_maxrss is KB on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if peak > 1 << 30 else peak / 1024
+
+
+class ModelRegistry:
+    """
+    Holds loaded FaceProcessor instances for the lifetime of the process.
+
+    pool_size: max number of instances; each one serves one job at a time.
+    With pool_size=1 all jobs share a single model (serialised inference).
+    """
+
+    _instance: Optional["ModelRegistry"] = None
+    _instance_lock = threading.Lock()
+
+    def __init__(
+        self,
+        model_name: str = MODEL_NAME,
+        pool_size: int = MODEL_POOL_SIZE,
+        det_size: Tuple[int, int] = (640, 640),
+        intra_op_threads: Optional[int] = ONNX_INTRA_OP_THREADS,
+    ):
+        self.model_name = model_name
+        self.intra_op_threads = intra_op_threads
+        self.pool_size = max(1, pool_size)
+        self.det_size = det_size
+        self._idle: "queue.Queue[FaceProcessor]" = queue.Queue()
+        self._instances: List[FaceProcessor] = []
+        self._lock = threading.Lock()
+        self._load_times_ms: List[float] = []
+
+    @classmethod
+    def get_instance(cls) -> "ModelRegistry":
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    def _load(self) -> FaceProcessor:
+        rss_before = _rss_mb()
+        start = time.perf_counter()
+        processor = FaceProcessor(
+            model_name=self.model_name,
+            det_size=self.det_size,
+            intra_op_threads=self.intra_op_threads,
+            adaptive_resolution=FACE_ADAPTIVE_RESOLUTION,
+            min_face_px=FACE_MIN_FACE_PX,
+            max_det_size=FACE_MAX_DET_SIZE,
+            rerun_below_px=FACE_RERUN_BELOW_PX,
+        )
+        load_ms = (time.perf_counter() - start) * 1000
+        rss_after = _rss_mb()
+        self._load_times_ms.append(load_ms)
+        m = metrics()
+        m.observe("model.load_ms", load_ms)
+        m.incr("model.loads")
+        m.set_gauge("model.instances", len(self._instances) + 1)
+        m.set_gauge("model.rss_mb", round(rss_after, 1))
+        m.set_gauge("model.last_load_rss_delta_mb", round(rss_after - rss_before, 1))
+        logger.info(
+            "Loaded %s instance %d/%d in %.0f ms (RSS %.0f MB, +%.0f MB)",
+            self.model_name,
+            len(self._instances) + 1,
+            self.pool_size,
+            load_ms,
+            rss_after,
+            rss_after - rss_before,
+        )
+        return processor
+
+    def _grow(self) -> Optional[FaceProcessor]:
+        """Load one more instance if the pool is below pool_size."""
+        with self._lock:
+            if len(self._instances) >= self.pool_size:
+                return None
+            processor = self._load()
+            self._instances.append(processor)
+            return processor
+
+    def warm_up(self) -> None:
+        """Load all pool_size instances up front (call at worker startup)."""
+        while True:
+            processor = self._grow()
+            if processor is None:
+                break
+            self._idle.put(processor)
+
+    @contextmanager
+    def acquire(self, timeout: Optional[float] = None) -> Iterator[FaceProcessor]:
+        """
+        Borrow an instance for one job. Loads lazily up to pool_size, then
+        blocks until another job returns its instance.
+        """
+        try:
+            processor = self._idle.get_nowait()
+        except queue.Empty:
+            processor = self._grow()
+            if processor is None:
+                wait_start = time.perf_counter()
+                processor = self._idle.get(timeout=timeout)
+                metrics().observe(
+                    "model.acquire_wait_ms", (time.perf_counter() - wait_start) * 1000
+                )
+        try:
+            yield processor
+        finally:
+            self._idle.put(processor)
+
+    def get_face_processor(self) -> FaceProcessor:
+        """
+        Shared instance for callers that keep a long-lived reference
+        (e.g. PhotoClassifier). Not exclusive: prefer acquire() for concurrent jobs.
+        """
+        with self._lock:
+            has_instance = bool(self._instances)
+        if not has_instance:
+            processor = self._grow()
+            if processor is not None:
+                self._idle.put(processor)
+        return self._instances[0]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "model_name": self.model_name,
+            "pool_size": self.pool_size,
+            "instances": len(self._instances),
+            "idle": self._idle.qsize(),
+            "load_times_ms": [round(t) for t in self._load_times_ms],
+            "rss_mb": round(_rss_mb(), 1),
+        }
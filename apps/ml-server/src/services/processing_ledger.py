@@ -0,0 +1,85 @@
+"""
+Redis ledger of processed photos: content hash of the image and how many faces
+were extracted and stored. When a photo is queued again (reprocess, sample
+fallback, API retry) and its image bytes are unchanged, the worker reloads the
+stored embeddings instead of running the face models again.
+"""
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional
+
+from .redis_service import RedisClient
+
+logger = logging.getLogger(__name__)
+
+# Entries expire so deleted photos don't accumulate
+PROCESSING_LEDGER_TTL_S = int(os.getenv("PROCESSING_LEDGER_TTL_S", str(30 * 86400)))
+_LEDGER_KEY = "ai:ledger:photo:{photo_id}"
+
+
+class ProcessingLedger:
+    """Best effort: Redis errors are logged and treated as a missing entry."""
+
+    def __init__(
+        self, redis_client: RedisClient, ttl_s: int = PROCESSING_LEDGER_TTL_S
+    ):
+        self.redis_client = redis_client
+        self.ttl_s = ttl_s
+
+    def get(self, photo_id: str) -> Optional[Dict[str, Any]]:
+        """{"hash", "faces", "wedding_id"} recorded for photo_id, or None."""
+        try:
+            raw = self.redis_client.get(_LEDGER_KEY.format(photo_id=photo_id))
+            return json.loads(raw) if raw else None
+        except Exception as e:
+            logger.warning("Ledger read failed for photo %s: %s", photo_id, e)
+            return None
+
+    def matches(self, photo_id: str, content_hash: str) -> Optional[int]:
+        """Number of stored faces if photo_id was processed with this content."""
+        entry = self.get(photo_id)
+        if entry and entry.get("hash") == content_hash:
+            return int(entry.get("faces", 0))
+        return None
+
+    def record(
+        self, photo_id: str, content_hash: str, num_faces: int, wedding_id: str
+    ) -> None:
+        """Call once the photo's face vectors are stored."""
+        entry = {"hash": content_hash, "faces": num_faces, "wedding_id": wedding_id}
+        try:
+            self.redis_client.set(
+                _LEDGER_KEY.format(photo_id=photo_id), json.dumps(entry), self.ttl_s
+            )
+        except Exception as e:
+            logger.warning("Ledger write failed for photo %s: %s", photo_id, e)
+
+    def face_counts(self, photo_ids: List[str]) -> Dict[str, int]:
+        """Stored face count per recorded photo; unrecorded photos are left out."""
+        try:
+            raw = self.redis_client.mget(
+                [_LEDGER_KEY.format(photo_id=pid) for pid in photo_ids]
+            )
+        except Exception as e:
+            logger.warning("Ledger read failed for %d photos: %s", len(photo_ids), e)
+            return {}
+        counts = {}
+        for photo_id, value in zip(photo_ids, raw):
+            if value:
+                counts[photo_id] = int(json.loads(value).get("faces", 0))
+        return counts
+
+    def forget_many(self, photo_ids: List[str]) -> None:
+        try:
+            self.redis_client.delete_many(
+                [_LEDGER_KEY.format(photo_id=pid) for pid in photo_ids]
+            )
+        except Exception as e:
+            logger.warning("Ledger delete failed for %d photos: %s", len(photo_ids), e)
+
+    def forget(self, photo_id: str) -> None:
+        try:
+            self.redis_client.delete(_LEDGER_KEY.format(photo_id=photo_id))
+        except Exception as e:
+            logger.warning("Ledger delete failed for photo %s: %s", photo_id, e)
@@ -0,0 +1,264 @@
+"""
+int8 scalar-quantised search over photo faces in the EmbeddingStore.
+
+Each wedding partition gets an in-memory copy of its embeddings as int8 codes
+with a per-dimension scale (4x smaller than float32, 2x smaller than the
+float16 store). A query is scored against the codes first; every face whose
+approximate score could still reach min_score, given the worst-case
+quantisation error for that query, is re-ranked with the exact float vectors
+from the store. The faces returned above min_score are therefore exactly the
+ones a flat float search over the store returns, with the same scores.
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from .embedding_store import EmbeddingStore, WeddingPartition
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+QUANTIZED_INDEX_MAX_WEDDINGS = int(os.getenv("QUANTIZED_INDEX_MAX_WEDDINGS", "8"))
+# Smaller partitions are scanned exactly; quantisation only pays off on large ones
+QUANTIZED_INDEX_MIN_ROWS = int(os.getenv("QUANTIZED_INDEX_MIN_ROWS", "20000"))
+# Scale headroom so appended faces rarely fall outside the code range (a rebuild)
+_SCALE_HEADROOM = 1.1
+_BLOCK_ROWS = 16384
+# Rows per scan block: the float32 copy of a block stays in cache
+_SCAN_ROWS = 512
+# Slack for float32 rounding in the first-pass dot products
+_EPS = 1e-4
+
+
+def _quantize(block: np.ndarray, scale: np.ndarray) -> np.ndarray:
+    """block is a float32 scratch array and is overwritten."""
+    np.divide(block, scale, out=block)
+    np.rint(block, out=block)
+    np.clip(block, -127, 127, out=block)
+    return block.astype(np.int8)
+
+
+def _scan(matrix: np.ndarray, query: np.ndarray, cutoff: float) -> np.ndarray:
+    """Rows of matrix (any dtype) whose dot product with query is >= cutoff."""
+    count = matrix.shape[0]
+    buf = np.empty((min(_SCAN_ROWS, count), matrix.shape[1]), dtype=np.float32)
+    hits = []
+    for b in range(0, count, _SCAN_ROWS):
+        block = buf[: min(_SCAN_ROWS, count - b)]
+        np.copyto(block, matrix[b : b + len(block)])
+        hits.append(np.flatnonzero(block @ query >= cutoff) + b)
+    return np.concatenate(hits) if hits else np.empty(0, dtype=np.int64)
+
+
+class _Codes:
+    """int8 codes for rows [0, rows) of one partition generation (rows don't move)."""
+
+    __slots__ = ("codes", "scale", "rows", "generation")
+
+    def __init__(self, dimension: int, generation: int):
+        self.codes = np.empty((0, dimension), dtype=np.int8)
+        self.scale: Optional[np.ndarray] = None
+        self.rows = 0
+        self.generation = generation
+
+
+class QuantizedFaceIndex:
+    def __init__(
+        self,
+        store: EmbeddingStore,
+        max_weddings: int = QUANTIZED_INDEX_MAX_WEDDINGS,
+        min_rows: int = QUANTIZED_INDEX_MIN_ROWS,
+    ):
+        self.store = store
+        self.max_weddings = max(1, max_weddings)
+        self.min_rows = min_rows
+        self._weddings: "OrderedDict[str, _Codes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def covers(self, wedding_ids: Sequence[str]) -> bool:
+        """True if every wedding has a partition in the store."""
+        return bool(wedding_ids) and all(
+            self.store.has_partition(str(w)) for w in wedding_ids
+        )
+
+    # --- codes -------------------------------------------------------------
+
+    def _codes(self, wedding_id: str, emb: np.ndarray, generation: int):
+        """
+        (codes, scale) for wedding_id covering every row of emb, quantising rows
+        added since the last call (everything after a compaction). Rebuilds
+        replace the arrays, so the pair stays valid for the caller after the
+        lock is released.
+        """
+        with self._lock:
+            entry = self._weddings.get(wedding_id)
+            if entry is None or entry.generation != generation:
+                entry = _Codes(emb.shape[1], generation)
+                self._weddings[wedding_id] = entry
+                while len(self._weddings) > self.max_weddings:
+                    self._weddings.popitem(last=False)
+            else:
+                self._weddings.move_to_end(wedding_id)
+            count = emb.shape[0]
+            if entry.rows >= count:
+                return entry.codes, entry.scale
+            new_max = np.abs(np.asarray(emb[entry.rows :], dtype=np.float32)).max(
+                axis=0
+            )
+            if entry.scale is None or np.any(new_max > entry.scale * 127):
+                self._rebuild(entry, emb)
+            else:
+                self._append(entry, emb)
+            return entry.codes, entry.scale
+
+    @staticmethod
+    def _rebuild(entry: _Codes, emb: np.ndarray) -> None:
+        start = time.perf_counter()
+        count, dimension = emb.shape
+        max_abs = np.zeros(dimension, dtype=np.float32)
+        for b in range(0, count, _BLOCK_ROWS):
+            block = np.asarray(emb[b : b + _BLOCK_ROWS], dtype=np.float32)
+            np.maximum(max_abs, np.abs(block).max(axis=0), out=max_abs)
+        entry.scale = np.maximum(max_abs * _SCALE_HEADROOM, 1e-6) / 127
+        entry.codes = np.empty((max(count, 1024), dimension), dtype=np.int8)
+        entry.rows = 0
+        QuantizedFaceIndex._append(entry, emb)
+        metrics().incr("quantized.rebuilds")
+        metrics().observe("quantized.rebuild_ms", (time.perf_counter() - start) * 1000)
+
+    @staticmethod
+    def _append(entry: _Codes, emb: np.ndarray) -> None:
+        count = emb.shape[0]
+        if count > entry.codes.shape[0]:
+            grown = np.empty(
+                (max(count, entry.codes.shape[0] * 2), emb.shape[1]), dtype=np.int8
+            )
+            grown[: entry.rows] = entry.codes[: entry.rows]
+            entry.codes = grown
+        for b in range(entry.rows, count, _BLOCK_ROWS):
+            # A copy: asarray would return a view of a float32 store's memmap
+            block = np.array(emb[b : min(b + _BLOCK_ROWS, count)], dtype=np.float32)
+            entry.codes[b : b + len(block)] = _quantize(block, entry.scale)
+        entry.rows = count
+
+    # --- search ------------------------------------------------------------
+
+    def _candidate_rows(
+        self,
+        wedding_id: str,
+        emb: np.ndarray,
+        generation: int,
+        query: np.ndarray,
+        min_score: float,
+    ) -> np.ndarray:
+        """Rows whose exact score may be >= min_score (a superset of the true hits)."""
+        if emb.shape[0] < self.min_rows:
+            return _scan(emb, query, min_score - _EPS)
+        codes, scale = self._codes(wedding_id, emb, generation)
+        scaled_query = (query * scale).astype(np.float32)
+        # |x_d - code_d * scale_d| <= scale_d / 2 for every stored component
+        cutoff = min_score - 0.5 * float(np.abs(scaled_query).sum()) - _EPS
+        rows = _scan(codes[: emb.shape[0]], scaled_query, cutoff)
+        metrics().observe_count("quantized.candidates", len(rows))
+        return rows
+
+    def _search_partition(
+        self,
+        wedding_id: str,
+        partition: WeddingPartition,
+        query: np.ndarray,
+        min_score: float,
+        chunk_rows: int,
+    ) -> Iterator[List[Dict]]:
+        """
+        Matches in one partition, best first within each list; the candidates
+        are re-ranked and turned into matches chunk_rows at a time.
+        """
+        row_ids, emb, faces, generation = partition.view()
+        if not row_ids:
+            return
+        rows = self._candidate_rows(wedding_id, emb, generation, query, min_score)
+        rows = rows[[row_ids[r] is not None for r in rows]] if len(rows) else rows
+        for b in range(0, len(rows), chunk_rows):
+            chunk = rows[b : b + chunk_rows]
+            scores = np.asarray(emb[chunk], dtype=np.float32) @ query
+            hits = np.flatnonzero(scores >= min_score)
+            matches = []
+            for i in hits[np.argsort(-scores[hits], kind="stable")]:
+                row = int(chunk[i])
+                face_id = row_ids[row]
+                matches.append(
+                    {
+                        "face_id": face_id,
+                        "score": float(scores[i]),
+                        # ids are photo:<photo_id>:<face_index>
+                        "photo_id": face_id[len("photo:") :].rsplit(":", 1)[0],
+                        "guest_id": None,
+                        "user_id": None,
+                        "s3_url": None,
+                        "thumbnail_url": None,
+                        "bbox": [int(v) for v in faces[row]["bbox"]],
+                        "confidence": float(faces[row]["confidence"]),
+                    }
+                )
+            if matches:
+                yield matches
+
+    @staticmethod
+    def _normalise(query_embedding: List[float]) -> np.ndarray:
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(query)) or 1.0
+        return query / norm
+
+    def search(
+        self,
+        query_embedding: List[float],
+        wedding_ids: Sequence[str],
+        top_k: Optional[int] = 500,
+        min_score: float = 0.4,
+    ) -> List[Dict]:
+        """
+        Photo faces in wedding_ids with cosine >= min_score, best first, at most
+        top_k (all of them when None). Same format as
+        VectorDBService.search_photo_faces.
+        """
+        start = time.perf_counter()
+        query = self._normalise(query_embedding)
+        matches: List[Dict] = []
+        for wedding_id in wedding_ids:
+            partition = self.store.partition(str(wedding_id))
+            for chunk in self._search_partition(
+                str(wedding_id), partition, query, min_score, _BLOCK_ROWS
+            ):
+                matches.extend(chunk)
+        matches.sort(key=lambda m: m["score"], reverse=True)
+        metrics().observe("quantized.search_ms", (time.perf_counter() - start) * 1000)
+        return matches[:top_k]
+
+    def iter_search(
+        self,
+        query_embedding: List[float],
+        wedding_ids: Sequence[str],
+        min_score: float = 0.4,
+        page_size: int = 500,
+    ) -> Iterator[List[Dict]]:
+        """
+        Every photo face in wedding_ids with cosine >= min_score, in pages of
+        at most page_size: one wedding at a time, best first within a page but
+        not across pages. Only one page of matches is held at a time.
+        """
+        query = self._normalise(query_embedding)
+        for wedding_id in wedding_ids:
+            partition = self.store.partition(str(wedding_id))
+            yield from self._search_partition(
+                str(wedding_id), partition, query, min_score, page_size
+            )
+
+    def invalidate(self, wedding_id: str) -> None:
+        with self._lock:
+            self._weddings.pop(str(wedding_id), None)
@@ -1,12 +1,32 @@
 import redis
 from redis.exceptions import TimeoutError as RedisTimeoutError
+import json
 import logging
-from typing import Optional
+import time
+from typing import Iterable, List, Optional
 import os
 
 logger = logging.getLogger(__name__)
 
 
+def create_async_client(socket_timeout: float = 30) -> "redis.asyncio.Redis":
+    """
+    redis.asyncio client with the same connection settings as RedisClient, for
+    the asyncio worker. socket_timeout must exceed the XREADGROUP block time.
+    """
+    import redis.asyncio
+
+    return redis.asyncio.Redis(
+        host=os.getenv("REDIS_HOST", "localhost"),
+        port=int(os.getenv("REDIS_PORT", "6379")),
+        password=os.getenv("REDIS_PASSWORD") or None,
+        decode_responses=True,
+        socket_connect_timeout=5,
+        socket_timeout=socket_timeout,
+        retry_on_timeout=True,
+    )
+
+
 class RedisClient:
     _instance: Optional["RedisClient"] = None
 
@@ -56,15 +76,61 @@ class RedisClient:
     def delete(self, key: str):
         self.redis.delete(key)
 
+    def mget(self, keys: list, chunk_size: int = 1000) -> list:
+        """GET many keys (MGET in chunks); None for missing keys."""
+        values = []
+        for i in range(0, len(keys), chunk_size):
+            values.extend(self.redis.mget(keys[i : i + chunk_size]))
+        return values
+
+    def delete_many(self, keys: list, chunk_size: int = 1000):
+        for i in range(0, len(keys), chunk_size):
+            self.redis.delete(*keys[i : i + chunk_size])
+
+    def hgetall(self, key: str) -> dict:
+        return self.redis.hgetall(key)
+
+    def hmget(self, key: str, fields: list) -> list:
+        return self.redis.hmget(key, fields) if fields else []
+
+    def hset_many(self, key: str, mapping: dict, chunk_size: int = 1000):
+        items = list(mapping.items())
+        for i in range(0, len(items), chunk_size):
+            self.redis.hset(key, mapping=dict(items[i : i + chunk_size]))
+
+    def hdel_many(self, key: str, fields: list, chunk_size: int = 1000):
+        for i in range(0, len(fields), chunk_size):
+            self.redis.hdel(key, *fields[i : i + chunk_size])
+
+    def sadd_with_ttl(self, key: str, members: list, ttl_seconds: int) -> bool:
+        """SADD members and (re)set the set's expiry in one round trip."""
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.sadd(key, *members)
+            pipe.expire(key, ttl_seconds)
+            pipe.execute()
+            return True
+        except redis.RedisError as e:
+            logger.error("Redis SADD failed for %s", key, exc_info=e)
+            return False
+
+    def smembers(self, key: str) -> set:
+        return self.redis.smembers(key)
+
+    def incr(self, key: str) -> Optional[int]:
+        try:
+            return self.redis.incr(key)
+        except redis.RedisError as e:
+            logger.error("Redis INCR failed for %s", key, exc_info=e)
+            return None
+
     def xadd_event(
         self,
         stream_key: str,
         event_type: str,
         payload: dict,
-        max_len: Optional[int] = 10000,
+        max_len: Optional[int] = None,
     ) -> Optional[str]:
-        import json
-        import time
         try:
             fields = {
                 "event": event_type,
@@ -81,6 +147,71 @@ class RedisClient:
             logger.error("Redis XADD event failed", exc_info=e)
             return None
 
+    def xadd_events(
+        self,
+        stream_key: str,
+        event_type: str,
+        payloads: Iterable[dict],
+        chunk_size: int = 500,
+    ) -> List[Optional[str]]:
+        """
+        XADD one entry per payload, pipelined in chunks of chunk_size (one
+        round trip per chunk). Returns the entry ids in payload order; None for
+        entries whose chunk failed. No MAXLEN trim: use trim_acknowledged.
+        """
+        ts = str(time.time())
+        payloads = list(payloads)
+        ids: List[Optional[str]] = []
+        for start in range(0, len(payloads), chunk_size):
+            chunk = payloads[start : start + chunk_size]
+            pipe = self.redis.pipeline(transaction=False)
+            for payload in chunk:
+                pipe.xadd(
+                    stream_key,
+                    {
+                        "event": event_type,
+                        "payload": json.dumps(payload, default=str),
+                        "ts": ts,
+                    },
+                )
+            try:
+                ids.extend(pipe.execute())
+            except redis.RedisError as e:
+                logger.error(
+                    "Redis pipelined XADD failed (%d entries)", len(chunk), exc_info=e
+                )
+                ids.extend([None] * len(chunk))
+        return ids
+
+    def trim_acknowledged(self, stream_key: str, max_len: int) -> int:
+        """
+        Once the stream holds more than max_len entries, XTRIM entries every
+        consumer group has already read and acked. Unread and pending entries
+        are never removed, so a backlog above max_len is kept whole.
+        Returns the number of entries removed.
+        """
+        try:
+            if self.redis.xlen(stream_key) <= max_len:
+                return 0
+            groups = self.redis.xinfo_groups(stream_key)
+            if not groups:
+                # Nobody has read anything yet
+                return 0
+            pipe = self.redis.pipeline(transaction=False)
+            for group in groups:
+                pipe.xpending(stream_key, group["name"])
+            safe_ids = []
+            for group, pending in zip(groups, pipe.execute()):
+                if pending and pending.get("pending"):
+                    safe_ids.append(pending["min"])
+                else:
+                    safe_ids.append(group["last-delivered-id"])
+            min_id = min(safe_ids, key=lambda i: tuple(int(p) for p in i.split("-")))
+            return self.redis.xtrim(stream_key, minid=min_id, approximate=True)
+        except redis.RedisError as e:
+            logger.error("Redis XTRIM failed for %s", stream_key, exc_info=e)
+            return 0
+
     def create_consumer_group(
         self, stream_key: str, group_name: str, start_id: str = "0"
     ) -> bool:
@@ -124,6 +255,111 @@ class RedisClient:
             logger.error("Redis XREADGROUP failed", exc_info=e)
             return []
 
+    def autoclaim(
+        self,
+        stream_key: str,
+        group_name: str,
+        consumer_name: str,
+        min_idle_ms: int,
+        start_id: str = "0-0",
+        count: int = 100,
+    ):
+        """
+        XAUTOCLAIM entries idle for at least min_idle_ms to consumer_name.
+        Returns (next_start_id, [(msg_id, fields)]). Entries deleted from the
+        stream while pending are dropped from the PEL by Redis and skipped here.
+        """
+        try:
+            result = self.redis.xautoclaim(
+                stream_key,
+                group_name,
+                consumer_name,
+                min_idle_time=min_idle_ms,
+                start_id=start_id,
+                count=count,
+            )
+            next_id = result[0] if result else "0-0"
+            messages = result[1] if len(result) > 1 else []
+            return next_id, [
+                (msg_id, dict(fields)) for msg_id, fields in messages if fields
+            ]
+        except redis.RedisError as e:
+            logger.error("Redis XAUTOCLAIM failed", exc_info=e)
+            return start_id, []
+
+    def delivery_counts(
+        self, stream_key: str, group_name: str, message_ids: list
+    ) -> dict:
+        """Times each pending message has been delivered (from XPENDING), keyed by id."""
+        if not message_ids:
+            return {}
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for msg_id in message_ids:
+                pipe.xpending_range(
+                    stream_key, group_name, min=msg_id, max=msg_id, count=1
+                )
+            counts = {}
+            for entries in pipe.execute():
+                for entry in entries or []:
+                    counts[entry["message_id"]] = int(entry["times_delivered"])
+            return counts
+        except redis.RedisError as e:
+            logger.error("Redis XPENDING failed", exc_info=e)
+            return {}
+
+    def touch_pending(
+        self,
+        stream_key: str,
+        group_name: str,
+        consumer_name: str,
+        message_ids: list,
+    ) -> bool:
+        """
+        Reset idle time of messages this consumer is still working on, so other
+        consumers' reclaim loops don't steal long-running jobs. JUSTID keeps the
+        delivery counter unchanged.
+        """
+        if not message_ids:
+            return True
+        try:
+            self.redis.xclaim(
+                stream_key,
+                group_name,
+                consumer_name,
+                min_idle_time=0,
+                message_ids=message_ids,
+                justid=True,
+            )
+            return True
+        except redis.RedisError as e:
+            logger.error("Redis XCLAIM (heartbeat) failed", exc_info=e)
+            return False
+
+    def dead_letter(
+        self,
+        stream_key: str,
+        group_name: str,
+        dead_letter_key: str,
+        message_id: str,
+        fields: dict,
+        deliveries: int,
+    ) -> bool:
+        """Copy a poison message to the dead-letter stream and ack it on the source stream."""
+        try:
+            entry = dict(fields)
+            entry["original_id"] = message_id
+            entry["original_stream"] = stream_key
+            entry["deliveries"] = str(deliveries)
+            pipe = self.redis.pipeline(transaction=True)
+            pipe.xadd(dead_letter_key, entry)
+            pipe.xack(stream_key, group_name, message_id)
+            pipe.execute()
+            return True
+        except redis.RedisError as e:
+            logger.error("Redis dead-letter failed for %s", message_id, exc_info=e)
+            return False
+
     def acknowledge(self, stream_key: str, group_name: str, message_id: str) -> bool:
         try:
             self.redis.xack(stream_key, group_name, message_id)
@@ -1,14 +1,27 @@
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 from botocore.exceptions import ClientError
 import cv2
 import numpy as np
 import logging
 import os
+import threading
+from typing import Dict, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
+# HTTP connections per client; one client is shared by all job / prefetch threads
+S3_MAX_POOL_CONNECTIONS = int(os.getenv("S3_MAX_POOL_CONNECTIONS", "32"))
+# Objects at least this large are downloaded with parallel ranged GETs
+S3_MULTIPART_THRESHOLD = int(os.getenv("S3_MULTIPART_THRESHOLD", str(64 * 1024 * 1024)))
+S3_TRANSFER_CONCURRENCY = int(os.getenv("S3_TRANSFER_CONCURRENCY", "8"))
+
 
 class S3Client:
+    _instances: Dict[Tuple[str, str], "S3Client"] = {}
+    _instances_lock = threading.Lock()
+
     def __init__(
         self,
         bucket_name: str,
@@ -21,23 +34,65 @@ class S3Client:
             region_name=region,
             aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
             aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+            config=Config(
+                max_pool_connections=S3_MAX_POOL_CONNECTIONS,
+                retries={"mode": "standard"},
+            ),
         )
         self.bucket_name = bucket_name
         self.region = region
+        self.transfer_config = TransferConfig(
+            multipart_threshold=S3_MULTIPART_THRESHOLD,
+            multipart_chunksize=max(8 * 1024 * 1024, S3_MULTIPART_THRESHOLD // 8),
+            max_concurrency=S3_TRANSFER_CONCURRENCY,
+        )
+
+    @classmethod
+    def get_instance(cls, bucket_name: str, region: Optional[str] = None) -> "S3Client":
+        """
+        Shared client for (bucket, region). boto3 clients are thread-safe once
+        built, but building one is slow and not thread-safe, so it happens
+        once per key under a lock.
+        """
+        region = region or os.getenv("AWS_REGION") or "us-east-1"
+        key = (bucket_name, region)
+        client = cls._instances.get(key)
+        if client is None:
+            with cls._instances_lock:
+                client = cls._instances.get(key)
+                if client is None:
+                    client = cls(bucket_name=bucket_name, region=region)
+                    cls._instances[key] = client
+        return client
 
     def download_file(
         self,
         s3_key: str,
         local_path: str,
     ) -> bool:
-        """Download file from S3"""
+        """Download file from S3 (large objects in parallel parts)"""
         try:
-            self.s3.download_file(self.bucket_name, s3_key, local_path)
+            self.s3.download_file(
+                self.bucket_name, s3_key, local_path, Config=self.transfer_config
+            )
             return True
         except ClientError as e:
             logger.error(f"Error downloading {s3_key}: {str(e)}")
             return False
 
+    def open_object(self, s3_key: str):
+        """
+        Start a streaming GET of an object.
+        Returns (content_length, StreamingBody), or None on error. The caller
+        reads the body (e.g. body.iter_chunks()) and closes it.
+        """
+        try:
+            obj = self.s3.get_object(Bucket=self.bucket_name, Key=s3_key)
+            return obj["ContentLength"], obj["Body"]
+        except ClientError as e:
+            logger.error(f"Error downloading {s3_key}: {str(e)}")
+            return None
+
     def upload_image(self, image: np.ndarray, s3_key: str) -> str:
         """Upload OpenCV image to S3 and return URL"""
         try:
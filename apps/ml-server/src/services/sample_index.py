@@ -0,0 +1,298 @@
+"""
+In-memory index of face samples (type=sample) per wedding.
+Photo faces are matched against a wedding's few hundred guest samples with one
+matrix product instead of one Pinecone query per face. Pinecone stays the
+source of truth: weddings are loaded from it lazily, refreshed when a sample
+changes (a load missing a just-upserted sample is not cached), evicted LRU,
+and search() returns None whenever the caller should fall back to querying
+Pinecone.
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .metrics import metrics
+from .redis_service import RedisClient
+from .vector_db import VectorDBService
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_INDEX_MAX_WEDDINGS = int(os.getenv("SAMPLE_INDEX_MAX_WEDDINGS", "64"))
+# Reload a wedding at least this often even without a version bump
+SAMPLE_INDEX_TTL_S = float(os.getenv("SAMPLE_INDEX_TTL_S", "600"))
+# Weddings with this many samples or more are searched in Pinecone (load would truncate)
+SAMPLE_INDEX_MAX_SAMPLES = 1000
+# Redis key bumped on every sample upsert so all worker processes reload
+_VERSION_KEY = "ai:sample-index:version:{wedding_id}"
+# Sample ids upserted recently: a load that lacks one (Pinecone not yet
+# consistent) isn't cached. Expires well after Pinecone catches up.
+_RECENT_KEY = "ai:sample-index:recent:{wedding_id}"
+_RECENT_TTL_S = 300
+
+
+class _WeddingSamples:
+    __slots__ = ("ids", "matrix", "metadata", "version", "loaded_at")
+
+    def __init__(self, ids, matrix, metadata, version, loaded_at):
+        self.ids: List[str] = ids
+        self.matrix: np.ndarray = matrix  # (n, dim) float32, rows L2-normalised
+        self.metadata: List[Dict[str, Any]] = metadata
+        self.version: Optional[str] = version
+        self.loaded_at: float = loaded_at
+
+
+def _normalise(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class SampleIndex:
+    def __init__(
+        self,
+        vector_db: VectorDBService,
+        redis_client: Optional[RedisClient] = None,
+        max_weddings: int = SAMPLE_INDEX_MAX_WEDDINGS,
+        ttl_s: float = SAMPLE_INDEX_TTL_S,
+    ):
+        self.vector_db = vector_db
+        self.redis_client = redis_client
+        self.max_weddings = max(1, max_weddings)
+        self.ttl_s = ttl_s
+        self._weddings: "OrderedDict[str, Optional[_WeddingSamples]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+
+    def _version(self, wedding_id: str) -> Optional[str]:
+        if self.redis_client is None:
+            return None
+        try:
+            return self.redis_client.get(_VERSION_KEY.format(wedding_id=wedding_id))
+        except Exception as e:
+            logger.warning("Sample index version lookup failed: %s", e)
+            return None
+
+    def _recent(self, wedding_id: str) -> set:
+        if self.redis_client is None:
+            return set()
+        try:
+            return self.redis_client.smembers(_RECENT_KEY.format(wedding_id=wedding_id))
+        except Exception as e:
+            logger.warning("Sample index recent-samples lookup failed: %s", e)
+            return set()
+
+    def _load(self, wedding_id: str, version: Optional[str]) -> Optional[_WeddingSamples]:
+        start = time.perf_counter()
+        # Read before the listing: every sample in it must be in the listing
+        recent = self._recent(wedding_id)
+        vectors = self.vector_db.list_vectors_by_filter(
+            {"wedding_id": wedding_id, "type": "sample"},
+            limit=SAMPLE_INDEX_MAX_SAMPLES,
+        )
+        if vectors is None:
+            return None
+        if len(vectors) >= SAMPLE_INDEX_MAX_SAMPLES:
+            logger.info(
+                "Wedding %s has %d+ samples; using Pinecone search",
+                wedding_id,
+                SAMPLE_INDEX_MAX_SAMPLES,
+            )
+            return None
+        missing = recent - {v["id"] for v in vectors}
+        if missing:
+            # The filtered listing may lag behind fetch by id
+            fetched = self.vector_db.fetch_vectors(sorted(missing))
+            for vid, info in fetched.items():
+                if info.get("values"):
+                    vectors.append({"id": vid, **info})
+                    missing.discard(vid)
+        complete = not missing
+        if not complete:
+            logger.info(
+                "Samples %s of wedding %s not in Pinecone yet; not caching the load",
+                sorted(missing),
+                wedding_id,
+            )
+            metrics().incr("sample_index.incomplete_loads")
+        dim = self.vector_db.dimension
+        matrix = np.zeros((len(vectors), dim), dtype=np.float32)
+        for row, v in enumerate(vectors):
+            matrix[row] = v["values"]
+        entry = _WeddingSamples(
+            ids=[v["id"] for v in vectors],
+            matrix=_normalise(matrix),
+            metadata=[v["metadata"] for v in vectors],
+            version=version,
+            # An incomplete load is stale at once: the next lookup reloads
+            loaded_at=time.monotonic() if complete else float("-inf"),
+        )
+        load_ms = (time.perf_counter() - start) * 1000
+        metrics().observe("sample_index.load_ms", load_ms)
+        logger.info(
+            "Loaded %d samples for wedding %s in %.0f ms",
+            len(entry.ids),
+            wedding_id,
+            load_ms,
+        )
+        return entry
+
+    def _get(self, wedding_id: str) -> Optional[_WeddingSamples]:
+        version = self._version(wedding_id)
+        with self._lock:
+            entry = self._weddings.get(wedding_id)
+            fresh = (
+                entry is not None
+                and entry.version == version
+                and time.monotonic() - entry.loaded_at < self.ttl_s
+            )
+            if fresh:
+                self._weddings.move_to_end(wedding_id)
+                return entry
+            load_lock = self._load_locks.setdefault(wedding_id, threading.Lock())
+
+        with load_lock:
+            # Another thread may have loaded it while we waited
+            with self._lock:
+                entry = self._weddings.get(wedding_id)
+                if (
+                    entry is not None
+                    and entry.version == version
+                    and time.monotonic() - entry.loaded_at < self.ttl_s
+                ):
+                    return entry
+            entry = self._load(wedding_id, version)
+            with self._lock:
+                if entry is None:
+                    self._weddings.pop(wedding_id, None)
+                    self._load_locks.pop(wedding_id, None)
+                    return None
+                self._weddings[wedding_id] = entry
+                self._weddings.move_to_end(wedding_id)
+                while len(self._weddings) > self.max_weddings:
+                    evicted, _ = self._weddings.popitem(last=False)
+                    self._load_locks.pop(evicted, None)
+                    metrics().incr("sample_index.evictions")
+                metrics().set_gauge("sample_index.weddings", len(self._weddings))
+                return entry
+
+    def search(
+        self,
+        wedding_id: str,
+        query_embeddings: List[List[float]],
+        top_k: int = 5,
+        min_score: float = 0.4,
+    ) -> Optional[List[List[Dict]]]:
+        """
+        Match each query embedding against the wedding's samples (cosine).
+        Returns one match list per query in the same format as
+        VectorDBService.search_similar_faces, or None to fall back to Pinecone.
+        """
+        if not query_embeddings:
+            return []
+        entry = self._get(wedding_id)
+        if entry is None:
+            metrics().incr("sample_index.fallbacks")
+            return None
+        metrics().incr("sample_index.hits")
+        if not entry.ids:
+            return [[] for _ in query_embeddings]
+
+        queries = _normalise(np.asarray(query_embeddings, dtype=np.float32))
+        scores = queries @ entry.matrix.T  # (faces, samples)
+        k = min(top_k, scores.shape[1])
+        results: List[List[Dict]] = []
+        for row in scores:
+            top = np.argpartition(-row, k - 1)[:k]
+            top = top[np.argsort(-row[top])]
+            matches = []
+            for col in top:
+                score = float(row[col])
+                if score < min_score:
+                    break
+                m = entry.metadata[col]
+                matches.append(
+                    {
+                        "face_id": entry.ids[col],
+                        "score": score,
+                        "photo_id": m.get("photo_id"),
+                        "guest_id": m.get("guest_id"),
+                        "user_id": m.get("user_id"),
+                        "s3_url": m.get("s3_url") or m.get("photo_url"),
+                        "thumbnail_url": m.get("thumbnail_url"),
+                        "bbox": m.get("bbox"),
+                        "confidence": m.get("confidence"),
+                    }
+                )
+            results.append(matches)
+        return results
+
+    def samples(
+        self, wedding_id: str
+    ) -> Optional[Tuple[List[str], np.ndarray, List[Dict[str, Any]]]]:
+        """
+        (ids, matrix, metadata) of the wedding's samples: L2-normalised rows
+        aligned with their ids and metadata. None when the wedding can't be held
+        in memory. The arrays are shared and must not be modified.
+        """
+        entry = self._get(wedding_id)
+        if entry is None:
+            return None
+        return entry.ids, entry.matrix, entry.metadata
+
+    def upsert(
+        self,
+        wedding_id: str,
+        vector_id: str,
+        embedding: List[float],
+        metadata: Dict[str, Any],
+    ) -> None:
+        """
+        Record a sample that was just upserted to Pinecone: bump the shared
+        version so other processes reload, and update this process's copy in
+        place if it was at the version just before the bump.
+        """
+        new_version = None
+        if self.redis_client is not None:
+            # Before the bump, so a reload triggered by it checks for this sample
+            self.redis_client.sadd_with_ttl(
+                _RECENT_KEY.format(wedding_id=wedding_id), [vector_id], _RECENT_TTL_S
+            )
+            version = self.redis_client.incr(_VERSION_KEY.format(wedding_id=wedding_id))
+            new_version = str(version) if version is not None else None
+        with self._lock:
+            entry = self._weddings.get(wedding_id)
+            if entry is None:
+                return
+            if self.redis_client is not None and (
+                new_version is None
+                or new_version != str(int(entry.version or 0) + 1)
+            ):
+                # Could not publish the change, or another process bumped the
+                # version too and our copy lacks its sample: reload on next lookup
+                self._weddings.pop(wedding_id, None)
+                return
+            row = _normalise(np.asarray([embedding], dtype=np.float32))
+            if vector_id in entry.ids:
+                idx = entry.ids.index(vector_id)
+                matrix = entry.matrix.copy()
+                matrix[idx] = row[0]
+                metadata_list = list(entry.metadata)
+                metadata_list[idx] = metadata
+                ids = entry.ids
+            else:
+                matrix = np.vstack([entry.matrix, row])
+                metadata_list = entry.metadata + [metadata]
+                ids = entry.ids + [vector_id]
+            # Replace the entry instead of mutating it: searches may hold the old one
+            self._weddings[wedding_id] = _WeddingSamples(
+                ids, matrix, metadata_list, new_version, entry.loaded_at
+            )
+
+    def invalidate(self, wedding_id: str) -> None:
+        with self._lock:
+            self._weddings.pop(wedding_id, None)
@@ -0,0 +1,173 @@
+"""
+Write-behind reporter for Photo / AiProcessingQueue status.
+Merges status updates per photo and sends them in bulk on a timer or once
+enough photos are pending. flush(photo_id) blocks until that photo's updates
+have been sent, so the worker can ack the stream message afterwards.
+"""
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from .api_client import (
+    patch_photo,
+    patch_processing_queue,
+    post_photo_status_bulk,
+)
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+STATUS_FLUSH_INTERVAL_S = float(os.getenv("STATUS_FLUSH_INTERVAL_S", "2"))
+STATUS_FLUSH_MAX_PHOTOS = int(os.getenv("STATUS_FLUSH_MAX_PHOTOS", "100"))
+# An explicit flush waits this long so photos finishing together share one request
+STATUS_FLUSH_LINGER_MS = int(os.getenv("STATUS_FLUSH_LINGER_MS", "20"))
+# Server-side cap on updates per bulk request
+_BULK_CHUNK = 500
+
+
+class StatusReporter:
+    """
+    update_photo / update_queue take the same keyword arguments as
+    api_client.patch_photo / patch_processing_queue. Later values for the same
+    field overwrite earlier ones, so e.g. "processing" followed by "completed"
+    for one photo is sent as a single update when both land in the same window.
+    """
+
+    _instance: Optional["StatusReporter"] = None
+    _instance_lock = threading.Lock()
+
+    def __init__(
+        self,
+        flush_interval_s: float = STATUS_FLUSH_INTERVAL_S,
+        max_photos: int = STATUS_FLUSH_MAX_PHOTOS,
+        linger_ms: int = STATUS_FLUSH_LINGER_MS,
+    ):
+        self.flush_interval_s = flush_interval_s
+        self.max_photos = max(1, max_photos)
+        self.linger_s = linger_ms / 1000
+        self._cond = threading.Condition()
+        # photo_id -> {"photo": {...}, "queue": {...}}
+        self._pending: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._in_flight: set = set()
+        self._failed: set = set()
+        self._urgent = False
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def get_instance(cls) -> "StatusReporter":
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    def update_photo(self, photo_id: str, **fields: Any) -> None:
+        self._merge(photo_id, "photo", fields)
+
+    def update_queue(self, photo_id: str, **fields: Any) -> None:
+        self._merge(photo_id, "queue", fields)
+
+    def _merge(self, photo_id: str, section: str, fields: Dict[str, Any]) -> None:
+        with self._cond:
+            entry = self._pending.setdefault(photo_id, {"photo": {}, "queue": {}})
+            entry[section].update({k: v for k, v in fields.items() if v is not None})
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="status-reporter", daemon=True
+                )
+                self._thread.start()
+            if len(self._pending) >= self.max_photos:
+                self._urgent = True
+                self._cond.notify_all()
+
+    def flush(self, photo_id: Optional[str] = None, timeout: float = 60.0) -> bool:
+        """
+        Block until photo_id's updates (or all pending updates) have been sent.
+        Returns False if they could not be delivered or the timeout expired.
+        """
+
+        def done() -> bool:
+            if photo_id is None:
+                return not self._pending and not self._in_flight
+            return photo_id not in self._pending and photo_id not in self._in_flight
+
+        with self._cond:
+            if not done():
+                self._urgent = True
+                self._cond.notify_all()
+                if not self._cond.wait_for(done, timeout=timeout):
+                    logger.error("Status flush timed out for %s", photo_id or "all")
+                    return False
+            if photo_id is None:
+                ok = not self._failed
+                self._failed.clear()
+                return ok
+            if photo_id in self._failed:
+                self._failed.discard(photo_id)
+                return False
+            return True
+
+    def close(self, timeout: float = 60.0) -> None:
+        """Send everything still pending and stop the background thread."""
+        self.flush(timeout=timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: self._urgent or self._closed, timeout=self.flush_interval_s
+                )
+                if self._closed and not self._pending:
+                    return
+                urgent = self._urgent
+            if urgent and self.linger_s:
+                time.sleep(self.linger_s)
+            self._send_pending()
+
+    def _send_pending(self) -> None:
+        with self._cond:
+            batch = self._pending
+            self._pending = {}
+            self._urgent = False
+            self._in_flight.update(batch)
+        if not batch:
+            return
+        failed = set()
+        start = time.perf_counter()
+        try:
+            items = [{"photo_id": pid, **sections} for pid, sections in batch.items()]
+            for i in range(0, len(items), _BULK_CHUNK):
+                chunk = items[i : i + _BULK_CHUNK]
+                if not post_photo_status_bulk(chunk):
+                    failed.update(self._send_individually(chunk))
+        finally:
+            metrics().observe("status.flush_ms", (time.perf_counter() - start) * 1000)
+            metrics().incr("status.photos_flushed", len(batch))
+            with self._cond:
+                self._in_flight.difference_update(batch)
+                self._failed.difference_update(set(batch) - failed)
+                self._failed.update(failed)
+                self._cond.notify_all()
+
+    @staticmethod
+    def _send_individually(items) -> set:
+        """Fallback when the bulk request fails: one PATCH per photo / queue row."""
+        failed = set()
+        for item in items:
+            pid = item["photo_id"]
+            ok = True
+            if item.get("photo"):
+                ok = patch_photo(pid, **item["photo"]) and ok
+            if item.get("queue"):
+                ok = patch_processing_queue(pid, **item["queue"]) and ok
+            if not ok:
+                failed.add(pid)
+        return failed
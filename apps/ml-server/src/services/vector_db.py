@@ -1,4 +1,8 @@
-from typing import List, Dict, Optional
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Iterator, List, Dict, Optional, Protocol
 import numpy as np
 from pinecone import Pinecone, ServerlessSpec
 
@@ -6,8 +10,21 @@ from pinecone import Pinecone, ServerlessSpec
 # from pymilvus import connections, Collection, FieldSchema, CollectionSchema, DataType
 import logging
 
+from .local_vector_index import LocalVectorIndex
+from .quantized_index import QuantizedFaceIndex
+
 logger = logging.getLogger(__name__)
 
+# "pinecone" (default) or "local" (on-disk index under LOCAL_VECTOR_DB_PATH, no network)
+VECTOR_DB_BACKEND = os.getenv("VECTOR_DB_BACKEND", "pinecone").lower()
+LOCAL_VECTOR_DB_PATH = os.getenv("LOCAL_VECTOR_DB_PATH", "data/vector-index")
+# Max in-flight Pinecone queries per service instance (for batched searches)
+VECTOR_QUERY_CONCURRENCY = int(os.getenv("VECTOR_QUERY_CONCURRENCY", "8"))
+# Matches per page (one query each) when paging through photo-face search results
+PHOTO_SEARCH_PAGE_SIZE = int(os.getenv("PHOTO_SEARCH_PAGE_SIZE", "500"))
+# Pinecone caps $nin at 10,000 values: paging stops after that many photos
+_MAX_EXCLUDED_PHOTOS = 10000
+
 
 def _pinecone_metadata(value):
     """
@@ -31,18 +48,97 @@ def _sanitize_metadata(metadata: Dict) -> Dict:
     return {k: _pinecone_metadata(v) for k, v in metadata.items() if v is not None}
 
 
+def _photo_filter(wedding_ids: List[str]) -> Dict:
+    """Filter for photo faces (type=photo) in the given weddings."""
+    if len(wedding_ids) == 1:
+        return {"$and": [{"type": "photo"}, {"wedding_id": wedding_ids[0]}]}
+    return {"$and": [{"type": "photo"}, {"wedding_id": {"$in": wedding_ids}}]}
+
+
+def _format_matches(raw_matches, min_score: float) -> List[Dict]:
+    """Filter query matches by minimum score and flatten their metadata."""
+    matches = []
+    for match in raw_matches:
+        m = match.get("metadata") or {}
+        if match.get("score", 0) >= min_score:
+            matches.append(
+                {
+                    "face_id": match["id"],
+                    "score": match["score"],
+                    "photo_id": m.get("photo_id"),
+                    "guest_id": m.get("guest_id"),
+                    "user_id": m.get("user_id"),
+                    "s3_url": m.get("s3_url") or m.get("photo_url"),
+                    "thumbnail_url": m.get("thumbnail_url"),
+                    "bbox": m.get("bbox"),
+                    "confidence": m.get("confidence"),
+                }
+            )
+    return matches
+
+
+class VectorIndex(Protocol):
+    """
+    Index operations VectorDBService relies on. Implemented by the Pinecone
+    Index client and by LocalVectorIndex; results are dict-like.
+    """
+
+    def upsert(self, vectors: List[Dict[str, Any]], **kwargs) -> Any: ...
+
+    def query(
+        self,
+        vector: List[float],
+        top_k: int,
+        include_metadata: bool = False,
+        include_values: bool = False,
+        filter: Optional[Dict] = None,
+        **kwargs,
+    ) -> Any: ...
+
+    def fetch(self, ids: List[str], **kwargs) -> Any: ...
+
+    def delete(
+        self, ids: Optional[List[str]] = None, filter: Optional[Dict] = None, **kwargs
+    ) -> Any: ...
+
+    def describe_index_stats(self, **kwargs) -> Any: ...
+
+
 class VectorDBService:
     """
     Handles vector storage and similarity search
-    Using Pinecone as example (similar pattern for Milvus)
+    Using Pinecone as example (similar pattern for Milvus);
+    backend="local" swaps in LocalVectorIndex with the same filters.
     """
 
     def __init__(
-        self, api_key: str, index_name: str = "face-embeddings", dimension: int = 512
+        self,
+        api_key: str,
+        index_name: str = "face-embeddings",
+        dimension: int = 512,
+        query_concurrency: int = VECTOR_QUERY_CONCURRENCY,
+        backend: str = VECTOR_DB_BACKEND,
+        local_path: str = LOCAL_VECTOR_DB_PATH,
     ):
-        self.pc = Pinecone(api_key=api_key)
         self.index_name = index_name
         self.dimension = dimension
+        self.backend = backend
+        self.query_concurrency = max(1, query_concurrency)
+        self._query_pool: Optional[ThreadPoolExecutor] = None
+        self._query_pool_lock = threading.Lock()
+        self.photo_face_index: Optional[QuantizedFaceIndex] = None
+        self.index: VectorIndex
+
+        if backend == "local":
+            self.pc = None
+            self.index = LocalVectorIndex(
+                os.path.join(local_path, index_name), dimension=dimension
+            )
+            return
+        if backend != "pinecone":
+            raise ValueError(f"Unknown vector DB backend: {backend}")
+
+        self.pc = Pinecone(api_key=api_key)
 
         # Create index if doesn't exist
         if index_name not in self.pc.list_indexes().names():
@@ -84,41 +180,60 @@ class VectorDBService:
             logger.error(f"Error upserting face {face_id}: {str(e)}")
             return False
 
-    def upsert_faces_batch(self, faces: List[Dict]) -> int:
+    def upsert_faces_batch(
+        self, faces: List[Dict], max_retries: int = 3, batch_size: int = 100
+    ) -> int:
         """
         Batch insert multiple faces
 
         Args:
             faces: List of dicts with 'id', 'embedding', 'metadata'
+            max_retries: Attempts per chunk; a failed chunk is retried with
+                backoff without resending chunks that already succeeded
+            batch_size: Vectors per upsert request (Pinecone recommends 100)
 
         Returns:
             Number of successfully inserted faces
         """
-        try:
-            vectors = [
-                {
-                    "id": face["id"],
-                    "values": face["embedding"],
-                    "metadata": _sanitize_metadata(face.get("metadata") or {}),
-                }
-                for face in faces
-            ]
-
-            # Pinecone recommends batches of 100
-            batch_size = 100
-            success_count = 0
+        vectors = [
+            {
+                "id": face["id"],
+                "values": face["embedding"],
+                "metadata": _sanitize_metadata(face.get("metadata") or {}),
+            }
+            for face in faces
+        ]
 
-            for i in range(0, len(vectors), batch_size):
-                batch = vectors[i : i + batch_size]
-                self.index.upsert(vectors=batch)
-                success_count += len(batch)
+        success_count = 0
+        for i in range(0, len(vectors), batch_size):
+            batch = vectors[i : i + batch_size]
+            for attempt in range(1, max_retries + 1):
+                try:
+                    self.index.upsert(vectors=batch)
+                    success_count += len(batch)
+                    break
+                except Exception as e:
+                    if attempt == max_retries:
+                        logger.error(
+                            f"Error batch upserting {len(batch)} faces "
+                            f"(giving up after {attempt} attempts): {str(e)}"
+                        )
+                    else:
+                        logger.warning(
+                            f"Batch upsert attempt {attempt} failed: {str(e)}; retrying"
+                        )
+                        time.sleep(0.5 * 2 ** (attempt - 1))
 
-            logger.info(f"Batch upserted {success_count} faces")
-            return success_count
+        logger.info(f"Batch upserted {success_count}/{len(vectors)} faces")
+        return success_count
 
-        except Exception as e:
-            logger.error(f"Error batch upserting: {str(e)}")
-            return 0
+    def attach_photo_face_index(self, index: Optional[QuantizedFaceIndex]) -> None:
+        """
+        Serve search_photo_faces from a local quantized index for weddings it
+        covers. Only attach one whose embedding store receives every photo face
+        of those weddings, or searches will miss faces stored elsewhere.
+        """
+        self.photo_face_index = index
 
     def search_photo_faces(
         self,
@@ -131,22 +246,97 @@ class VectorDBService:
         Search for photo faces (type=photo) in the given weddings.
         Used when a new face sample is added: match sample to existing photo faces
         and create tags without reprocessing every photo.
+        Answered locally when an attached photo-face index covers all weddings.
         """
         if not wedding_ids:
             return []
-        if len(wedding_ids) == 1:
-            filter_expr = {"$and": [{"type": "photo"}, {"wedding_id": wedding_ids[0]}]}
-        else:
-            filter_expr = {
-                "$and": [{"type": "photo"}, {"wedding_id": {"$in": wedding_ids}}]
-            }
+        if self.photo_face_index is not None and self.photo_face_index.covers(
+            wedding_ids
+        ):
+            try:
+                matches = self.photo_face_index.search(
+                    query_embedding, wedding_ids, top_k=top_k, min_score=min_score
+                )
+                logger.info(
+                    f"Found {len(matches)} photo faces above threshold {min_score} "
+                    f"(local index)"
+                )
+                return matches
+            except Exception as e:
+                logger.warning(f"Local photo-face search failed, using index: {e}")
         return self.search_similar_faces(
             query_embedding=query_embedding,
             top_k=top_k,
             min_score=min_score,
-            filter_metadata=filter_expr,
+            filter_metadata=_photo_filter(wedding_ids),
         )
 
+    def iter_photo_faces(
+        self,
+        query_embedding: List[float],
+        wedding_ids: List[str],
+        min_score: float = 0.4,
+        page_size: int = PHOTO_SEARCH_PAGE_SIZE,
+    ) -> Iterator[List[Dict]]:
+        """
+        Every photo face in the given weddings with score >= min_score, in
+        pages of at most page_size (search_photo_faces format), each page best
+        first.
+
+        Against the index, pages come best first; each is one query that
+        excludes the photos of earlier pages ($nin on photo_id), so the best
+        face of every matching photo is returned; a photo's other faces are
+        only returned if they rank in the same page. Paging stops at the first
+        page cut short by min_score. The local photo-face index scores every
+        face exactly and returns all of them, a wedding and a block of
+        candidates at a time, so only one page is held in memory.
+        """
+        if not wedding_ids:
+            return
+        if self.photo_face_index is not None and self.photo_face_index.covers(
+            wedding_ids
+        ):
+            pages = self.photo_face_index.iter_search(
+                query_embedding, wedding_ids, min_score=min_score, page_size=page_size
+            )
+            try:
+                first = next(pages, None)
+            except Exception as e:
+                logger.warning(f"Local photo-face search failed, using index: {e}")
+            else:
+                if first is not None:
+                    yield first
+                    yield from pages
+                return
+        base = _photo_filter(wedding_ids)
+        seen: List[str] = []
+        seen_set = set()
+        while True:
+            filter_expr = base
+            if seen:
+                filter_expr = {"$and": base["$and"] + [{"photo_id": {"$nin": seen}}]}
+            page = self.search_similar_faces(
+                query_embedding=query_embedding,
+                top_k=page_size,
+                min_score=min_score,
+                filter_metadata=filter_expr,
+            )
+            if page:
+                yield page
+            if len(page) < page_size:
+                return
+            new = {m["photo_id"] for m in page if m.get("photo_id")} - seen_set
+            if not new:
+                return
+            if len(seen) + len(new) > _MAX_EXCLUDED_PHOTOS:
+                logger.warning(
+                    f"Photo-face search stopped after {len(seen)} photos "
+                    f"(exclusion filter limit)"
+                )
+                return
+            seen.extend(sorted(new))
+            seen_set.update(new)
+
     def search_similar_faces(
         self,
         query_embedding: List[float],
@@ -175,26 +365,7 @@ class VectorDBService:
                 filter=filter_metadata,
             )
 
-            # Filter by minimum score and format results
-            matches = []
-            meta = results.get("matches", [])
-            for match in meta:
-                m = match.get("metadata") or {}
-                if match.get("score", 0) >= min_score:
-                    matches.append(
-                        {
-                            "face_id": match["id"],
-                            "score": match["score"],
-                            "photo_id": m.get("photo_id"),
-                            "guest_id": m.get("guest_id"),
-                            "user_id": m.get("user_id"),
-                            "s3_url": m.get("s3_url") or m.get("photo_url"),
-                            "thumbnail_url": m.get("thumbnail_url"),
-                            "bbox": m.get("bbox"),
-                            "confidence": m.get("confidence"),
-                        }
-                    )
-
+            matches = _format_matches(results.get("matches", []), min_score)
             logger.info(f"Found {len(matches)} matches above threshold {min_score}")
             return matches
 
@@ -202,6 +373,81 @@ class VectorDBService:
             logger.error(f"Error searching similar faces: {str(e)}")
             return []
 
+    def search_similar_faces_batch(
+        self,
+        query_embeddings: List[List[float]],
+        top_k: int = 5,
+        min_score: float = 0.4,
+        filter_metadata: Optional[Dict] = None,
+    ) -> List[List[Dict]]:
+        """
+        Run search_similar_faces for several embeddings (e.g. all faces of one
+        photo) concurrently with the same filter.
+
+        Concurrency is capped per service instance by query_concurrency, so
+        parallel jobs share the same budget of in-flight Pinecone queries.
+
+        Returns:
+            One match list per query embedding, in input order
+        """
+        if not query_embeddings:
+            return []
+        if len(query_embeddings) == 1:
+            return [
+                self.search_similar_faces(
+                    query_embeddings[0], top_k, min_score, filter_metadata
+                )
+            ]
+        futures = [
+            self._get_query_pool().submit(
+                self.search_similar_faces, emb, top_k, min_score, filter_metadata
+            )
+            for emb in query_embeddings
+        ]
+        return [f.result() for f in futures]
+
+    def _get_query_pool(self) -> ThreadPoolExecutor:
+        if self._query_pool is None:
+            with self._query_pool_lock:
+                if self._query_pool is None:
+                    self._query_pool = ThreadPoolExecutor(
+                        max_workers=self.query_concurrency,
+                        thread_name_prefix="pinecone-query",
+                    )
+        return self._query_pool
+
+    def list_vectors_by_filter(
+        self, filter_metadata: Dict, limit: int = 1000
+    ) -> Optional[List[Dict]]:
+        """
+        Return up to limit vectors matching filter_metadata, with values and metadata.
+        Pinecone has no filtered scan, so this is a query with a constant probe
+        vector; limit is capped at 1000 when values are included.
+
+        Returns:
+            List of {"id", "values", "metadata"}, or None if the query failed
+        """
+        try:
+            probe = [1.0 / np.sqrt(self.dimension)] * self.dimension
+            results = self.index.query(
+                vector=probe,
+                top_k=min(limit, 1000),
+                include_values=True,
+                include_metadata=True,
+                filter=filter_metadata,
+            )
+            return [
+                {
+                    "id": match["id"],
+                    "values": match.get("values") or [],
+                    "metadata": match.get("metadata") or {},
+                }
+                for match in results.get("matches", [])
+            ]
+        except Exception as e:
+            logger.error(f"Error listing vectors by filter: {str(e)}")
+            return None
+
     def delete_faces_by_photo(self, photo_id: str) -> bool:
         """Delete all faces belonging to a photo"""
         try:
@@ -1,34 +1,110 @@
 """
 AI pipeline worker: consumes jobs from Redis stream and processes photos / face samples.
 """
+import hashlib
+import itertools
 import json
 import logging
 import os
+import signal
 import tempfile
+import threading
 import time
-from typing import Any, Dict, List, Optional
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import closing, contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Set
 
+import numpy as np
 import requests
 
 from services.api_client import (
     get_photo,
     get_wedding_photo_ids,
     patch_guest,
-    patch_photo,
-    patch_processing_queue,
     patch_user,
     post_face_sample,
-    post_photo_tag,
+    post_photo_tags_bulk,
 )
-from services.face_processor import FaceProcessor
+from services.embedding_store import EmbeddingStore
+from services.face_assignment import (
+    AssignmentRecord,
+    assign_faces,
+    assign_from_matches,
+    diff_assignments,
+    person_of,
+)
+from services.metrics import metrics
+from services.model_registry import ModelRegistry
+from services.processing_ledger import ProcessingLedger
+from services.quantized_index import QuantizedFaceIndex
 from services.redis_service import RedisClient as RedisClientClass
 from services.s3_client import S3Client
+from services.sample_index import SampleIndex
+from services.status_reporter import StatusReporter
 from services.vector_db import VectorDBService
 
 
 def _redis():
     return RedisClientClass.get_instance()
 
+
+def _models() -> ModelRegistry:
+    return ModelRegistry.get_instance()
+
+
+def _status() -> StatusReporter:
+    return StatusReporter.get_instance()
+
+
+def _embeddings() -> EmbeddingStore:
+    return EmbeddingStore.get_instance()
+
+
+_sample_index: Optional[SampleIndex] = None
+
+
+def _samples(vector_db: VectorDBService) -> SampleIndex:
+    """Per-process in-memory sample index, backed by vector_db."""
+    global _sample_index
+    if _sample_index is None or _sample_index.vector_db is not vector_db:
+        _sample_index = SampleIndex(vector_db, redis_client=_redis())
+    return _sample_index
+
+
+_processing_ledger: Optional[ProcessingLedger] = None
+_assignment_record: Optional[AssignmentRecord] = None
+
+
+def _ledger() -> ProcessingLedger:
+    global _processing_ledger
+    if _processing_ledger is None:
+        _processing_ledger = ProcessingLedger(_redis())
+    return _processing_ledger
+
+
+def _assignments() -> AssignmentRecord:
+    global _assignment_record
+    if _assignment_record is None:
+        _assignment_record = AssignmentRecord(_redis())
+    return _assignment_record
+
+
+# Set on SIGTERM/SIGINT: stop reading new messages, finish and ack what we have
+_shutdown = threading.Event()
+
+
+def _install_signal_handlers() -> None:
+    if threading.current_thread() is not threading.main_thread():
+        return
+
+    def _request_shutdown(signum, _frame):
+        if not _shutdown.is_set():
+            logger.info("Received signal %s; draining in-flight jobs", signum)
+        _shutdown.set()
+
+    signal.signal(signal.SIGTERM, _request_shutdown)
+    signal.signal(signal.SIGINT, _request_shutdown)
+
 logger = logging.getLogger(__name__)
 
 # Config from env
@@ -39,7 +115,54 @@ SIMILARITY_THRESHOLD = float(os.getenv("FACE_SIMILARITY_THRESHOLD", "0.6"))
 PINECONE_INDEX = os.getenv("PINECONE_INDEX_NAME", "wedding-faces")
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY", "")
 S3_BUCKET = os.getenv("S3_BUCKET_NAME", "")
+# Keep a local copy of photo-face embeddings per wedding (services/embedding_store.py)
+EMBEDDING_STORE_ENABLED = os.getenv("EMBEDDING_STORE_ENABLED", "true").lower() == "true"
+# Answer sample -> photo-face searches from the embedding store (int8 + exact re-rank)
+QUANTIZED_SEARCH_ENABLED = (
+    os.getenv("QUANTIZED_SEARCH_ENABLED", "false").lower() == "true"
+)
+# Skip inference for re-queued photos whose image is unchanged and whose
+# embeddings are already stored (services/processing_ledger.py)
+PROCESSING_LEDGER_ENABLED = (
+    os.getenv("PROCESSING_LEDGER_ENABLED", "true").lower() == "true"
+)
 AWS_REGION = os.getenv("AWS_REGION", "us-east-1")
+# Images up to this size are downloaded into a reusable in-memory buffer and
+# decoded with cv2.imdecode; larger ones are spooled to a temp file
+IMAGE_MEMORY_MAX_BYTES = int(os.getenv("IMAGE_MEMORY_MAX_BYTES", str(64 * 1024 * 1024)))
+_DOWNLOAD_CHUNK = 256 * 1024
+# Photos of upcoming photo_process messages downloaded ahead of their jobs
+PREFETCH_DEPTH = max(0, int(os.getenv("PREFETCH_DEPTH", "2")))
+# No new prefetch starts while this many downloaded bytes wait for their jobs
+PREFETCH_MAX_BYTES = int(os.getenv("PREFETCH_MAX_BYTES", str(256 * 1024 * 1024)))
+# Stream entries read per XREADGROUP call
+WORKER_BATCH_SIZE = max(1, int(os.getenv("WORKER_BATCH_SIZE", "1")))
+# Photos that reach inference together are embedded in one batch of up to this many
+INFERENCE_MAX_BATCH = max(1, int(os.getenv("INFERENCE_MAX_BATCH", "8")))
+# Job threads; 1 keeps the original sequential loop
+WORKER_CONCURRENCY = max(1, int(os.getenv("WORKER_CONCURRENCY", "1")))
+# Pending-entry reclaim: messages idle this long in a dead consumer's PEL are taken over
+RECLAIM_MIN_IDLE_MS = int(os.getenv("RECLAIM_MIN_IDLE_MS", "600000"))
+RECLAIM_INTERVAL_S = float(os.getenv("RECLAIM_INTERVAL_S", "60"))
+RECLAIM_BATCH_SIZE = int(os.getenv("RECLAIM_BATCH_SIZE", "50"))
+# Messages delivered more than this many times go to the dead-letter stream
+MAX_DELIVERIES = int(os.getenv("MAX_DELIVERIES", "5"))
+DEAD_LETTER_STREAM = os.getenv("REDIS_AI_DEAD_LETTER_STREAM", f"{STREAM_KEY}:dead")
+# Stored faces matched per round when re-matching a wedding
+REMATCH_CHUNK_SIZE = max(1, int(os.getenv("REMATCH_CHUNK_SIZE", "1000")))
+# Vector ids per Pinecone fetch
+_FETCH_BATCH = 100
+# Fan-out XADDs per pipelined round trip
+ENQUEUE_CHUNK_SIZE = max(1, int(os.getenv("ENQUEUE_CHUNK_SIZE", "500")))
+# Acked entries are trimmed once the stream is longer than this; unread and
+# pending entries are always kept, however long the backlog
+STREAM_MAX_LEN = int(os.getenv("STREAM_MAX_LEN", "10000"))
+# How often the worker logs its metrics snapshot (0 = never)
+METRICS_LOG_INTERVAL_S = float(os.getenv("METRICS_LOG_INTERVAL_S", "300"))
+WORKER_MAX_IN_FLIGHT = max(
+    WORKER_CONCURRENCY,
+    int(os.getenv("WORKER_MAX_IN_FLIGHT", str(WORKER_CONCURRENCY * 2))),
+)
 
 
 def _parse_s3_url(url: str) -> Optional[tuple[str, str, str]]:
@@ -72,42 +195,272 @@ def _parse_s3_url(url: str) -> Optional[tuple[str, str, str]]:
         return None
 
 
-def _download_image_to_temp(url: str, suffix: str = ".jpg") -> Optional[str]:
+class _DownloadedImage:
+    """
+    A downloaded image, either in memory (data: a view of the downloading
+    thread's reusable buffer, valid until that thread's next download, or of
+    a buffer of its own) or spooled to a temp file (path) when larger than
+    IMAGE_MEMORY_MAX_BYTES.
+    """
+
+    def __init__(
+        self, data: Optional[memoryview] = None, path: Optional[str] = None
+    ):
+        self.data = data
+        self.path = path
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held (0 when spooled to disk)."""
+        return len(self.data) if self.data is not None else 0
+
+    @property
+    def source(self):
+        """What FaceProcessor accepts: the temp file path or the encoded bytes."""
+        return self.path if self.path is not None else self.data
+
+    def content_hash(self) -> str:
+        digest = hashlib.blake2b(digest_size=16)
+        if self.data is not None:
+            digest.update(self.data)
+        elif self.path is not None:
+            with open(self.path, "rb") as f:
+                for chunk in iter(lambda: f.read(_DOWNLOAD_CHUNK), b""):
+                    digest.update(chunk)
+        return digest.hexdigest()
+
+    def close(self) -> None:
+        if self.data is not None:
+            self.data.release()
+            self.data = None
+        if self.path is not None:
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+            self.path = None
+
+
+_download_buffers = threading.local()
+
+
+def _download_buffer(size: int) -> bytearray:
+    """This thread's download buffer, replaced by a larger one when needed."""
+    buf = getattr(_download_buffers, "buf", None)
+    if buf is None or len(buf) < size:
+        grown = max(size, 2 * len(buf) if buf is not None else size)
+        buf = bytearray(min(grown, max(size, IMAGE_MEMORY_MAX_BYTES)))
+        _download_buffers.buf = buf
+    return buf
+
+
+def _new_buffer(size: int, reuse: bool) -> bytearray:
+    return _download_buffer(size) if reuse else bytearray(size)
+
+
+def _spool(chunks, head: bytes, suffix: str) -> _DownloadedImage:
+    """Write head and the rest of chunks to a temp file."""
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(head)
+            for chunk in chunks:
+                f.write(chunk)
+    except Exception:
+        os.unlink(path)
+        raise
+    metrics().incr("download.spooled")
+    return _DownloadedImage(path=path)
+
+
+def _receive(
+    chunks, length: Optional[int], suffix: str, reuse_buffer: bool = True
+) -> _DownloadedImage:
     """
-    Download image to a temp file. Uses boto3 (S3) when url is S3 and credentials
-    are set, otherwise falls back to requests.get (for public URLs).
+    Copy a chunk stream into memory, spilling to disk past the cap. With
+    reuse_buffer the data lands in this thread's reusable buffer, otherwise
+    in a new one that the image owns (for handing to another thread).
+    """
+    if length is not None and length > IMAGE_MEMORY_MAX_BYTES:
+        return _spool(chunks, b"", suffix)
+    buf = _new_buffer(length or _DOWNLOAD_CHUNK * 4, reuse_buffer)
+    size = 0
+    for chunk in chunks:
+        end = size + len(chunk)
+        if end > IMAGE_MEMORY_MAX_BYTES:
+            return _spool(chunks, bytes(buf[:size]) + chunk, suffix)
+        if end > len(buf):
+            grown = _new_buffer(
+                min(max(end, 2 * len(buf)), IMAGE_MEMORY_MAX_BYTES), reuse_buffer
+            )
+            grown[:size] = buf[:size]
+            buf = grown
+        buf[size:end] = chunk
+        size = end
+    metrics().incr("download.in_memory")
+    return _DownloadedImage(data=memoryview(buf)[:size])
+
+
+def _download_s3_to_temp(
+    s3: S3Client, key: str, suffix: str
+) -> Optional[_DownloadedImage]:
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    os.close(fd)
+    if s3.download_file(s3_key=key, local_path=path):
+        metrics().incr("download.spooled")
+        return _DownloadedImage(path=path)
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+    return None
+
+
+def _download_image(
+    url: str, suffix: str = ".jpg", reuse_buffer: bool = True
+) -> Optional[_DownloadedImage]:
+    """
+    Download an image into memory. Uses boto3 (S3 GetObject, streamed) when url
+    is S3 and credentials are set, otherwise requests.get (for public URLs).
+    Pass reuse_buffer=False when the image is consumed on another thread.
     """
     s3_parsed = _parse_s3_url(url)
     if s3_parsed and (os.getenv("AWS_ACCESS_KEY_ID") or os.getenv("AWS_SECRET_ACCESS_KEY")):
         bucket, key, region = s3_parsed
         try:
-            s3 = S3Client(bucket_name=bucket, region=region)
-            fd, path = tempfile.mkstemp(suffix=suffix)
-            os.close(fd)
-            if s3.download_file(s3_key=key, local_path=path):
-                return path
-            try:
-                os.unlink(path)
-            except OSError:
-                pass
-            return None
+            s3 = S3Client.get_instance(bucket, region)
+            opened = s3.open_object(key)
+            if opened is None:
+                return None
+            length, body = opened
+            with closing(body):
+                if length > IMAGE_MEMORY_MAX_BYTES:
+                    # Too big for memory: transfer manager (ranged GETs) to disk
+                    body.close()
+                    return _download_s3_to_temp(s3, key, suffix)
+                return _receive(
+                    body.iter_chunks(chunk_size=_DOWNLOAD_CHUNK),
+                    length,
+                    suffix,
+                    reuse_buffer,
+                )
         except Exception as e:
             logger.error("S3 download failed for %s: %s", url[:80], e)
             return None
 
     try:
         r = requests.get(url, timeout=60, stream=True)
-        r.raise_for_status()
-        fd, path = tempfile.mkstemp(suffix=suffix)
-        with os.fdopen(fd, "wb") as f:
-            for chunk in r.iter_content(chunk_size=8192):
-                f.write(chunk)
-        return path
+        with r:
+            r.raise_for_status()
+            # Content-Length is the encoded size; the buffer grows if gzip expands it
+            length = r.headers.get("Content-Length")
+            return _receive(
+                r.iter_content(chunk_size=_DOWNLOAD_CHUNK),
+                int(length) if length and length.isdigit() else None,
+                suffix,
+                reuse_buffer,
+            )
     except Exception as e:
         logger.error("Download failed for %s: %s", url[:80], e)
         return None
 
 
+class _Prefetcher:
+    """
+    Fetches the Photo record and downloads the image for upcoming
+    photo_process messages while earlier jobs run inference. At most depth
+    prefetches are running or waiting to be taken, and none start while the
+    images waiting for their jobs hold max_bytes or more (backpressure).
+    """
+
+    def __init__(
+        self, depth: int = PREFETCH_DEPTH, max_bytes: int = PREFETCH_MAX_BYTES
+    ):
+        self.depth = depth
+        self.max_bytes = max_bytes
+        self._pool = (
+            ThreadPoolExecutor(max_workers=depth, thread_name_prefix="prefetch")
+            if depth > 0
+            else None
+        )
+        self._futures: Dict[str, Future] = {}  # photo_id -> (photo, image)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def schedule(self, messages: List[tuple]) -> None:
+        """Start prefetches for photo_process messages, in order, while there's room."""
+        if self._pool is None:
+            return
+        for _, fields in messages:
+            if fields.get("event") != "photo_process":
+                continue
+            try:
+                photo_id = json.loads(fields.get("payload") or "{}").get("photoId")
+            except json.JSONDecodeError:
+                continue
+            if not photo_id:
+                continue
+            with self._lock:
+                if photo_id in self._futures:
+                    continue
+                if len(self._futures) >= self.depth or self._bytes >= self.max_bytes:
+                    return
+                self._futures[photo_id] = self._pool.submit(self._fetch, photo_id)
+
+    def _fetch(self, photo_id: str):
+        start = time.perf_counter()
+        photo = get_photo(photo_id)
+        url = (photo or {}).get("originalUrl")
+        image = _download_image(url, reuse_buffer=False) if url else None
+        if image is not None:
+            with self._lock:
+                self._bytes += image.nbytes
+            metrics().set_gauge("prefetch.bytes", self._bytes)
+        metrics().observe("prefetch.fetch_ms", (time.perf_counter() - start) * 1000)
+        return photo, image
+
+    def take(self, photo_id: str):
+        """
+        (photo, image) for photo_id, waiting if its prefetch is still running;
+        None if it was not prefetched or the prefetch failed.
+        """
+        with self._lock:
+            future = self._futures.pop(photo_id, None)
+        if future is None:
+            metrics().incr("prefetch.misses")
+            return None
+        wait_start = time.perf_counter()
+        try:
+            photo, image = future.result()
+        except Exception as e:
+            logger.warning("Prefetch failed for photo %s: %s", photo_id, e)
+            return None
+        metrics().observe("prefetch.wait_ms", (time.perf_counter() - wait_start) * 1000)
+        if image is None:
+            return None
+        with self._lock:
+            self._bytes -= image.nbytes
+        metrics().incr("prefetch.hits")
+        return photo, image
+
+    def close(self) -> None:
+        """Drop prefetches that no job took (e.g. on shutdown)."""
+        if self._pool is None:
+            return
+        with self._lock:
+            futures = list(self._futures.values())
+            self._futures.clear()
+        for future in futures:
+            future.cancel()
+        self._pool.shutdown(wait=True)
+        for future in futures:
+            if future.cancelled() or future.exception() is not None:
+                continue
+            _, image = future.result()
+            if image is not None:
+                image.close()
+
+
 def _bbox_to_box(bbox: List[Any]) -> Dict[str, int]:
     """Convert [x1, y1, x2, y2] to {x, y, width, height}. Handles str/int/float (e.g. from Pinecone metadata)."""
     if len(bbox) < 4:
@@ -119,109 +472,342 @@ def _bbox_to_box(bbox: List[Any]) -> Dict[str, int]:
     return {"x": int(x1), "y": int(y1), "width": int(x2 - x1), "height": int(y2 - y1)}
 
 
-def process_photo_job(photo_id: str, vector_db: VectorDBService) -> bool:
+def _store_photo_faces(
+    wedding_id: str, photo_id: str, faces: List[Dict[str, Any]]
+) -> None:
+    """Replace this photo's faces in the local embedding store (best effort)."""
+    try:
+        partition = _embeddings().partition(wedding_id)
+        partition.delete_photo(photo_id)
+        if faces:
+            partition.put(
+                [f"photo:{photo_id}:{i}" for i in range(len(faces))],
+                [f["embedding"] for f in faces],
+                bboxes=[f.get("bbox", [0, 0, 0, 0]) for f in faces],
+                confidences=[f.get("confidence", 0) for f in faces],
+            )
+    except Exception as e:
+        logger.warning("Embedding store write failed for photo %s: %s", photo_id, e)
+
+
+def process_photo_job(
+    photo_id: str,
+    vector_db: VectorDBService,
+    prefetched: Optional[tuple] = None,
+) -> bool:
     """
     Flow: get photo -> download -> extract faces -> get guest encodings ->
     for each face search Pinecone (samples for this wedding) -> create PhotoTags ->
     upsert face vectors -> update Photo and Queue.
+    Status updates go through the write-behind StatusReporter; the caller
+    flushes them before acking the message.
+    prefetched: (photo, image) from _Prefetcher.take, skipping fetch and download.
     """
-    photo = get_photo(photo_id)
-    if not photo:
-        patch_processing_queue(photo_id, status="failed", error_message="Photo not found")
+    photo, image = prefetched if prefetched is not None else (get_photo(photo_id), None)
+    try:
+        return _process_photo(photo_id, photo, image, vector_db)
+    finally:
+        if image is not None:
+            image.close()
+
+
+def _process_photo(
+    photo_id: str,
+    photo: Optional[Dict[str, Any]],
+    image: Optional[_DownloadedImage],
+    vector_db: VectorDBService,
+) -> bool:
+    started = _start_photo(photo_id, photo)
+    if started is None:
         return False
+    wedding_id, original_url, started_at = started
+
+    if image is None:
+        image = _download_image(original_url)
+    if image is None:
+        _fail_photo(photo_id, "Download failed")
+        return False
+
+    try:
+        content_hash, faces = _stored_faces(photo_id, wedding_id, image, vector_db)
+        reused = faces is not None
+        if faces is None:
+            faces = _extract_photo_faces(image)
+    except Exception as e:
+        logger.exception("Face extraction failed for %s", photo_id)
+        _fail_photo(photo_id, str(e))
+        return False
+    finally:
+        image.close()
+
+    return _finish_photo(
+        photo_id,
+        wedding_id,
+        original_url,
+        faces,
+        started_at,
+        vector_db,
+        content_hash=content_hash,
+        reused=reused,
+    )
+
+
+def _start_photo(
+    photo_id: str, photo: Optional[Dict[str, Any]]
+) -> Optional[tuple]:
+    """
+    Validate the Photo record and mark it processing.
+    Returns (wedding_id, original_url, started_at), or None after marking it failed.
+    """
+    reporter = _status()
+    if not photo:
+        reporter.update_queue(
+            photo_id, status="failed", error_message="Photo not found"
+        )
+        return None
 
     wedding_id = photo.get("wedding", {}).get("id") or photo.get("weddingId")
     if not wedding_id:
-        patch_processing_queue(
+        reporter.update_queue(
             photo_id, status="failed", error_message="Missing weddingId"
         )
-        return False
+        return None
 
     original_url = photo.get("originalUrl")
     if not original_url:
-        patch_processing_queue(
+        reporter.update_queue(
             photo_id, status="failed", error_message="Missing originalUrl"
         )
-        return False
+        return None
 
     started_at = time.time()
-    patch_processing_queue(
+    reporter.update_queue(
         photo_id,
         status="processing",
         started_at=time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(started_at)),
     )
-    patch_photo(photo_id, processing_status="processing")
-
-    local_path = _download_image_to_temp(original_url)
-    if not local_path:
-        patch_photo(photo_id, processing_status="failed", ai_error_message="Download failed")
-        patch_processing_queue(
-            photo_id,
-            status="failed",
-            error_message="Download failed",
-            completed_at=time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
-        )
-        return False
+    reporter.update_photo(photo_id, processing_status="processing")
+    return wedding_id, original_url, started_at
 
-    try:
-        face_processor = FaceProcessor()
-        faces = face_processor.extract_faces(local_path, min_confidence=0.5)
-    except Exception as e:
-        logger.exception("Face extraction failed for %s", photo_id)
-        patch_photo(photo_id, processing_status="failed", ai_error_message=str(e))
-        patch_processing_queue(
-            photo_id,
-            status="failed",
-            error_message=str(e),
-            completed_at=time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+
+def _fail_photo(photo_id: str, message: str) -> None:
+    reporter = _status()
+    reporter.update_photo(
+        photo_id, processing_status="failed", ai_error_message=message
+    )
+    reporter.update_queue(
+        photo_id,
+        status="failed",
+        error_message=message,
+        completed_at=time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    )
+
+
+def _stored_faces(
+    photo_id: str,
+    wedding_id: str,
+    image: _DownloadedImage,
+    vector_db: VectorDBService,
+) -> tuple:
+    """
+    (content_hash, faces). faces are the photo's stored faces when the ledger
+    shows it was already processed from the same image bytes, else None.
+    content_hash is None when the ledger is disabled.
+    """
+    if not PROCESSING_LEDGER_ENABLED:
+        return None, None
+    content_hash = image.content_hash()
+    num_faces = _ledger().matches(photo_id, content_hash)
+    if num_faces is None:
+        return content_hash, None
+    faces = _load_photo_faces(str(wedding_id), photo_id, num_faces, vector_db)
+    metrics().incr("ledger.hits" if faces is not None else "ledger.missing_vectors")
+    return content_hash, faces
+
+
+def _load_photo_faces(
+    wedding_id: str, photo_id: str, num_faces: int, vector_db: VectorDBService
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    A photo's stored faces ({embedding, bbox, confidence}, in face-index order)
+    from the embedding store, else Pinecone. None if any face is missing.
+    """
+    ids = [f"photo:{photo_id}:{i}" for i in range(num_faces)]
+    if not ids:
+        return []
+    if EMBEDDING_STORE_ENABLED:
+        try:
+            found, embeddings, side = _embeddings().partition(wedding_id).get(ids)
+            if len(found) == len(ids):
+                return [
+                    {
+                        "embedding": embeddings[i].tolist(),
+                        "bbox": [int(v) for v in side[i]["bbox"]],
+                        "confidence": float(side[i]["confidence"]),
+                    }
+                    for i in range(len(ids))
+                ]
+        except Exception as e:
+            logger.warning("Embedding store read failed for photo %s: %s", photo_id, e)
+    vectors = vector_db.fetch_vectors(ids)
+    faces = []
+    for vid in ids:
+        info = vectors.get(vid)
+        if not info or not info.get("values"):
+            return None
+        metadata = info["metadata"]
+        bbox = metadata.get("bbox") or [0, 0, 0, 0]
+        faces.append(
+            {
+                "embedding": list(info["values"]),
+                # Pinecone stores the bbox as a list of strings
+                "bbox": [int(float(v)) for v in bbox],
+                "confidence": float(metadata.get("confidence", 0)),
+            }
         )
+    return faces
+
+
+class _InferenceBatcher:
+    """
+    Groups photos whose jobs reach inference together into one
+    extract_faces_batch call, so recognition runs over the faces of several
+    photos at once. A job queues its image and waits for a pooled model; the
+    job that gets one takes up to INFERENCE_MAX_BATCH queued images (its own
+    and those of jobs still waiting) and hands each job its result. Batches
+    only form while every model is busy, so an idle worker adds no latency;
+    the sequential loop always runs batches of one.
+    """
+
+    def __init__(self, max_batch: int):
+        self.max_batch = max_batch
+        self._lock = threading.Lock()
+        self._queue: List[tuple] = []  # (image source, Future)
+
+    def extract(self, image: _DownloadedImage) -> List[Dict[str, Any]]:
+        future: Future = Future()
+        source = image.path if image.path is not None else image.data
+        with self._lock:
+            self._queue.append((source, future))
+        while not future.done():
+            with _models().acquire() as face_processor:
+                with self._lock:
+                    batch = self._queue[: self.max_batch]
+                    del self._queue[: self.max_batch]
+                if batch:
+                    self._run(face_processor, batch)
+            if not batch:
+                # Another job took our image; its batch sets our result
+                break
+        return future.result()
+
+    @staticmethod
+    def _run(face_processor, batch: List[tuple]) -> None:
+        start = time.perf_counter()
         try:
-            os.unlink(local_path)
-        except OSError:
-            pass
-        return False
+            results = face_processor.extract_faces_batch(
+                [source for source, _ in batch], min_confidence=0.5
+            )
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        finally:
+            metrics().observe("job.inference_ms", (time.perf_counter() - start) * 1000)
+            metrics().incr("inference.batches")
+            metrics().incr("inference.photos", len(batch))
+        for (_, future), faces in zip(batch, results):
+            if faces is None:
+                future.set_exception(ValueError("Cannot decode image"))
+            else:
+                future.set_result(faces)
+
+
+_inference = _InferenceBatcher(INFERENCE_MAX_BATCH)
+
+
+def _extract_photo_faces(image: _DownloadedImage) -> List[Dict[str, Any]]:
+    """Run face detection + embedding on a downloaded photo with a pooled model."""
+    return _inference.extract(image)
+
+
+def _match_to_samples(
+    wedding_id: str, embeddings: List[Any], vector_db: VectorDBService
+) -> List[List[Dict[str, Any]]]:
+    """
+    Match faces against the wedding's samples (top 5 above the threshold each):
+    in memory when the wedding's samples are loaded, otherwise one Pinecone batch.
+    """
+    results = _samples(vector_db).search(
+        wedding_id, embeddings, top_k=5, min_score=SIMILARITY_THRESHOLD
+    )
+    if results is None:
+        results = vector_db.search_similar_faces_batch(
+            embeddings,
+            top_k=5,
+            min_score=SIMILARITY_THRESHOLD,
+            filter_metadata={"wedding_id": wedding_id, "type": "sample"},
+        )
+    return results
 
+
+def _finish_photo(
+    photo_id: str,
+    wedding_id: str,
+    original_url: str,
+    faces: List[Dict[str, Any]],
+    started_at: float,
+    vector_db: VectorDBService,
+    content_hash: Optional[str] = None,
+    reused: bool = False,
+) -> bool:
+    """
+    Match extracted faces, post tags, store vectors and mark the photo completed.
+    reused: faces were loaded from storage (_stored_faces), so vectors are
+    already stored and only matching and tags run. Otherwise the photo is
+    recorded in the ledger under content_hash once its vectors are stored.
+    """
+    reporter = _status()
     num_faces = len(faces)
-    matches_created = 0
     wedding_id_str = str(wedding_id)
-    filter_samples = {"wedding_id": wedding_id_str, "type": "sample"}
+    face_records: List[Dict[str, Any]] = []
+    tags: List[Dict[str, Any]] = []
+
+    search_start = time.perf_counter()
+    all_search_results = _match_to_samples(
+        wedding_id_str, [face_data["embedding"] for face_data in faces], vector_db
+    )
+    metrics().observe("job.search_ms", (time.perf_counter() - search_start) * 1000)
+    # One person per face and at most one face per person in this photo
+    face_ids = [f"photo:{photo_id}:{i}" for i in range(num_faces)]
+    assignment = assign_from_matches(
+        face_ids, [photo_id] * num_faces, all_search_results
+    )
+    matches_created = len(assignment)
 
     for face_index, face_data in enumerate(faces):
         embedding = face_data["embedding"]
         bbox = face_data.get("bbox", [0, 0, 0, 0])
         confidence = face_data.get("confidence", 0)
-        face_encoding_id = f"photo:{photo_id}:{face_index}"
-
-        # Search existing samples for this wedding
-        search_results = vector_db.search_similar_faces(
-            query_embedding=embedding,
-            top_k=5,
-            min_score=SIMILARITY_THRESHOLD,
-            filter_metadata=filter_samples,
-        )
+        face_encoding_id = face_ids[face_index]
+        assigned = assignment.get(face_encoding_id) or {}
+        guest_id = assigned.get("guest_id")
+        user_id = assigned.get("user_id")
 
-        guest_id = None
-        user_id = None
-        best_score = None
-        if search_results:
-            best = search_results[0]
-            best_score = best.get("score")
-            guest_id = best.get("guest_id")
-            user_id = best.get("user_id")
-            if best_score and (guest_id or user_id):
-                matches_created += 1
-
-        # Create PhotoTag
-        post_photo_tag(
-            photo_id,
-            guest_id=guest_id,
-            user_id=user_id,
-            confidence_score=float(best_score) if best_score is not None else None,
-            bounding_box=_bbox_to_box(bbox),
-            face_encoding_id=face_encoding_id,
+        # PhotoTag for this face; all tags of the photo are posted in one request
+        tags.append(
+            {
+                "photo_id": photo_id,
+                "guest_id": guest_id,
+                "user_id": user_id,
+                "confidence_score": assigned.get("score"),
+                "bounding_box": _bbox_to_box(bbox),
+                "face_encoding_id": face_encoding_id,
+                "replace": True,
+            }
         )
 
-        # Upsert this face to Pinecone (photo type)
+        # Collect this face for one batched Pinecone upsert (photo type)
         metadata = {
             "type": "photo",
             "wedding_id": wedding_id_str,
@@ -235,22 +821,50 @@ def process_photo_job(photo_id: str, vector_db: VectorDBService) -> bool:
             metadata["guest_id"] = guest_id
         if user_id is not None:
             metadata["user_id"] = str(user_id)
-        vector_db.upsert_face(face_encoding_id, embedding, metadata)
+        face_records.append(
+            {"id": face_encoding_id, "embedding": embedding, "metadata": metadata}
+        )
 
-    try:
-        os.unlink(local_path)
-    except OSError:
-        pass
+    if tags:
+        failed: List[Dict[str, Any]] = []
+        post_photo_tags_bulk(tags, failed=failed)
+        if not failed:
+            _record_assignment(wedding_id_str, face_ids, assignment)
+
+    upsert_ms = 0
+    stored = 0
+    if face_records and not reused:
+        upsert_start = time.perf_counter()
+        stored = vector_db.upsert_faces_batch(face_records)
+        upsert_ms = int((time.perf_counter() - upsert_start) * 1000)
+        metrics().observe("job.upsert_ms", upsert_ms)
+        if stored < len(face_records):
+            logger.warning(
+                "Photo %s: stored %d/%d face vectors",
+                photo_id,
+                stored,
+                len(face_records),
+            )
+
+    if not reused:
+        if EMBEDDING_STORE_ENABLED:
+            _store_photo_faces(wedding_id_str, photo_id, faces)
+        if content_hash is not None:
+            if stored == len(face_records):
+                _ledger().record(photo_id, content_hash, num_faces, wedding_id_str)
+            else:
+                # Don't reuse a partially stored photo next time
+                _ledger().forget(photo_id)
 
     processing_time_ms = int((time.time() - started_at) * 1000)
     processed_at = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
-    patch_photo(
+    reporter.update_photo(
         photo_id,
         processing_status="completed",
         faces_detected=num_faces,
         processed_at=processed_at,
     )
-    patch_processing_queue(
+    reporter.update_queue(
         photo_id,
         status="completed",
         faces_found=num_faces,
@@ -259,11 +873,13 @@ def process_photo_job(photo_id: str, vector_db: VectorDBService) -> bool:
         processing_time_ms=processing_time_ms,
     )
     logger.info(
-        "Photo %s done: %d faces, %d matches, %d ms",
+        "Photo %s done: %d faces, %d matches, %d ms (upsert %d ms%s)",
         photo_id,
         num_faces,
         matches_created,
         processing_time_ms,
+        upsert_ms,
+        ", stored faces reused" if reused else "",
     )
     return True
 
@@ -275,20 +891,40 @@ def _match_sample_to_photo_faces(
     guest_id: Optional[str],
     user_id: Optional[int],
     wedding_ids: List[str],
+    pages: Optional[Iterable[List[Dict[str, Any]]]] = None,
 ) -> int:
     """
     When a new face sample is added, search existing photo faces in Pinecone
     and create PhotoTags for matches. This avoids reprocessing every photo
     (face -> image refs; one search instead of N photo jobs).
+    pages: pages of matches when the caller already has them; otherwise every
+    match above the threshold is paged through, posting tags page by page.
     Returns the number of tags created.
     """
-    matches = vector_db.search_photo_faces(
-        query_embedding=embedding,
-        wedding_ids=wedding_ids,
-        top_k=500,
-        min_score=SIMILARITY_THRESHOLD,
-    )
+    if pages is None:
+        pages = vector_db.iter_photo_faces(
+            query_embedding=embedding,
+            wedding_ids=wedding_ids,
+            min_score=SIMILARITY_THRESHOLD,
+        )
     created = 0
+    for matches in pages:
+        tags = _sample_match_tags(matches, guest_id, user_id)
+        if tags:
+            created += post_photo_tags_bulk(tags)
+    if wedding_ids:
+        logger.info(
+            "Sample matched to %d photo faces (weddings: %s)",
+            created,
+            len(wedding_ids),
+        )
+    return created
+
+
+def _sample_match_tags(
+    matches: List[Dict[str, Any]], guest_id: Optional[str], user_id: Optional[int]
+) -> List[Dict[str, Any]]:
+    tags: List[Dict[str, Any]] = []
     for match in matches:
         photo_id = match.get("photo_id")
         if not photo_id:
@@ -298,23 +934,19 @@ def _match_sample_to_photo_faces(
             bounding_box = _bbox_to_box(bbox_raw)
         else:
             bounding_box = None
-        ok = post_photo_tag(
-            photo_id,
-            guest_id=guest_id,
-            user_id=user_id,
-            confidence_score=float(match["score"]) if match.get("score") is not None else None,
-            bounding_box=bounding_box,
-            face_encoding_id=match.get("face_id"),
-        )
-        if ok:
-            created += 1
-    if wedding_ids:
-        logger.info(
-            "Sample matched to %d photo faces (weddings: %s)",
-            created,
-            len(wedding_ids),
+        tags.append(
+            {
+                "photo_id": photo_id,
+                "guest_id": guest_id,
+                "user_id": user_id,
+                "confidence_score": (
+                    float(match["score"]) if match.get("score") is not None else None
+                ),
+                "bounding_box": bounding_box,
+                "face_encoding_id": match.get("face_id"),
+            }
         )
-    return created
+    return tags
 
 
 def process_face_sample_job(
@@ -324,7 +956,7 @@ def process_face_sample_job(
     Payload: { userId, guestId?, imageUrl }.
     Download image -> extract single face -> generate faceEncodingId ->
     upsert to Pinecone (type=sample) -> create FaceSample via API ->
-    update Guest and/or User -> push reprocess_wedding for wedding(s).
+    update Guest and/or User -> reconcile the tags the new sample changes.
     """
     user_id = payload.get("userId")
     guest_id = payload.get("guestId")
@@ -333,18 +965,15 @@ def process_face_sample_job(
         logger.error("face_sample job missing imageUrl")
         return False
 
-    local_path = _download_image_to_temp(image_url)
-    if not local_path:
+    image = _download_image(image_url)
+    if image is None:
         return False
 
     try:
-        face_processor = FaceProcessor()
-        face_data = face_processor.extract_single_face(local_path)
+        with _models().acquire() as face_processor:
+            face_data = face_processor.extract_single_face(image.source)
     finally:
-        try:
-            os.unlink(local_path)
-        except OSError:
-            pass
+        image.close()
 
     if not face_data:
         logger.error("No face detected in face sample image")
@@ -371,11 +1000,16 @@ def process_face_sample_job(
             "is_primary": True,
         }
         vector_db.upsert_face(face_encoding_id, embedding, metadata)
+        _samples(vector_db).upsert(
+            str(wedding_id), face_encoding_id, embedding, metadata
+        )
+        new_samples = {str(wedding_id): (face_encoding_id, embedding, metadata)}
     else:
         # User sample: upsert one vector per wedding (guest + host) so photo search finds them
         guest_wedding_ids = payload.get("weddingIds") or []
         hosted_wedding_ids = payload.get("hostedWeddingIds") or []
         wedding_ids = list(set(guest_wedding_ids + hosted_wedding_ids))
+        new_samples = {}
         for idx, wid in enumerate(wedding_ids):
             vid = face_encoding_id if idx == 0 else f"sample:user:{user_id}:{idx}"
             meta = {
@@ -388,6 +1022,8 @@ def process_face_sample_job(
                 "is_primary": True,
             }
             vector_db.upsert_face(vid, embedding, meta)
+            _samples(vector_db).upsert(str(wid), vid, embedding, meta)
+            new_samples[str(wid)] = (vid, embedding, meta)
         if not wedding_ids:
             # No weddings: still store one vector without wedding_id (won't match photo search by wedding)
             meta = {
@@ -419,15 +1055,13 @@ def process_face_sample_job(
             photos_processed=False,
         )
         if wedding_id:
-            created = _match_sample_to_photo_faces(
+            _reconcile_new_sample(
                 vector_db,
                 embedding=embedding,
                 guest_id=guest_id,
                 user_id=None,
-                wedding_ids=[str(wedding_id)],
+                new_samples=new_samples,
             )
-            if created == 0:
-                _queue_photo_process_for_weddings([str(wedding_id)])
     else:
         patch_user(
             user_id,
@@ -441,57 +1075,788 @@ def process_face_sample_job(
             )
         )
         if wedding_ids:
-            wedding_ids_str = [str(w) for w in wedding_ids]
-            created = _match_sample_to_photo_faces(
+            _reconcile_new_sample(
                 vector_db,
                 embedding=embedding,
                 guest_id=None,
                 user_id=user_id,
-                wedding_ids=wedding_ids_str,
+                new_samples=new_samples,
             )
-            if created == 0:
-                _queue_photo_process_for_weddings(wedding_ids_str)
     return True
 
 
-def _queue_photo_process_for_weddings(wedding_ids: List[str]) -> None:
+def _reconcile_new_sample(
+    vector_db: VectorDBService,
+    *,
+    embedding: List[float],
+    guest_id: Optional[str],
+    user_id: Optional[int],
+    new_samples: Dict[str, tuple],
+) -> None:
     """
-    When no photo faces exist in Pinecone yet (e.g. sample added before photos
-    were processed), queue photo_process for all photos in these weddings.
-    When those jobs run they will search samples and create tags.
+    Update tags after a sample upload. new_samples: wedding_id ->
+    (vector_id, embedding, metadata) of the sample stored for that wedding.
+    Only photos the sample can change are re-assigned (_reconcile_sample).
+    Photos are never re-queued: a sample with no matches changes nothing.
     """
-    redis_client = _redis()
-    total = 0
-    for wid in wedding_ids:
-        photo_ids = get_wedding_photo_ids(wid)
-        for pid in photo_ids:
-            redis_client.xadd_event(
-                STREAM_KEY, "photo_process", {"photoId": pid}, max_len=10000
+    for wid, sample in new_samples.items():
+        start = time.perf_counter()
+        pages = vector_db.iter_photo_faces(
+            query_embedding=embedding,
+            wedding_ids=[wid],
+            min_score=SIMILARITY_THRESHOLD,
+        )
+        result = _reconcile_sample(wid, sample, pages, vector_db)
+        if result is None:
+            # Samples can't be held in memory: tag the matches as they are
+            _match_sample_to_photo_faces(
+                vector_db,
+                embedding=embedding,
+                guest_id=guest_id,
+                user_id=user_id,
+                wedding_ids=[wid],
+                pages=pages,
             )
-            total += 1
-    if total:
+            continue
+        matched, photos, tagged = result
+        metrics().observe_count("job.reconcile_photos", photos)
         logger.info(
-            "No photo faces in index yet; queued %d photos for processing (weddings: %s)",
-            total,
-            len(wedding_ids),
+            "Sample %s: %d matches, re-assigned %d photos, %d tags posted, %d ms",
+            sample[0],
+            matched,
+            photos,
+            tagged,
+            (time.perf_counter() - start) * 1000,
         )
 
 
-def process_reprocess_wedding_job(payload: Dict[str, Any]) -> bool:
-    """Payload: { weddingId }. Re-queue all photos in wedding for photo_process."""
+def _reconcile_sample(
+    wedding_id: str,
+    sample: tuple,
+    pages: Iterable[List[Dict[str, Any]]],
+    vector_db: VectorDBService,
+) -> Optional[tuple]:
+    """
+    Incremental re-assignment for one new or replaced sample. A photo is
+    affected if the sample matches one of its faces that has no recorded
+    best match, is recorded for the same person, or is recorded with a lower
+    score; or if the sample's person already holds a face in it (a replaced
+    sample can lose it). Only affected photos are re-assigned, which gives
+    the same result as re-assigning the wedding (constraints are per photo).
+    Matches are consumed page by page, each page's new affected photos being
+    re-assigned and posted before the next is fetched; pages is not started
+    when None is returned.
+    Returns (matches, photos re-assigned, tags posted), or None when the
+    wedding's samples can't be held in memory.
+    """
+    samples = _wedding_samples(wedding_id, vector_db, extra_sample=sample)
+    if samples is None:
+        return None
+    matrix, metadata = samples
+    person = person_of(sample[2])
+    record = _assignments().load(wedding_id)
+
+    # Photos where the person holds a face are affected whatever the matches
+    held = {
+        _photo_of_face(vid) for vid, best in record.items() if person_of(best) == person
+    }
+    done = set()
+    matched = photos = tagged = 0
+    # The trailing empty page re-assigns held photos when nothing matches
+    for matches in itertools.chain(pages, [[]]):
+        matched += len(matches)
+        affected = set(held)
+        held.clear()
+        for match in matches:
+            best = record.get(match.get("face_id"))
+            if (
+                best is None
+                or person_of(best) == person
+                or float(match["score"]) > float(best.get("score", 0))
+            ):
+                affected.add(match.get("photo_id"))
+        affected.discard(None)
+        affected -= done
+        if not affected:
+            continue
+        done |= affected
+        loaded, posted = _reassign_photos(
+            wedding_id, affected, matches, sample, matrix, metadata, record, vector_db
+        )
+        photos += loaded
+        tagged += posted
+    return matched, photos, tagged
+
+
+def _reassign_photos(
+    wedding_id: str,
+    photo_ids: Set[str],
+    matches: List[Dict[str, Any]],
+    sample: tuple,
+    matrix: np.ndarray,
+    metadata: List[Dict[str, Any]],
+    record: Dict[str, Dict[str, Any]],
+    vector_db: VectorDBService,
+) -> tuple:
+    """
+    Re-assign photo_ids and post the diff against record. Matched photos
+    whose faces can't be loaded get the match as a plain tag.
+    Returns (photos re-assigned, tags posted).
+    """
+    face_ids, embeddings, bboxes, _ = _load_wedding_faces(
+        wedding_id, sorted(photo_ids), vector_db
+    )
+    current = assign_faces(
+        face_ids,
+        [_photo_of_face(vid) for vid in face_ids],
+        embeddings,
+        matrix,
+        metadata,
+        SIMILARITY_THRESHOLD,
+    )
+    tagged = _post_assignment_diff(wedding_id, record, current, face_ids, bboxes)
+
+    loaded = {_photo_of_face(vid) for vid in face_ids}
+    unloaded = [m for m in matches if m.get("photo_id") in photo_ids - loaded]
+    if unloaded:
+        person = person_of(sample[2])
+        tagged += _match_sample_to_photo_faces(
+            vector_db,
+            embedding=sample[1],
+            guest_id=person[0],
+            user_id=person[1],
+            wedding_ids=[wedding_id],
+            pages=[unloaded],
+        )
+    return len(loaded), tagged
+
+
+def _enqueue_photo_jobs(photo_ids: List[str]) -> int:
+    """Fan out photo_process jobs with pipelined XADDs; returns how many were queued."""
+    if not photo_ids:
+        return 0
+    redis_client = _redis()
+    ids = redis_client.xadd_events(
+        STREAM_KEY,
+        "photo_process",
+        ({"photoId": pid} for pid in photo_ids),
+        chunk_size=ENQUEUE_CHUNK_SIZE,
+    )
+    queued = sum(1 for msg_id in ids if msg_id)
+    if queued < len(photo_ids):
+        logger.error(
+            "Failed to queue %d of %d photos", len(photo_ids) - queued, len(photo_ids)
+        )
+    metrics().incr("fanout.queued", queued)
+    # Trim only after the new entries are in, and never past unread/pending ones
+    trimmed = redis_client.trim_acknowledged(STREAM_KEY, STREAM_MAX_LEN)
+    if trimmed:
+        metrics().incr("stream.trimmed", trimmed)
+    return queued
+
+
+def _photo_of_face(face_id: str) -> str:
+    # ids are photo:<photo_id>:<face_index>
+    return face_id[len("photo:") :].rsplit(":", 1)[0]
+
+
+def _rematch_faces(
+    wedding_id: str,
+    face_ids: List[str],
+    embeddings,
+    bboxes: List[Any],
+    vector_db: VectorDBService,
+) -> int:
+    """
+    Per-face fallback when the assignment engine can't run: tag each face with
+    its best sample match (no one-person-per-photo constraint).
+    """
+    tags: List[Dict[str, Any]] = []
+    for start in range(0, len(face_ids), REMATCH_CHUNK_SIZE):
+        chunk = np.asarray(
+            embeddings[start : start + REMATCH_CHUNK_SIZE], dtype=np.float32
+        )
+        results = _match_to_samples(wedding_id, chunk.tolist(), vector_db)
+        for offset, search_results in enumerate(results):
+            if not search_results:
+                continue
+            best = search_results[0]
+            if not (best.get("guest_id") or best.get("user_id")):
+                continue
+            face_id = face_ids[start + offset]
+            tags.append(
+                {
+                    "photo_id": _photo_of_face(face_id),
+                    "guest_id": best.get("guest_id"),
+                    "user_id": best.get("user_id"),
+                    "confidence_score": float(best["score"]),
+                    "bounding_box": _bbox_to_box(bboxes[start + offset]),
+                    "face_encoding_id": face_id,
+                }
+            )
+    if tags:
+        post_photo_tags_bulk(tags)
+    return len(tags)
+
+
+def _fetch_photo_faces(
+    photo_counts: Dict[str, int], vector_db: VectorDBService
+) -> tuple:
+    """
+    Fetch the stored faces of photos (photo_id -> face count) from Pinecone.
+    Returns (face_ids, embeddings, bboxes, photo ids with any face missing).
+    """
+    ids = [
+        f"photo:{pid}:{i}" for pid, count in photo_counts.items() for i in range(count)
+    ]
+    face_ids: List[str] = []
+    embeddings: List[List[float]] = []
+    bboxes: List[Any] = []
+    missing = set()
+    for start in range(0, len(ids), _FETCH_BATCH):
+        batch = ids[start : start + _FETCH_BATCH]
+        vectors = vector_db.fetch_vectors(batch)
+        for vid in batch:
+            info = vectors.get(vid)
+            if not info or not info.get("values"):
+                missing.add(_photo_of_face(vid))
+                continue
+            face_ids.append(vid)
+            embeddings.append(info["values"])
+            bboxes.append(info["metadata"].get("bbox") or [0, 0, 0, 0])
+    return face_ids, embeddings, bboxes, missing
+
+
+def _load_wedding_faces(
+    wedding_id: str, photo_ids: List[str], vector_db: VectorDBService
+) -> tuple:
+    """
+    Stored faces of the wedding's photos: from the embedding store, plus
+    Pinecone for photos the ledger records but the store doesn't hold.
+    Returns (face_ids, embeddings, bboxes, photo ids that need photo_process:
+    never processed, or their vectors are gone).
+    """
+    wanted = set(photo_ids)
+    counts = _ledger().face_counts(photo_ids)
+    face_ids: List[str] = []
+    embeddings = np.empty((0, vector_db.dimension), dtype=np.float32)
+    bboxes: List[Any] = []
+    covered = set()
+    if EMBEDDING_STORE_ENABLED and _embeddings().has_partition(wedding_id):
+        face_ids, embeddings, side = _embeddings().partition(wedding_id).photo_faces(
+            wanted
+        )
+        covered = {_photo_of_face(vid) for vid in face_ids}
+        bboxes = [[int(v) for v in bbox] for bbox in side["bbox"]]
+
+    remote = {
+        pid: count for pid, count in counts.items() if count and pid not in covered
+    }
+    remote_ids, remote_embeddings, remote_bboxes, missing = _fetch_photo_faces(
+        remote, vector_db
+    )
+    if remote_ids:
+        face_ids = face_ids + remote_ids
+        embeddings = np.concatenate(
+            [embeddings, np.asarray(remote_embeddings, dtype=embeddings.dtype)]
+        )
+        bboxes = bboxes + remote_bboxes
+    if missing:
+        _ledger().forget_many(sorted(missing))
+    unprocessed = [
+        pid
+        for pid in photo_ids
+        if pid in missing or (pid not in covered and pid not in counts)
+    ]
+    return face_ids, embeddings, bboxes, unprocessed
+
+
+def _record_assignment(
+    wedding_id: str, face_ids: List[str], assignment: Dict[str, Dict[str, Any]]
+) -> None:
+    """Record the tags just posted for face_ids as their current assignment."""
+    previous = _assignments().get(wedding_id, face_ids)
+    changed, cleared = diff_assignments(previous, assignment, face_ids)
+    _assignments().apply(wedding_id, changed, cleared)
+
+
+def _post_assignment_diff(
+    wedding_id: str,
+    previous: Dict[str, Dict[str, Any]],
+    current: Dict[str, Dict[str, Any]],
+    face_ids: List[str],
+    bboxes: List[Any],
+    stale: Sequence[str] = (),
+) -> int:
+    """
+    Post the tags of face_ids whose assignment differs from previous and
+    record them; stale faces (no longer stored) are dropped from the record.
+    Returns the number of tags posted.
+    """
+    changed, cleared = diff_assignments(previous, current, face_ids)
+    bbox_of = dict(zip(face_ids, bboxes))
+    tags: List[Dict[str, Any]] = []
+    for face_id in list(changed) + cleared:
+        assigned = changed.get(face_id) or {}
+        tags.append(
+            {
+                "photo_id": _photo_of_face(face_id),
+                "guest_id": assigned.get("guest_id"),
+                "user_id": assigned.get("user_id"),
+                "confidence_score": assigned.get("score"),
+                "bounding_box": _bbox_to_box(bbox_of[face_id]),
+                "face_encoding_id": face_id,
+                # The engine's answer wins over the per-face score rule
+                "replace": True,
+            }
+        )
+    failed: List[Dict[str, Any]] = []
+    if tags:
+        post_photo_tags_bulk(tags, failed=failed)
+    # Leave failed faces out of the record so the next run posts them again
+    failed_ids = {tag["face_encoding_id"] for tag in failed}
+    _assignments().apply(
+        wedding_id,
+        {vid: a for vid, a in changed.items() if vid not in failed_ids},
+        [vid for vid in cleared if vid not in failed_ids] + list(stale),
+    )
+    return len(tags) - len(failed)
+
+
+def _wedding_samples(
+    wedding_id: str, vector_db: VectorDBService, extra_sample: Optional[tuple] = None
+) -> Optional[tuple]:
+    """
+    (matrix, metadata) of the wedding's samples for the assignment engine, or
+    None when they can't be held in memory. extra_sample: (vector_id,
+    embedding, metadata) of a sample just upserted, added if the loaded
+    samples don't include it yet.
+    """
+    samples = _samples(vector_db).samples(wedding_id)
+    if samples is None:
+        return None
+    sample_ids, matrix, metadata = samples
+    if extra_sample is not None and extra_sample[0] not in sample_ids:
+        row = np.asarray([extra_sample[1]], dtype=np.float32)
+        matrix = np.vstack([matrix, row / (np.linalg.norm(row) or 1.0)])
+        metadata = list(metadata) + [extra_sample[2]]
+    return matrix, metadata
+
+
+def _assign_wedding_faces(
+    wedding_id: str,
+    face_ids: List[str],
+    embeddings,
+    bboxes: List[Any],
+    vector_db: VectorDBService,
+) -> Optional[int]:
+    """
+    Assign all of the wedding's faces with the bulk engine
+    (services/face_assignment.py) and post the tags that changed since the
+    last assignment. Returns the number of tags posted, or None when the
+    wedding's samples can't be held in memory (the caller matches per face).
+    """
+    samples = _wedding_samples(wedding_id, vector_db)
+    if samples is None:
+        return None
+    matrix, metadata = samples
+    current = assign_faces(
+        face_ids,
+        [_photo_of_face(vid) for vid in face_ids],
+        embeddings,
+        matrix,
+        metadata,
+        SIMILARITY_THRESHOLD,
+    )
+    previous = _assignments().load(wedding_id)
+    present = set(face_ids)
+    return _post_assignment_diff(
+        wedding_id,
+        previous,
+        current,
+        face_ids,
+        bboxes,
+        stale=[vid for vid in previous if vid not in present],
+    )
+
+
+def _rematch_wedding(wedding_id: str, vector_db: VectorDBService) -> None:
+    """
+    Re-match every stored photo face of the wedding against its samples and
+    post the resulting tag changes; queue photos without stored faces.
+    """
+    start = time.perf_counter()
+    photo_ids = get_wedding_photo_ids(wedding_id)
+    face_ids, embeddings, bboxes, unprocessed = _load_wedding_faces(
+        wedding_id, photo_ids, vector_db
+    )
+    tagged = _assign_wedding_faces(wedding_id, face_ids, embeddings, bboxes, vector_db)
+    if tagged is None:
+        tagged = _rematch_faces(wedding_id, face_ids, embeddings, bboxes, vector_db)
+    queued = _enqueue_photo_jobs(unprocessed)
+    metrics().observe_count("job.rematch_faces", len(face_ids))
+    logger.info(
+        "Re-matched %d faces in wedding %s: %d tags posted, %d photos queued, %d ms",
+        len(face_ids),
+        wedding_id,
+        tagged,
+        queued,
+        (time.perf_counter() - start) * 1000,
+    )
+
+
+def process_rematch_wedding_job(
+    payload: Dict[str, Any], vector_db: VectorDBService
+) -> bool:
+    """
+    Payload: { weddingId, full? }. Re-match every stored photo face of the
+    wedding against its current samples and post the changed tags, without
+    running the face models. Photos with no stored faces are queued for
+    photo_process.
+    full=true does a reprocess_wedding instead.
+    """
     wedding_id = payload.get("weddingId")
     if not wedding_id:
         return False
-    photo_ids = get_wedding_photo_ids(wedding_id)
-    redis_client = _redis()
-    for photo_id in photo_ids:
-        redis_client.xadd_event(STREAM_KEY, "photo_process", {"photoId": photo_id}, max_len=10000)
-    logger.info("Re-queued %d photos for wedding %s", len(photo_ids), wedding_id)
+    if payload.get("full"):
+        return process_reprocess_wedding_job(payload)
+    _rematch_wedding(str(wedding_id), vector_db)
     return True
 
 
-def run_worker():
-    """Main loop: create consumer group, read from stream, dispatch, ack."""
+def process_reprocess_wedding_job(payload: Dict[str, Any]) -> bool:
+    """
+    Payload: { weddingId }. Forget the ledger and re-queue every photo of the
+    wedding for photo_process (e.g. after a face model change).
+    """
+    wedding_id = payload.get("weddingId")
+    if not wedding_id:
+        return False
+    photo_ids = get_wedding_photo_ids(str(wedding_id))
+    _ledger().forget_many(photo_ids)
+    queued = _enqueue_photo_jobs(photo_ids)
+    logger.info("Re-queued %d photos for wedding %s", queued, wedding_id)
+    return queued == len(photo_ids)
+
+
+def _handle_message(
+    fields: Dict[str, Any],
+    vector_db: VectorDBService,
+    prefetcher: Optional[_Prefetcher] = None,
+) -> bool:
+    """
+    Parse one stream entry and run its job. Exceptions are logged, never raised.
+    Returns False when the message must not be acked: the photo's terminal
+    status didn't reach the API, so it stays pending and is reclaimed later.
+    """
+    event = fields.get("event", "")
+    payload_str = fields.get("payload", "{}")
+    try:
+        payload = json.loads(payload_str) if payload_str else {}
+    except json.JSONDecodeError:
+        payload = {}
+
+    job_start = time.perf_counter()
+    ack = True
+    try:
+        if event == "photo_process":
+            photo_id = payload.get("photoId")
+            if photo_id:
+                try:
+                    prefetched = prefetcher.take(photo_id) if prefetcher else None
+                    process_photo_job(photo_id, vector_db, prefetched)
+                finally:
+                    # Terminal status must reach the API before the message is acked
+                    ack = _status_flushed(photo_id)
+        elif event == "face_sample":
+            process_face_sample_job(payload, vector_db)
+        elif event == "rematch_wedding":
+            process_rematch_wedding_job(payload, vector_db)
+        elif event == "reprocess_wedding":
+            process_reprocess_wedding_job(payload)
+        else:
+            logger.warning("Unknown event: %s", event)
+    except Exception as e:
+        logger.exception("Job failed for %s: %s", event, e)
+    finally:
+        metrics().observe(
+            f"job.{event or 'unknown'}_ms", (time.perf_counter() - job_start) * 1000
+        )
+    return ack
+
+
+def _status_flushed(photo_id: str) -> bool:
+    """Flush photo_id's status updates; False (logged) if they weren't delivered."""
+    if _status().flush(photo_id):
+        return True
+    logger.warning(
+        "Status for photo %s not delivered; leaving its message pending", photo_id
+    )
+    metrics().incr("job.unacked")
+    return False
+
+
+_next_metrics_log = time.monotonic() + METRICS_LOG_INTERVAL_S
+
+
+def _maybe_log_metrics() -> None:
+    global _next_metrics_log
+    if METRICS_LOG_INTERVAL_S <= 0 or time.monotonic() < _next_metrics_log:
+        return
+    _next_metrics_log = time.monotonic() + METRICS_LOG_INTERVAL_S
+    metrics().log_snapshot()
+
+
+class _Reclaimer:
+    """
+    Periodically XAUTOCLAIMs messages left pending by consumers that died
+    before acking. Poison messages (delivered more than MAX_DELIVERIES times)
+    are moved to DEAD_LETTER_STREAM instead of being retried again. Each pass
+    also trims acked entries beyond STREAM_MAX_LEN.
+    """
+
+    def __init__(self, redis_client: RedisClientClass):
+        self.redis_client = redis_client
+        self.cursor = "0-0"
+        # First pass right away so a restarted worker picks up what it left behind
+        self.next_run = time.monotonic()
+        self.next_touch = time.monotonic()
+
+    def due(self) -> bool:
+        return RECLAIM_INTERVAL_S > 0 and time.monotonic() >= self.next_run
+
+    def heartbeat_due(self) -> bool:
+        return time.monotonic() >= self.next_touch
+
+    def heartbeat(self, message_ids: List[str]) -> None:
+        """
+        Reset the idle time of messages this worker still owns but hasn't
+        acked, so other consumers' reclaim passes leave them alone. Callers
+        check heartbeat_due(): it runs at most once per RECLAIM_INTERVAL_S,
+        whether or not the worker has capacity to claim.
+        """
+        self.next_touch = time.monotonic() + RECLAIM_INTERVAL_S
+        if message_ids:
+            self.redis_client.touch_pending(
+                STREAM_KEY, CONSUMER_GROUP, CONSUMER_NAME, list(message_ids)
+            )
+
+    @contextmanager
+    def keep_alive(self, message_ids: List[str]) -> Iterator[None]:
+        """
+        Heartbeat message_ids until the block exits. The caller is busy inside
+        a job, so the beats come from a background thread; otherwise a job
+        running longer than RECLAIM_MIN_IDLE_MS is reclaimed and run twice.
+        """
+        if self.heartbeat_due():
+            self.heartbeat(message_ids)
+        if RECLAIM_INTERVAL_S <= 0:
+            yield
+            return
+        done = threading.Event()
+
+        def beat() -> None:
+            while not done.wait(max(self.next_touch - time.monotonic(), 0)):
+                self.heartbeat(message_ids)
+
+        thread = threading.Thread(target=beat, name="heartbeat", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            done.set()
+            thread.join()
+
+    def claim(
+        self, exclude: Optional[set] = None, count: int = RECLAIM_BATCH_SIZE
+    ) -> List[tuple]:
+        """Return reclaimed (message_id, fields) to process; at most count."""
+        self.next_run = time.monotonic() + RECLAIM_INTERVAL_S
+        trimmed = self.redis_client.trim_acknowledged(STREAM_KEY, STREAM_MAX_LEN)
+        if trimmed:
+            metrics().incr("stream.trimmed", trimmed)
+        self.cursor, claimed = self.redis_client.autoclaim(
+            STREAM_KEY,
+            CONSUMER_GROUP,
+            CONSUMER_NAME,
+            min_idle_ms=RECLAIM_MIN_IDLE_MS,
+            start_id=self.cursor,
+            count=min(count, RECLAIM_BATCH_SIZE),
+        )
+        if exclude:
+            claimed = [(mid, f) for mid, f in claimed if mid not in exclude]
+        if not claimed:
+            return []
+        counts = self.redis_client.delivery_counts(
+            STREAM_KEY, CONSUMER_GROUP, [mid for mid, _ in claimed]
+        )
+        to_process = []
+        for message_id, fields in claimed:
+            deliveries = counts.get(message_id, 0)
+            if deliveries > MAX_DELIVERIES:
+                logger.error(
+                    "Message %s (%s) delivered %d times; moving to %s",
+                    message_id,
+                    fields.get("event"),
+                    deliveries,
+                    DEAD_LETTER_STREAM,
+                )
+                self.redis_client.dead_letter(
+                    STREAM_KEY,
+                    CONSUMER_GROUP,
+                    DEAD_LETTER_STREAM,
+                    message_id,
+                    fields,
+                    deliveries,
+                )
+                metrics().incr("reclaim.dead_lettered")
+                continue
+            to_process.append((message_id, fields))
+        if to_process:
+            metrics().incr("reclaim.claimed", len(to_process))
+            logger.info(
+                "Reclaimed %d stale pending messages (min idle %d ms)",
+                len(to_process),
+                RECLAIM_MIN_IDLE_MS,
+            )
+        return to_process
+
+
+def _run_sequential_loop(
+    redis_client: RedisClientClass, vector_db: VectorDBService
+) -> None:
+    """
+    One job at a time; each message is acked after its job finishes. With
+    WORKER_BATCH_SIZE > 1 the next photos of the batch are prefetched while
+    the current one is processed.
+    """
+    logger.info(
+        "Worker started, reading from %s (batch %d; block 5s; no message = idle)",
+        STREAM_KEY,
+        WORKER_BATCH_SIZE,
+    )
+    reclaimer = _Reclaimer(redis_client)
+    prefetcher = _Prefetcher()
+    idle_cycles = 0
+    try:
+        while not _shutdown.is_set():
+            _maybe_log_metrics()
+            if idle_cycles == 0:
+                logger.info("Waiting for jobs...")
+            messages = reclaimer.claim() if reclaimer.due() else []
+            if not messages:
+                messages = redis_client.read_from_group(
+                    STREAM_KEY,
+                    CONSUMER_GROUP,
+                    CONSUMER_NAME,
+                    count=WORKER_BATCH_SIZE,
+                    block_ms=5000,
+                )
+            if not messages:
+                idle_cycles += 1
+                # Log every ~30s so the terminal isn't silent
+                if idle_cycles % 6 == 1 and idle_cycles > 1:
+                    logger.info("Idle, waiting for jobs...")
+                continue
+            idle_cycles = 0
+            # Messages already read are ours: finish the whole batch even when draining
+            for i, (message_id, fields) in enumerate(messages):
+                # Keep the next photos downloading while this job runs
+                prefetcher.schedule(messages[i:])
+                ack = True
+                try:
+                    # This job and the rest of the batch waiting behind it
+                    with reclaimer.keep_alive([mid for mid, _ in messages[i:]]):
+                        ack = _handle_message(fields, vector_db, prefetcher)
+                finally:
+                    if ack:
+                        redis_client.acknowledge(
+                            STREAM_KEY, CONSUMER_GROUP, message_id
+                        )
+    finally:
+        prefetcher.close()
+    logger.info("Worker %s stopped", CONSUMER_NAME)
+
+
+def _run_concurrent_loop(
+    redis_client: RedisClientClass, vector_db: VectorDBService
+) -> None:
+    """
+    Pipelined mode: keep up to WORKER_MAX_IN_FLIGHT jobs running on a thread pool.
+    Download / API / Pinecone calls overlap across threads; inference is bounded
+    by the model pool (FACE_MODEL_POOL_SIZE). A message is acked only after its
+    own job has finished, so a crash leaves unfinished messages pending
+    (at-least-once).
+    """
+    logger.info(
+        "Worker started, reading from %s (batch %d, %d threads, %d in flight max)",
+        STREAM_KEY,
+        WORKER_BATCH_SIZE,
+        WORKER_CONCURRENCY,
+        WORKER_MAX_IN_FLIGHT,
+    )
+    in_flight: Dict[Future, str] = {}
+    reclaimer = _Reclaimer(redis_client)
+    prefetcher = _Prefetcher()
+    idle_cycles = 0
+    with ThreadPoolExecutor(
+        max_workers=WORKER_CONCURRENCY, thread_name_prefix="job"
+    ) as executor:
+        while in_flight or not _shutdown.is_set():
+            _maybe_log_metrics()
+            if reclaimer.heartbeat_due():
+                # Keep our own long-running jobs from looking abandoned, also
+                # (especially) when every slot is busy
+                reclaimer.heartbeat(list(in_flight.values()))
+            capacity = WORKER_MAX_IN_FLIGHT - len(in_flight)
+            if capacity > 0 and not _shutdown.is_set():
+                if idle_cycles == 0 and not in_flight:
+                    logger.info("Waiting for jobs...")
+                messages = []
+                if reclaimer.due():
+                    messages = reclaimer.claim(
+                        exclude=set(in_flight.values()), count=capacity
+                    )
+                if not messages:
+                    messages = redis_client.read_from_group(
+                        STREAM_KEY,
+                        CONSUMER_GROUP,
+                        CONSUMER_NAME,
+                        count=min(WORKER_BATCH_SIZE, capacity),
+                        # Only block long when there is nothing to ack
+                        block_ms=100 if in_flight else 5000,
+                    )
+                if messages:
+                    idle_cycles = 0
+                    # Jobs queued behind busy threads get their photos downloaded
+                    prefetcher.schedule(messages)
+                    for message_id, fields in messages:
+                        future = executor.submit(
+                            _handle_message, fields, vector_db, prefetcher
+                        )
+                        in_flight[future] = message_id
+                elif not in_flight:
+                    idle_cycles += 1
+                    if idle_cycles % 6 == 1 and idle_cycles > 1:
+                        logger.info("Idle, waiting for jobs...")
+                    continue
+            metrics().set_gauge("worker.in_flight", len(in_flight))
+            done, _ = wait(in_flight, timeout=0.5, return_when=FIRST_COMPLETED)
+            for future in done:
+                message_id = in_flight.pop(future)
+                if future.exception() is None and not future.result():
+                    continue  # left pending for a later reclaim
+                redis_client.acknowledge(STREAM_KEY, CONSUMER_GROUP, message_id)
+    prefetcher.close()
+    logger.info("Worker %s stopped", CONSUMER_NAME)
+
+
+def _start_worker() -> Optional[tuple]:
+    """
+    Shared startup for every worker mode: logging, signal handlers, Redis and
+    consumer group, model warm-up and the vector DB.
+    Returns (redis_client, vector_db), or None if Redis is not reachable.
+    """
     # Ensure logging works when run via launcher (not as __main__)
     import sys
     logging.basicConfig(
@@ -507,66 +1872,45 @@ def run_worker():
         except Exception:
             pass
     print("Worker getting ready", flush=True)
+    _install_signal_handlers()
     logger.info("Initialising redis...")
     redis_client = _redis()
     if not redis_client.is_ready():
         logger.error("Redis not ready; worker exiting")
-        return
+        return None
 
     redis_client.create_consumer_group(STREAM_KEY, CONSUMER_GROUP)
 
+    # Load face models once; every job borrows from this pool
+    logger.info("Loading face models...")
+    _models().warm_up()
+    metrics().log_snapshot(prefixes=["model."])
+
     vector_db = VectorDBService(
         api_key=PINECONE_API_KEY,
         index_name=PINECONE_INDEX,
         dimension=512,
     )
+    if QUANTIZED_SEARCH_ENABLED and EMBEDDING_STORE_ENABLED:
+        vector_db.attach_photo_face_index(QuantizedFaceIndex(_embeddings()))
+        logger.info("Photo-face search served from the local quantized index")
+    return redis_client, vector_db
 
-    logger.info(
-        "Worker started, reading from %s (block 5s; no message = idle)",
-        STREAM_KEY,
-    )
-    idle_cycles = 0
-    while True:
-        if idle_cycles == 0:
-            logger.info("Waiting for jobs...")
-        messages = redis_client.read_from_group(
-            STREAM_KEY,
-            CONSUMER_GROUP,
-            CONSUMER_NAME,
-            count=1,
-            block_ms=5000,
-        )
-        if not messages:
-            idle_cycles += 1
-            # Log every ~30s so the terminal isn't silent
-            if idle_cycles % 6 == 1 and idle_cycles > 1:
-                logger.info("Idle, waiting for jobs...")
-            continue
-        idle_cycles = 0
-        for message_id, fields in messages:
-            event = fields.get("event", "")
-            payload_str = fields.get("payload", "{}")
-            try:
-                payload = json.loads(payload_str) if payload_str else {}
-            except json.JSONDecodeError:
-                payload = {}
 
-            try:
-                if event == "photo_process":
-                    photo_id = payload.get("photoId")
-                    if photo_id:
-                        process_photo_job(photo_id, vector_db)
-                elif event == "face_sample":
-                    process_face_sample_job(payload, vector_db)
-                elif event == "reprocess_wedding":
-                    process_reprocess_wedding_job(payload)
-                else:
-                    logger.warning("Unknown event: %s", event)
-            except Exception as e:
-                logger.exception("Job failed for %s: %s", event, e)
-            finally:
-                redis_client.acknowledge(STREAM_KEY, CONSUMER_GROUP, message_id)
+def run_worker():
+    """Main loop: create consumer group, read from stream, dispatch, ack."""
+    started = _start_worker()
+    if started is None:
+        return
+    redis_client, vector_db = started
 
+    try:
+        if WORKER_CONCURRENCY > 1:
+            _run_concurrent_loop(redis_client, vector_db)
+        else:
+            _run_sequential_loop(redis_client, vector_db)
+    finally:
+        _status().close()
 
 if __name__ == "__main__":
     logging.basicConfig(